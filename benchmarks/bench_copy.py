@@ -0,0 +1,89 @@
+"""Compare copy_file (reflink/copy_file_range/sendfile) with shutil.copy2
+
+Runs two workloads in each target directory: many small files and a few
+large ones. Reports MB/s and files/s for shutil.copy2 and for the copy
+backend used by pastes, along with the strategy the backend picked.
+
+    python benchmarks/bench_copy.py --dirs /tmp,/dev/shm
+    python benchmarks/bench_copy.py --small 20000 --small-size 4096 --large 2 --large-size 1024
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from explorer import CopyJob, copy_file
+
+
+def make_files(root, count, size):
+    os.makedirs(root)
+    block = os.urandom(min(size, 1024 * 1024))
+    paths = []
+    for i in range(count):
+        path = os.path.join(root, f"file_{i:06d}")
+        with open(path, 'wb') as f:
+            remaining = size
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+        paths.append(path)
+    return paths
+
+
+def run_copy(paths, dest, copy):
+    os.makedirs(dest)
+    strategies = {}
+    start = time.perf_counter()
+    for path in paths:
+        strategy = copy(path, os.path.join(dest, os.path.basename(path)))
+        strategies[strategy] = strategies.get(strategy, 0) + 1
+    if hasattr(os, 'sync'):
+        os.sync()
+    return time.perf_counter() - start, strategies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dirs', default=tempfile.gettempdir(),
+                        help="comma separated directories to benchmark in (e.g. a tmpfs and an ext4 path)")
+    parser.add_argument('--small', type=int, default=5000, help="number of small files")
+    parser.add_argument('--small-size', type=int, default=4096, help="bytes per small file")
+    parser.add_argument('--large', type=int, default=4, help="number of large files")
+    parser.add_argument('--large-size', type=int, default=256, help="MB per large file")
+    args = parser.parse_args()
+
+    job = CopyJob('copy', [], '')
+    workloads = (('small-many', args.small, args.small_size),
+                 ('large-few', args.large, args.large_size * 1024 * 1024))
+
+    def copy2(src, dst):
+        shutil.copy2(src, dst)
+        return 'shutil'
+
+    backends = (('shutil.copy2', copy2),
+                ('copy_file', lambda src, dst: copy_file(src, dst, job)))
+
+    for target in args.dirs.split(','):
+        root = tempfile.mkdtemp(prefix='pyfiler-copy-', dir=target)
+        try:
+            print(f"{target}:")
+            for label, count, size in workloads:
+                paths = make_files(os.path.join(root, label), count, size)
+                total = count * size
+                for name, copy in backends:
+                    dest = os.path.join(root, f"{label}-{name}")
+                    elapsed, strategies = run_copy(paths, dest, copy)
+                    used = ", ".join(f"{s} x{n}" for s, n in sorted(strategies.items()))
+                    print(f"  {label:10} {name:12} {total / elapsed / 1e6:9.1f} MB/s "
+                          f"{count / elapsed:9.0f} files/s  [{used}]")
+                    shutil.rmtree(dest)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Report per-entry memory of a cached directory listing
+
+Fills one flat directory (1M entries by default) and measures, with
+tracemalloc, the memory held by the previous representation (the list of
+os.DirEntry objects plus a metadata dict per file) and by DirListing.
+
+    python benchmarks/bench_memory.py --entries 1000000
+    python benchmarks/bench_memory.py --dir /path/to/existing/large/dir
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from explorer import DirListing, classify
+
+
+def make_flat_dir(root, entries):
+    """Create `entries` empty files directly inside root"""
+    for i in range(entries):
+        open(os.path.join(root, f"file_{i:07d}.txt"), 'w').close()
+
+
+def legacy_listing(path):
+    """The cache contents refresh_files used to build for one directory"""
+    with os.scandir(path) as scan:
+        entries = list(scan)
+    metadata = {}
+    for entry in entries:
+        is_dir = entry.is_dir()
+        st = entry.stat()
+        metadata[entry.name] = {
+            'name': entry.name,
+            'is_dir': is_dir,
+            'size': st.st_size if not is_dir else 0,
+            'mtime': st.st_mtime,
+            'type': classify(entry.name, is_dir, st.st_mode)
+        }
+    return entries, metadata
+
+
+def compact_listing(path):
+    listing = DirListing(path, os.stat(path).st_mtime)
+    listing.start()
+    listing.start_stat_all()
+    while not listing.stat_complete:
+        time.sleep(0.01)
+    return listing
+
+
+def measure(build, path):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build(path)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000000)
+    parser.add_argument('--dir', help="measure an existing directory instead of creating one")
+    args = parser.parse_args()
+
+    root = args.dir
+    cleanup = None
+    if root is None:
+        cleanup = root = tempfile.mkdtemp(prefix='pyfiler-mem-')
+        print(f"Creating {args.entries} files in {root} ...")
+        make_flat_dir(root, args.entries)
+
+    try:
+        count = sum(1 for _ in os.scandir(root))
+        print(f"{count} entries")
+        for label, build in (('dict + DirEntry', legacy_listing), ('DirListing', compact_listing)):
+            current, peak, elapsed = measure(build, root)
+            print(f"{label:16} {current / count:8.1f} B/entry retained  "
+                  f"{peak / count:8.1f} B/entry peak  {elapsed:6.2f}s")
+    finally:
+        if cleanup:
+            shutil.rmtree(cleanup, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
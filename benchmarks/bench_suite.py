@@ -0,0 +1,272 @@
+"""Reproducible end-to-end benchmarks of FileManager on synthetic trees
+
+Builds deterministic trees (see trees.py), drives FileManager through a fake
+screen (see fakescreen.py) and reports latency percentiles per operation:
+listing time-to-first-result and full listing, index-backed and walking
+searches, per-keystroke filter latency, frame render time and paste
+throughput. Results can be saved as JSON and compared with an earlier run.
+
+    python benchmarks/bench_suite.py --scale 0.1 --json before.json
+    python benchmarks/bench_suite.py --scale 0.1 --json after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import fakescreen
+import trees
+
+OPERATIONS = ('listing', 'frames', 'search', 'filter', 'paste')
+HIGHER_IS_BETTER = {'MB/s', 'files/s', 'entries/s'}
+
+
+def percentiles(samples):
+    values = sorted(samples)
+
+    def at(q):
+        pos = q * (len(values) - 1)
+        low = int(pos)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (pos - low)
+
+    return {'n': len(values), 'mean': sum(values) / len(values),
+            'p50': at(0.5), 'p90': at(0.9), 'p99': at(0.99), 'max': values[-1]}
+
+
+def ms_since(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def tree_bytes(root):
+    total = files = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+                files += 1
+            except OSError:
+                pass
+    return total, files
+
+
+class Suite:
+    def __init__(self, fm, screen, repeat, frames):
+        self.fm = fm
+        self.screen = screen
+        self.repeat = repeat
+        self.frames = frames
+        self.results = {}  # name -> (unit, samples)
+
+    def record(self, name, unit, value):
+        self.results.setdefault(name, (unit, []))[1].append(value)
+
+    def wait_until(self, predicate, timeout=600):
+        """Drive the FileManager the way its main loop does until predicate() holds"""
+        fm = self.fm
+        deadline = time.perf_counter() + timeout
+        while not predicate():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("benchmark step did not finish")
+            if fm.search_mode and fm.search_active:
+                fm._process_search_results()
+            if fm.search_mode and fm.fuzzy and fm.fuzzy.pending:
+                fm.filtered_files = fm.fuzzy.advance()
+            fm.tick()
+            time.sleep(0.0005)
+
+    def open(self, path):
+        fm = self.fm
+        fm.current_path = path
+        fm.selected_idx = 0
+        fm.refresh_files()
+        self.wait_until(lambda: fm.view_sorted and not fm.loading)
+
+    def listing(self, path, label):
+        fm = self.fm
+        for _ in range(self.repeat):
+            fm.dir_cache.pop(path, None)
+            fm.current_path = path
+            start = time.perf_counter()
+            fm.refresh_files()
+            self.wait_until(lambda: len(fm.files) > 0)
+            self.record(f"listing.first_result/{label}", 'ms', ms_since(start))
+            self.wait_until(lambda: fm.view_sorted and not fm.loading)
+            self.record(f"listing.full/{label}", 'ms', ms_since(start))
+            start = time.perf_counter()
+            fm.refresh_files()
+            self.record(f"listing.cached/{label}", 'ms', ms_since(start))
+
+    def render(self, name):
+        fm = self.fm
+        written = self.screen.bytes_written
+        start = time.perf_counter()
+        fm.render()
+        self.record(name, 'ms', ms_since(start))
+        self.record(f"{name}.bytes", 'B', self.screen.bytes_written - written)
+
+    def frames_in(self, path, label):
+        fm = self.fm
+        self.open(path)
+        for _ in range(self.repeat):
+            fm.mark_dirty()
+            self.render(f"frame.full/{label}")
+        for _ in range(self.frames):
+            fm.handle_input(fakescreen.curses.KEY_DOWN)
+            fm.mark_dirty('header', 'list', 'footer')
+            self.render(f"frame.scroll/{label}")
+        for _ in range(self.frames):
+            fm.mark_dirty('header', 'list', 'footer')
+            self.render(f"frame.idle/{label}")
+
+    def search(self, path, label, predicate=None):
+        fm = self.fm
+        kind = 'search.find' if predicate is not None else 'search.index'
+        for i in range(self.repeat):
+            if fm.search_mode:
+                fm.cancel_search()
+            fm.current_path = path
+            start = time.perf_counter()
+            fm.start_search(predicate)
+            self.wait_until(lambda: len(fm.search_results) > 0 or not fm.search_active)
+            first = ms_since(start)
+            self.wait_until(lambda: not fm.search_active)
+            full = ms_since(start)
+            # The first index search builds the index; report it on its own
+            name = f"{kind}.cold" if predicate is None and i == 0 else kind
+            self.record(f"{name}.first_result/{label}", 'ms', first)
+            self.record(f"{name}.full/{label}", 'ms', full)
+            self.record(f"{name}.rate/{label}", 'entries/s', len(fm.search_results) / (full / 1000))
+
+    def filter(self, path, label, query='e_01'):
+        fm = self.fm
+        if not fm.search_mode:
+            self.search(path, label)
+        for fuzzy in (False, True):
+            if fm.fuzzy_mode != fuzzy:
+                fm.handle_search_input(9)  # TAB
+            name = 'filter.fuzzy' if fuzzy else 'filter.substring'
+            for _ in range(self.repeat):
+                for key in [ord(c) for c in query] + [127] * len(query):
+                    start = time.perf_counter()
+                    fm.handle_search_input(key)
+                    self.wait_until(lambda: not (fm.fuzzy and fm.fuzzy.pending))
+                    fm.mark_dirty('header', 'list', 'footer')
+                    fm.render()
+                    self.record(f"{name}.keystroke/{label}", 'ms', ms_since(start))
+        fm.cancel_search()
+
+    def paste(self, src, label, scratch):
+        fm = self.fm
+        sources = sorted(os.path.join(src, name) for name in os.listdir(src) if name != trees.MARKER)
+        total, files = tree_bytes(src)
+        for _ in range(self.repeat):
+            dest = tempfile.mkdtemp(prefix='paste-', dir=scratch)
+            try:
+                self.open(dest)
+                fm.clipboard = {'files': sources, 'operation': 'copy'}
+                start = time.perf_counter()
+                fm.paste_files()
+                self.wait_until(lambda: not fm.jobs.busy())
+                elapsed = time.perf_counter() - start
+                fm.finish_jobs()
+                self.record(f"paste.throughput/{label}", 'MB/s', total / elapsed / 1e6)
+                self.record(f"paste.files/{label}", 'files/s', files / elapsed)
+            finally:
+                shutil.rmtree(dest, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, previous=None):
+    print(f"{'operation':<44} {'unit':>9} {'n':>5} {'p50':>10} {'p90':>10} {'p99':>10} {'max':>10}"
+          + ("   vs p50" if previous else ""))
+    for name, stats in results.items():
+        line = (f"{name:<44} {stats['unit']:>9} {stats['n']:>5} {stats['p50']:>10.2f} "
+                f"{stats['p90']:>10.2f} {stats['p99']:>10.2f} {stats['max']:>10.2f}")
+        old = (previous or {}).get(name)
+        if old and old['p50']:
+            change = (stats['p50'] - old['p50']) / old['p50'] * 100
+            better = (change > 0) == (stats['unit'] in HIGHER_IS_BETTER)
+            line += f"   {change:+6.1f}% {'better' if better else 'worse'}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base', default=os.path.join(tempfile.gettempdir(), 'pyfiler-trees'),
+                        help="where the synthetic trees are built and kept between runs")
+    parser.add_argument('--scale', type=float, default=1.0, help="tree size factor (0.1 for a quick run)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help="samples per cold operation")
+    parser.add_argument('--frames', type=int, default=200, help="frames per render measurement")
+    parser.add_argument('--only', default=','.join(OPERATIONS), help="comma separated operations")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="earlier --json output to compare with")
+    args = parser.parse_args()
+    operations = args.only.split(',')
+
+    # Keep the search index and hash caches of the benchmark away from the user's
+    os.environ['XDG_CACHE_HOME'] = cache = tempfile.mkdtemp(prefix='pyfiler-bench-cache-')
+    fakescreen.install()
+    from explorer import FileManager, SearchQuery
+
+    roots = {}
+    for shape in trees.SHAPES:
+        if shape == 'few-huge' and 'paste' not in operations:
+            continue
+        start = time.perf_counter()
+        roots[shape] = trees.ensure(args.base, shape, args.scale, args.seed)
+        print(f"tree {shape:14} {time.perf_counter() - start:6.1f}s  {roots[shape]}", file=sys.stderr)
+
+    screen = fakescreen.FakeScreen()
+    os.chdir(roots['wide'])
+    fm = FileManager(screen)
+    suite = Suite(fm, screen, args.repeat, args.frames)
+    steps = {
+        'listing': lambda: [suite.listing(roots[shape], shape) for shape in ('wide', 'many-small')],
+        'frames': lambda: suite.frames_in(roots['wide'], 'wide'),
+        'search': lambda: [suite.search(roots[shape], shape) for shape in ('many-small', 'deep', 'symlink-heavy')]
+                          + [suite.search(roots['many-small'], 'many-small', SearchQuery('*.py size:>4k'))],
+        'filter': lambda: suite.filter(roots['many-small'], 'many-small'),
+        'paste': lambda: [suite.paste(roots[shape], shape, args.base) for shape in ('few-huge', 'many-small')],
+    }
+    try:
+        for operation in operations:
+            start = time.perf_counter()
+            steps[operation]()
+            print(f"ran {operation:10} {time.perf_counter() - start:6.1f}s", file=sys.stderr)
+    finally:
+        fm.jobs.pool.shutdown(wait=False)
+        shutil.rmtree(cache, ignore_errors=True)
+
+    results = {name: dict(unit=unit, **percentiles(samples)) for name, (unit, samples) in suite.results.items()}
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+    report(results, previous)
+    if args.json:
+        meta = {'revision': git_revision(), 'python': platform.python_version(),
+                'platform': platform.platform(), 'cpus': os.cpu_count(), 'scale': args.scale,
+                'seed': args.seed, 'repeat': args.repeat, 'frames': args.frames, 'time': time.time()}
+        with open(args.json, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
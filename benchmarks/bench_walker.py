@@ -0,0 +1,97 @@
+"""Compare the legacy os.walk search loop with ParallelWalker
+
+Builds a synthetic tree (1M entries by default) and reports entries/second
+for the old single-threaded walk, the same walk without its sleeps, and
+ParallelWalker at several worker counts.
+
+    python benchmarks/bench_walker.py --entries 1000000 --workers 1,4,16,32
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from explorer import ParallelWalker, path_range
+from trees import make_tree
+
+
+def legacy_walk(base_path, sleep=True, batch_size=50):
+    """The pre-ParallelWalker perform_search_action loop"""
+    results = []
+    batch = []
+    for root, dirs, files in os.walk(base_path):
+        for entry in list(dirs) + files:
+            batch.append(os.path.relpath(os.path.join(root, entry), base_path))
+            if len(batch) >= batch_size:
+                results.extend(batch)
+                batch = []
+                if sleep:
+                    time.sleep(0.01)
+    results.extend(batch)
+    return len(results)
+
+
+def parallel_walk(base_path, workers):
+    prefix_len = len(path_range(base_path)[0])
+    lock = threading.Lock()
+    count = [0]
+
+    def visit(dirpath):
+        names = []
+        subdirs = []
+        with os.scandir(dirpath) as scan:
+            for entry in scan:
+                names.append(entry.path[prefix_len:])
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+        with lock:
+            count[0] += len(names)
+        return subdirs
+
+    ParallelWalker(visit, workers=workers).run(base_path)
+    return count[0]
+
+
+def measure(label, fn):
+    start = time.perf_counter()
+    found = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {found:>10} entries {elapsed:>8.2f}s {found / elapsed:>12.0f} entries/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000000)
+    parser.add_argument('--workers', default='1,4,16,32')
+    parser.add_argument('--root', help="existing tree to walk instead of a synthetic one")
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help="skip the sleeping legacy walker (~200s at 1M entries)")
+    args = parser.parse_args()
+
+    tmp = None
+    root = args.root
+    if root is None:
+        tmp = tempfile.mkdtemp(prefix='pyfiler-bench-')
+        root = tmp
+        start = time.perf_counter()
+        created = make_tree(root, args.entries)
+        print(f"created {created} entries in {time.perf_counter() - start:.1f}s under {root}")
+
+    try:
+        if not args.skip_legacy:
+            measure("os.walk + sleep (legacy)", lambda: legacy_walk(root))
+        measure("os.walk, no sleep", lambda: legacy_walk(root, sleep=False))
+        for workers in (int(w) for w in args.workers.split(',')):
+            measure(f"ParallelWalker x{workers}", lambda: parallel_walk(root, workers))
+    finally:
+        if tmp:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
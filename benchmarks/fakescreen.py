@@ -0,0 +1,77 @@
+"""A stand-in for the curses screen so FileManager runs without a terminal
+
+install() replaces the curses functions that need initscr() with no-ops;
+FakeScreen implements the window methods FileManager calls, counts the
+bytes it would have sent, and feeds getch()/getstr() from a scripted queue.
+"""
+import curses
+from collections import deque
+
+
+def install():
+    """Make the module-level curses calls FileManager makes safe without a terminal"""
+    for name in ('start_color', 'use_default_colors', 'init_pair', 'curs_set', 'doupdate',
+                 'echo', 'noecho', 'cbreak', 'nocbreak'):
+        setattr(curses, name, lambda *args: None)
+    curses.color_pair = lambda n: n << 8
+    for name, char in (('ACS_HLINE', '-'), ('ACS_VLINE', '|'), ('ACS_ULCORNER', '+'),
+                       ('ACS_URCORNER', '+'), ('ACS_LLCORNER', '+'), ('ACS_LRCORNER', '+')):
+        setattr(curses, name, ord(char))
+
+
+class FakeScreen:
+    def __init__(self, height=50, width=160, keys=()):
+        self.height = height
+        self.width = width
+        self.keys = deque(keys)
+        self.bytes_written = 0
+        self.writes = 0
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def addstr(self, y, x, text, attr=0):
+        self.writes += 1
+        self.bytes_written += len(text.encode('utf-8'))
+
+    def addch(self, y, x, char, attr=0):
+        self.writes += 1
+        self.bytes_written += 1
+
+    def hline(self, y, x, char, n):
+        self.writes += 1
+        self.bytes_written += n
+
+    def vline(self, y, x, char, n):
+        self.writes += 1
+        self.bytes_written += n
+
+    def getch(self):
+        return self.keys.popleft() if self.keys else -1
+
+    def getstr(self, y, x, n):
+        return str(self.keys.popleft() if self.keys else '').encode()[:n]
+
+    def erase(self):
+        pass
+
+    def move(self, y, x):
+        pass
+
+    def clrtoeol(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+    def timeout(self, ms):
+        pass
+
+    def nodelay(self, flag):
+        pass
+
+    def keypad(self, flag):
+        pass
@@ -0,0 +1,180 @@
+"""Deterministic synthetic trees for the benchmarks
+
+Every generator is seeded, so the same shape, scale and seed always give the
+same names, sizes and contents. ensure() builds a tree once and reuses it on
+later runs.
+
+    python benchmarks/trees.py /tmp/pyfiler-trees --shape many-small --scale 0.1
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+
+EXTENSIONS = ('.txt', '.py', '.log', '.json', '.png', '.tar.gz', '.md', '')
+MARKER = '.pyfiler-bench'
+
+
+def make_tree(root, entries, fanout=20, files_per_dir=50):
+    """Create roughly `entries` empty files and directories below root, breadth first"""
+    created = 0
+    level = [root]
+    while created < entries:
+        next_level = []
+        for parent in level:
+            for i in range(files_per_dir):
+                if created >= entries:
+                    return created
+                open(os.path.join(parent, f"file_{i:03d}.txt"), 'w').close()
+                created += 1
+            for i in range(fanout):
+                if created >= entries:
+                    return created
+                path = os.path.join(parent, f"dir_{i:02d}")
+                os.mkdir(path)
+                next_level.append(path)
+                created += 1
+        level = next_level
+    return created
+
+
+def _name(rng, i):
+    stem = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz_') for _ in range(rng.randint(4, 14)))
+    return f"{stem}_{i:06d}{rng.choice(EXTENSIONS)}"
+
+
+def _write(path, rng, size):
+    with open(path, 'wb') as f:
+        f.write(rng.randbytes(size))
+
+
+def make_wide(root, scale=1.0, seed=0):
+    """One directory holding 100k files (at scale 1)"""
+    rng = random.Random(seed)
+    count = max(1, int(100000 * scale))
+    for i in range(count):
+        open(os.path.join(root, _name(rng, i)), 'w').close()
+    return count
+
+
+def make_deep(root, scale=1.0, seed=0):
+    """A chain of 400 nested directories with 20 small files at each level"""
+    rng = random.Random(seed)
+    depth = max(2, int(400 * scale))
+    path = root
+    created = 0
+    for level in range(depth):
+        for i in range(20):
+            _write(os.path.join(path, _name(rng, i)), rng, rng.randint(0, 512))
+            created += 1
+        path = os.path.join(path, f"d{level % 100:02d}")
+        os.mkdir(path)
+        created += 1
+    return created
+
+
+def make_many_small(root, scale=1.0, seed=0):
+    """200k entries spread over a fanned-out tree; files of 0 to 8 KB"""
+    rng = random.Random(seed)
+    entries = max(1, int(200000 * scale))
+    created = 0
+    level = [root]
+    while created < entries:
+        next_level = []
+        for parent in level:
+            for i in range(50):
+                if created >= entries:
+                    return created
+                _write(os.path.join(parent, _name(rng, i)), rng, rng.randint(0, 8192))
+                created += 1
+            for i in range(10):
+                if created >= entries:
+                    return created
+                path = os.path.join(parent, f"dir_{i:02d}")
+                os.mkdir(path)
+                next_level.append(path)
+                created += 1
+        level = next_level
+    return created
+
+
+def make_few_huge(root, scale=1.0, seed=0):
+    """Four 256 MB files; a seeded 1 MB block is repeated to fill them"""
+    rng = random.Random(seed)
+    size = max(1 << 20, int((256 << 20) * scale))
+    for i in range(4):
+        block = rng.randbytes(1 << 20)
+        with open(os.path.join(root, f"huge_{i}.bin"), 'wb') as f:
+            for _ in range(size >> 20):
+                f.write(block)
+    return 4
+
+
+def make_symlink_heavy(root, scale=1.0, seed=0):
+    """20k entries where most are symlinks: to files, to directories, dangling, and a loop"""
+    rng = random.Random(seed)
+    entries = max(10, int(20000 * scale))
+    targets = os.path.join(root, 'targets')
+    os.mkdir(targets)
+    files = []
+    for i in range(max(1, entries // 5)):
+        path = os.path.join(targets, _name(rng, i))
+        _write(path, rng, rng.randint(0, 1024))
+        files.append(path)
+    links = os.path.join(root, 'links')
+    os.mkdir(links)
+    created = len(files)
+    i = 0
+    while created < entries:
+        kind = rng.random()
+        name = os.path.join(links, f"link_{i:06d}")
+        if kind < 0.7:
+            os.symlink(rng.choice(files), name)
+        elif kind < 0.85:
+            os.symlink(targets, name)
+        else:
+            os.symlink(os.path.join(targets, f"missing_{i}"), name)
+        created += 1
+        i += 1
+    os.symlink(root, os.path.join(links, 'loop'))
+    return created + 1
+
+
+SHAPES = {
+    'wide': make_wide,
+    'deep': make_deep,
+    'many-small': make_many_small,
+    'few-huge': make_few_huge,
+    'symlink-heavy': make_symlink_heavy,
+}
+
+
+def ensure(base, shape, scale=1.0, seed=0):
+    """Path of the tree for (shape, scale, seed) below base, building it if needed"""
+    root = os.path.join(base, f"{shape}-{scale:g}-{seed}")
+    if os.path.exists(os.path.join(root, MARKER)):
+        return root
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    SHAPES[shape](root, scale, seed)
+    open(os.path.join(root, MARKER), 'w').close()
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('--shape', choices=SHAPES, action='append', help="default: all shapes")
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for shape in args.shape or SHAPES:
+        start = time.perf_counter()
+        root = ensure(args.base, shape, args.scale, args.seed)
+        print(f"{shape:14} {root}  ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
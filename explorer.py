@@ -1,19 +1,3245 @@
 #original
+import argparse
+import asyncio
+import builtins
+import cProfile
+import functools
 import os
+import stat as stat_module
 import curses
 import shutil
+import signal
 import sys
+import tempfile
 from datetime import datetime
 import time
 import psutil
 import platform
 import subprocess
-from functools import lru_cache
 import threading
-from collections import deque
+import ctypes
+import ctypes.util
+import struct
+import errno
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+import sqlite3
+import gzip
+import json
+import hashlib
+import zipfile
+import tarfile
+import multiprocessing
+import mmap
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import re
+import fnmatch
+import heapq
+from array import array
+from bisect import bisect_right
+from collections import deque, OrderedDict
+
+
+def get_cache_dir():
+    """Per-user cache directory for PyFiler state"""
+    if platform.system() == 'Windows':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pyfiler')
+
+
+def path_range(base):
+    """Return (low, high) bounds matching every path strictly below base"""
+    prefix = base if base.endswith(os.sep) else base + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+DEFAULT_WALK_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+LISTING_CACHE_BUDGET = int(os.environ.get('PYFILER_CACHE_MB', '256')) * 1024 * 1024
+PREFETCH_WORKERS = int(os.environ.get('PYFILER_PREFETCH', '2'))  # 0 turns prefetching off
+PREFETCH_HISTORY = 4  # most recent history entries kept prefetched
+
+
+class ParallelWalker:
+    """Work-stealing directory walker
+
+    visit(dirpath) runs on one of the worker threads and returns the
+    subdirectories to descend into. Each worker pushes the directories it
+    discovers onto its own deque and pops from the same end (depth first);
+    an idle worker steals from the opposite end of another worker's deque.
+    Latency-bound filesystems (NFS, SMB) are kept busy with many outstanding
+    scandir calls instead of one.
+    """
+
+    def __init__(self, visit, workers=DEFAULT_WALK_WORKERS, cancel=None):
+        self.visit = visit
+        self.workers = max(1, workers)
+        self.cancel_event = cancel or threading.Event()
+        self.threads = []
+        self._deques = [deque() for _ in range(self.workers)]
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    def start(self, root):
+        self._deques[0].append(root)
+        self._pending = 1
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(i,), daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def run(self, root):
+        self.start(root)
+        self.join()
+        return not self.cancelled()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def cancel(self):
+        self.cancel_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def _take(self, i):
+        try:
+            return self._deques[i].pop()
+        except IndexError:
+            pass
+        for offset in range(1, self.workers):
+            try:
+                return self._deques[(i + offset) % self.workers].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def _work(self, i):
+        own = self._deques[i]
+        while not self.cancel_event.is_set():
+            path = self._take(i)
+            if path is None:
+                with self._cond:
+                    if self._pending == 0:
+                        return
+                    self._cond.wait(0.05)
+                continue
+
+            try:
+                subdirs = self.visit(path)
+            except Exception:
+                subdirs = ()
+
+            with self._cond:
+                # Count new work before publishing it so _pending never
+                # reaches zero while directories are still queued
+                self._pending += len(subdirs) - 1
+                own.extend(subdirs)
+                if self._pending == 0:
+                    self._cond.notify_all()
+                elif subdirs:
+                    self._cond.notify(len(subdirs))
+
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.gz', '.bz2')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+
+def classify(name, is_dir, mode):
+    """File type used for colouring, derived from stat data only"""
+    if is_dir:
+        return 'directory'
+    if platform.system() != 'Windows' and mode & 0o111:
+        return 'executable'
+    ext = os.path.splitext(name)[1].lower()
+    if ext in ARCHIVE_EXTENSIONS:
+        return 'archive'
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    return 'default'
+
+
+def format_info(size, mtime):
+    """Size and date column shown next to files"""
+    size_str = f"{size / 1024:.1f}KB" if size < 1024 * 1024 else f"{size / (1024 * 1024):.1f}MB"
+    return f"{size_str}  {datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M')}"
+
+
+def format_size(size):
+    """Human readable size, e.g. 1.5MB"""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def progress_bar(progress, bar_width):
+    """Text progress bar with eighth-block resolution"""
+    filled = int(bar_width * progress)
+
+    bar_chars = ['▏', '▎', '▍', '▌', '▋', '▊', '▉']
+    fractional = int((bar_width * progress - filled) * len(bar_chars))
+
+    bar = '█' * filled
+    if progress < 1:
+        bar += bar_chars[fractional] if fractional > 0 else ''
+    return '[' + bar.ljust(bar_width) + ']'
+
+
+COPY_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+COPY_CHUNK = 8 * 1024 * 1024  # per syscall, so pause/cancel stay responsive
+FICLONE = 0x40049409
+# errnos meaning "this strategy doesn't work here", as opposed to a real I/O error
+COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL,
+                    errno.ENOTTY, errno.EBADF, errno.ENOTSOCK, errno.EPERM}
+
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+
+class CopyCancelled(Exception):
+    pass
+
+
+def _load_renameat2():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError, TypeError):
+        return None  # glibc < 2.28, or not Linux
+    renameat2.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint)
+    return renameat2
+
+
+_renameat2 = _load_renameat2() if sys.platform.startswith('linux') else None
+
+
+def rename_noreplace(src, dst):
+    """Rename src to dst, raising FileExistsError instead of replacing dst
+
+    Atomic on Linux (renameat2 with RENAME_NOREPLACE) and on Windows, where
+    os.rename never replaces. Elsewhere, or on filesystems without
+    RENAME_NOREPLACE, the existence check and rename are separate steps.
+    """
+    if _renameat2 is not None:
+        if _renameat2(AT_FDCWD, os.fsencode(src), AT_FDCWD, os.fsencode(dst), RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err not in (errno.ENOSYS, errno.EINVAL):
+            raise OSError(err, os.strerror(err), src, None, dst)
+    if os.name != 'nt' and os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
+    os.rename(src, dst)
+
+
+_copy_buffers = threading.local()
+
+
+def _data_segments(fd, size):
+    """(offset, length) of the data regions of a file, skipping sparse holes"""
+    if not hasattr(os, 'SEEK_DATA'):
+        return [(0, size)]
+    segments = []
+    offset = 0
+    try:
+        while offset < size:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+            end = os.lseek(fd, start, os.SEEK_HOLE)
+            segments.append((start, end - start))
+            offset = end
+    except OSError as e:
+        if e.errno == errno.ENXIO:  # no data after offset: the rest is a hole
+            return segments
+        return [(0, size)]
+    return segments
+
+
+def _copy_range(fsrc, fdst, offset, length):
+    return os.copy_file_range(fsrc, fdst, min(length, COPY_CHUNK), offset, offset)
+
+
+def _copy_sendfile(fsrc, fdst, offset, length):
+    os.lseek(fdst, offset, os.SEEK_SET)
+    return os.sendfile(fdst, fsrc, offset, min(length, COPY_CHUNK))
+
+
+def _copy_buffered(fsrc, fdst, offset, length):
+    buf = getattr(_copy_buffers, 'buf', None)
+    if buf is None:
+        buf = _copy_buffers.buf = bytearray(COPY_CHUNK)
+    view = memoryview(buf)[:min(length, COPY_CHUNK)]
+    os.lseek(fsrc, offset, os.SEEK_SET)
+    os.lseek(fdst, offset, os.SEEK_SET)
+    n = os.readv(fsrc, [view]) if hasattr(os, 'readv') else _read_into(fsrc, view)
+    written = 0
+    while written < n:
+        written += os.write(fdst, view[written:n])
+    return n
+
+
+def _read_into(fd, view):
+    data = os.read(fd, len(view))
+    view[:len(data)] = data
+    return len(data)
+
+
+COPY_STRATEGIES = [(name, fn) for name, fn, available in (
+    ('copy_file_range', _copy_range, hasattr(os, 'copy_file_range')),
+    ('sendfile', _copy_sendfile, hasattr(os, 'sendfile')),
+    ('buffered', _copy_buffered, True),
+) if available]
+
+
+def copy_file(src, dst, job):
+    """Copy one regular file with its metadata; returns the strategy that did it
+
+    Tries a reflink (FICLONE, instant on btrfs/XFS), then copy_file_range,
+    sendfile and finally a large-buffer read/write loop, moving on when the
+    filesystem pair doesn't support one. Holes in sparse files are skipped
+    (SEEK_DATA/SEEK_HOLE) and re-created by truncating to the full size.
+    Bytes are reported to job as they land; job.checkpoint() is polled
+    between chunks for pause and cancel.
+
+    The data goes to a temporary file next to dst that replaces it only
+    once complete, so a failed or cancelled overwrite leaves the old file
+    intact. Raises shutil.SameFileError if dst already is src.
+    """
+    flags = getattr(os, 'O_BINARY', 0)
+    fsrc = os.open(src, os.O_RDONLY | flags)
+    try:
+        st = os.fstat(fsrc)
+        try:
+            existing = os.stat(dst)
+        except FileNotFoundError:
+            existing = None
+        if existing is not None and (existing.st_dev, existing.st_ino) == (st.st_dev, st.st_ino):
+            raise shutil.SameFileError(f"{src} and {dst} are the same file")
+        fdst, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(dst)}.", suffix='.part',
+                                     dir=os.path.dirname(dst) or '.')
+        try:
+            try:
+                strategy = _copy_fds(fsrc, fdst, job)
+            finally:
+                os.close(fdst)
+            shutil.copystat(src, tmp)
+            os.replace(tmp, dst)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return strategy
+    finally:
+        os.close(fsrc)
+
+
+def _copy_fds(fsrc, fdst, job):
+    if not job.checkpoint():
+        raise CopyCancelled()
+    st = os.fstat(fsrc)
+    size = st.st_size
+    if fcntl is not None and size:
+        try:
+            fcntl.ioctl(fdst, FICLONE, fsrc)
+            job.add_bytes(size)
+            return 'reflink'
+        except OSError as e:
+            if e.errno not in COPY_UNSUPPORTED:
+                raise
+
+    sparse = hasattr(st, 'st_blocks') and st.st_blocks * 512 < size
+    segments = _data_segments(fsrc, size) if sparse else [(0, size)]
+    strategies = list(COPY_STRATEGIES)
+    name, copy = strategies.pop(0)
+    copied = False
+    for offset, length in segments:
+        while length > 0:
+            if not job.checkpoint():
+                raise CopyCancelled()
+            try:
+                n = copy(fsrc, fdst, offset, length)
+            except OSError as e:
+                # Fall back only while nothing has been written with this strategy
+                if e.errno not in COPY_UNSUPPORTED or copied or not strategies:
+                    raise
+                name, copy = strategies.pop(0)
+                continue
+            if n == 0:
+                break  # file shrank under us
+            copied = True
+            offset += n
+            length -= n
+            job.add_bytes(n)
+    if sparse:
+        os.ftruncate(fdst, size)
+    return 'sparse ' + name if sparse else name
+
+
+class Job:
+    """Background file operation run by a JobQueue, with pause and cancel
+
+    Subclasses implement run(pool), status() for the footer, summary() for
+    the completion message and deltas() for the cached listings to update.
+    """
+
+    label = 'Working'
+
+    def __init__(self):
+        self.errors = []
+        self.started = None
+        self.finished = None
+        self._paused_at = None
+        self._paused_for = 0.0
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._running.set()
+        self._cancel = threading.Event()
+
+    def pause(self):
+        if self._running.is_set():
+            self._paused_at = time.time()
+            self._running.clear()
+
+    def resume(self):
+        if not self._running.is_set():
+            self._paused_for += time.time() - self._paused_at
+            self._running.set()
+
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        self._running.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def checkpoint(self):
+        """Block while paused; False once the job is cancelled"""
+        self._running.wait()
+        return not self._cancel.is_set()
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        end = self.finished or (self._paused_at if self.paused() else time.time())
+        return max(1e-6, end - self.started - self._paused_for)
+
+    def error(self, path, e):
+        self.errors.append(f"{os.path.basename(path) or path}: {e.strerror or e}")
+
+    def status(self):
+        return self.label
+
+    def summary(self):
+        return None
+
+    def deltas(self):
+        return []
+
+
+class CopyJob(Job):
+    """A paste running in the background
+
+    The sources are planned first (directories to create, files with their
+    sizes) so progress can be reported in bytes, then files are copied in
+    parallel on the job queue's worker pool. A cut is a rename where the
+    filesystem allows it, and a copy followed by deleting the source
+    otherwise. Targets are only replaced for sources in overwrite; the
+    others fail if the target appeared meanwhile. Symlinks are recreated,
+    not followed.
+    """
+
+    def __init__(self, operation, sources, dest_dir, overwrite=(), skipped=0):
+        super().__init__()
+        self.operation = operation
+        self.sources = sources
+        self.dest_dir = dest_dir
+        self.overwrite = set(overwrite)  # sources the user agreed may replace an existing target
+        self.placed = []  # (src, dst) of every item that made it to the destination
+        self.events = []  # listing deltas for the placed items, gathered on the worker thread
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.total_files = 0
+        self.done_files = 0
+        self.done_items = 0
+        self.skipped = skipped
+        self.planned = False
+        self.strategies = {}  # copy strategy -> files copied with it
+
+    @property
+    def label(self):
+        return 'Copying' if self.operation == 'copy' else 'Moving'
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.done_bytes += n
+
+    def rate(self):
+        return self.done_bytes / self.elapsed() if self.started else 0.0
+
+    def eta(self):
+        rate = self.rate()
+        if not self.planned or not rate:
+            return None
+        return (self.total_bytes - self.done_bytes) / rate
+
+    def status(self):
+        if not self.planned:
+            return f"{self.label}: scanning {len(self.sources)} items"
+        progress = self.done_bytes / self.total_bytes if self.total_bytes else 1.0
+        eta = self.eta()
+        eta_text = f"ETA {int(eta) // 60}:{int(eta) % 60:02d}" if eta is not None else "ETA --:--"
+        return (f"{self.label} {self.done_files}/{self.total_files} files "
+                f"{progress_bar(progress, 20)} {format_size(self.done_bytes)}/"
+                f"{format_size(self.total_bytes)} {format_size(self.rate())}/s {eta_text}")
+
+    def summary(self):
+        if self.cancelled():
+            result_msg = f"{self.label} cancelled after {self.done_items} items"
+        else:
+            result_msg = f"Pasted {self.done_items} items"
+        if self.skipped:
+            result_msg += f", skipped {self.skipped}"
+        if self.strategies:
+            result_msg += " (" + ", ".join(f"{name}: {count}" for name, count in
+                                           sorted(self.strategies.items())) + ")"
+        if self.errors:
+            result_msg += f", {len(self.errors)} errors (first: {self.errors[0]})"
+        return result_msg
+
+    def deltas(self):
+        return self.events
+
+    def _record(self, src, dst, moved):
+        """Note the listing deltas of a placed item, with its stat, off the UI thread"""
+        try:
+            st = os.stat(dst)
+        except OSError:
+            st = None
+        self.events.append((os.path.dirname(dst), 'add', os.path.basename(dst), st))
+        if moved:
+            self.events.append((os.path.dirname(src), 'remove', os.path.basename(src)))
+
+    def _plan(self, src, dst, dirs, files, links):
+        if os.path.islink(src):
+            links.append((src, dst))
+        elif os.path.isdir(src):
+            dirs.append((src, dst))
+            with os.scandir(src) as scan:
+                for entry in scan:
+                    self._plan(entry.path, os.path.join(dst, entry.name), dirs, files, links)
+        else:
+            size = os.stat(src).st_size
+            files.append((src, dst, size))
+            self.total_bytes += size
+            self.total_files += 1
+
+    def run(self, pool):
+        self.started = time.time()
+        plans = []
+        for src in self.sources:
+            dst = os.path.join(self.dest_dir, os.path.basename(src))
+            if self.cancelled():
+                break
+            try:
+                if (dst + os.sep).startswith(src + os.sep):
+                    raise OSError(errno.EINVAL, "cannot paste a directory into itself")
+                if os.path.exists(dst) and os.path.samefile(src, dst):
+                    # The destination reached through a symlink or bind mount
+                    raise shutil.SameFileError(f"{src} and {dst} are the same file")
+                if self.operation == 'cut' and self._rename(src, dst):
+                    self.placed.append((src, dst))
+                    self._record(src, dst, True)
+                    self.done_items += 1
+                    continue
+                if src not in self.overwrite and os.path.lexists(dst):
+                    raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST))
+                plan = ([], [], [])
+                self._plan(src, dst, *plan)
+                plans.append((src, plan))
+            except OSError as e:
+                self.error(src, e)
+        self.planned = True
+
+        for src, (dirs, files, links) in plans:
+            if self.cancelled():
+                break
+            dst = os.path.join(self.dest_dir, os.path.basename(src))
+            self.placed.append((src, dst))  # possibly partial, but present
+            moved = False
+            if self._copy_tree(pool, dirs, files, links):
+                if self.operation == 'cut':
+                    try:
+                        if os.path.isdir(src) and not os.path.islink(src):
+                            shutil.rmtree(src)
+                        else:
+                            os.remove(src)
+                        moved = True
+                    except OSError as e:
+                        self.error(src, e)
+                        self._record(src, dst, False)
+                        continue
+                self.done_items += 1
+            self._record(src, dst, moved)
+        self.finished = time.time()
+
+    def _rename(self, src, dst):
+        """Move within one filesystem; False if it has to be copied instead"""
+        try:
+            if src not in self.overwrite:
+                rename_noreplace(src, dst)
+            elif os.path.isdir(dst) and not os.path.islink(dst):
+                return False  # merge into the existing directory
+            else:
+                os.replace(src, dst)
+            return True
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                return False
+            raise
+
+    def _copy_tree(self, pool, dirs, files, links):
+        """Copy one planned source; True if every part of it was copied"""
+        errors = len(self.errors)
+        for src, dst in dirs:
+            try:
+                os.makedirs(dst, exist_ok=True)
+            except OSError as e:
+                self.errors.append(f"{dst}: {e.strerror or e}")
+                return False
+        for src, dst in links:
+            try:
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                os.symlink(os.readlink(src), dst)
+            except OSError as e:
+                self.errors.append(f"{dst}: {e.strerror or e}")
+
+        def copy(src, dst):
+            if self.cancelled():
+                return
+            try:
+                strategy = copy_file(src, dst, self)
+            except OSError as e:
+                self.errors.append(f"{dst}: {e.strerror or e}")
+            else:
+                with self._lock:
+                    self.done_files += 1
+                    self.strategies[strategy] = self.strategies.get(strategy, 0) + 1
+
+        futures = [pool.submit(copy, src, dst) for src, dst, _ in files]
+        for future in futures:
+            try:
+                future.result()
+            except CopyCancelled:
+                pass
+        for src, dst in reversed(dirs):
+            try:
+                shutil.copystat(src, dst)
+            except OSError:
+                pass
+        return len(self.errors) == errors and not self.cancelled()
+
+
+USE_TRASH = os.environ.get('PYFILER_TRASH', '1') != '0'
+DIR_FD_DELETE = {os.open, os.unlink, os.rmdir} <= os.supports_dir_fd and os.scandir in os.supports_fd
+OPEN_DIR_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_NOFOLLOW', 0)
+
+
+def trash_dir_for(path):
+    """A directory on path's filesystem that path can be renamed into, or None"""
+    try:
+        dev = os.lstat(path).st_dev
+        trash = os.path.join(get_cache_dir(), 'trash')
+        os.makedirs(trash, exist_ok=True)
+        if os.stat(trash).st_dev == dev:
+            return trash
+        # Other filesystem: a hidden directory next to the target, removed by the purge
+        parent = os.path.dirname(path)
+        if os.stat(parent).st_dev != dev:
+            return None  # path is a mount point
+        trash = os.path.join(parent, '.pyfiler-trash')
+        register_trash_dir(trash)
+        os.makedirs(trash, exist_ok=True)
+        return trash
+    except OSError:
+        return None
+
+
+def trash_registry():
+    return os.path.join(get_cache_dir(), 'trash-dirs')
+
+
+def trash_dirs():
+    """The per-filesystem trash directories recorded by register_trash_dir"""
+    try:
+        with open(trash_registry(), encoding='utf-8', errors='surrogateescape') as f:
+            return [line.rstrip('\n') for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def register_trash_dir(trash):
+    """Record a trash directory outside the cache, so a later session purges it
+
+    Written before anything is moved into it: if the app quits mid-purge,
+    the next start still knows where deleted data is waiting.
+    """
+    if trash in trash_dirs():
+        return
+    with open(trash_registry(), 'a', encoding='utf-8', errors='surrogateescape') as f:
+        f.write(trash + '\n')
+
+
+class DeleteJob(Job):
+    """Remove files and trees in the background
+
+    Trees are removed through directory file descriptors (scandir on the
+    fd, unlink/rmdir relative to it), so paths are never re-resolved and
+    the walk can't be redirected by a symlink swapped in mid-delete. The
+    subdirectories of each target are removed in parallel on the pool.
+    With purge_parent set the job empties a trash directory and then
+    removes it if it is one of the per-filesystem ones.
+    """
+
+    label = 'Deleting'
+
+    def __init__(self, targets, quiet=False, purge_parent=None):
+        super().__init__()
+        self.targets = targets
+        self.quiet = quiet
+        self.purge_parent = purge_parent
+        self.removed = 0
+        self.deleted = []
+
+    def rate(self):
+        return self.removed / self.elapsed() if self.started else 0.0
+
+    def status(self):
+        label = 'Emptying trash' if self.quiet else self.label
+        return f"{label}: {self.removed:,} entries removed ({self.rate():,.0f}/s)"
+
+    def summary(self):
+        if self.quiet and not self.errors:
+            return None
+        if self.cancelled():
+            result_msg = f"Delete cancelled after {self.removed:,} entries"
+        else:
+            result_msg = f"Deleted {len(self.deleted)} items"
+        if self.errors:
+            result_msg += f", {len(self.errors)} errors (first: {self.errors[0]})"
+        return result_msg
+
+    def deltas(self):
+        return [(os.path.dirname(path), 'remove', os.path.basename(path)) for path in self.deleted]
+
+    def _count(self, n=1):
+        with self._lock:
+            self.removed += n
+
+    def run(self, pool):
+        self.started = time.time()
+        for path in self.targets:
+            if not self.checkpoint():
+                break
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    if DIR_FD_DELETE:
+                        self._remove_target(pool, path)
+                    else:
+                        shutil.rmtree(path)
+                        self._count()
+                else:
+                    os.remove(path)
+                    self._count()
+                self.deleted.append(path)
+            except CopyCancelled:
+                break
+            except OSError as e:
+                self.error(path, e)
+        if self.purge_parent and os.path.basename(self.purge_parent) == '.pyfiler-trash':
+            try:
+                os.rmdir(self.purge_parent)
+            except OSError:
+                pass  # another purge still has entries in it
+        self.finished = time.time()
+
+    def _remove_target(self, pool, path):
+        parent_fd = os.open(os.path.dirname(path) or '.', OPEN_DIR_FLAGS)
+        try:
+            name = os.path.basename(path)
+            fd = os.open(name, OPEN_DIR_FLAGS, dir_fd=parent_fd)
+            try:
+                with os.scandir(fd) as scan:
+                    entries = list(scan)
+                subdirs = []
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    else:
+                        self._unlink(entry.name, fd, path)
+                futures = [pool.submit(self._remove_tree, fd, sub, os.path.join(path, sub))
+                           for sub in subdirs]
+                for future in futures:
+                    future.result()
+            finally:
+                os.close(fd)
+            if self.cancelled():
+                raise CopyCancelled()
+            os.rmdir(name, dir_fd=parent_fd)
+            self._count()
+        finally:
+            os.close(parent_fd)
+
+    def _unlink(self, name, dir_fd, parent):
+        try:
+            os.unlink(name, dir_fd=dir_fd)
+            self._count()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.error(os.path.join(parent, name), e)
+
+    def _remove_tree(self, parent_fd, name, path):
+        """Depth-first removal of one subtree, iterative so deep trees don't recurse"""
+        stack = []
+        try:
+            fd = os.open(name, OPEN_DIR_FLAGS, dir_fd=parent_fd)
+            with os.scandir(fd) as scan:
+                stack.append((fd, list(scan), parent_fd, name, path))
+            while stack:
+                if not self.checkpoint():
+                    return
+                fd, entries, dir_parent, dir_name, dir_path = stack[-1]
+                if not entries:
+                    stack.pop()
+                    os.close(fd)
+                    try:
+                        os.rmdir(dir_name, dir_fd=dir_parent)
+                        self._count()
+                    except OSError as e:
+                        self.error(dir_path, e)
+                    continue
+                entry = entries.pop()
+                if entry.is_dir(follow_symlinks=False):
+                    sub_path = os.path.join(dir_path, entry.name)
+                    try:
+                        sub = os.open(entry.name, OPEN_DIR_FLAGS, dir_fd=fd)
+                        with os.scandir(sub) as scan:
+                            stack.append((sub, list(scan), fd, entry.name, sub_path))
+                    except OSError as e:
+                        self.error(sub_path, e)
+                else:
+                    self._unlink(entry.name, fd, dir_path)
+        except OSError as e:
+            self.error(path, e)
+        finally:
+            for fd, *_ in stack:
+                os.close(fd)
+
+
+class JobQueue:
+    """Runs paste jobs one at a time on a background thread"""
+
+    def __init__(self, workers=COPY_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = deque()
+        self.finished = deque()
+        self.active = None
+        self.notify = None  # called from the worker thread when a job finishes
+        self._wake = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, job):
+        with self._wake:
+            self.pending.append(job)
+            self._wake.notify()
+
+    def jobs(self):
+        with self._wake:
+            return ([self.active] if self.active else []) + list(self.pending)
+
+    def busy(self):
+        return self.active is not None or bool(self.pending)
+
+    def wait(self, timeout=None):
+        """Block until no job is running or queued; False if timeout ran out first"""
+        with self._wake:
+            return self._wake.wait_for(lambda: not self.busy(), timeout)
+
+    def pop_finished(self):
+        jobs = []
+        while self.finished:
+            jobs.append(self.finished.popleft())
+        return jobs
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self.pending:
+                    self._wake.wait()
+                self.active = self.pending.popleft()
+            job = self.active
+            try:
+                job.run(self.pool)
+            except Exception as e:
+                job.errors.append(str(e))
+                job.finished = time.time()
+            with self._wake:
+                self.active = None
+                self._wake.notify_all()
+            self.finished.append(job)
+            if self.notify:
+                self.notify()
+
+
+class ContentSearch:
+    """Parallel grep over a tree, streaming "path:line: text" hits
+
+    A ParallelWalker lists the tree and feeds a bounded queue consumed by a
+    pool of scanner threads. Small files are read in one call, large ones
+    are scanned through mmap in line-aligned chunks so cancellation is
+    checked regularly and no chunk is copied whole. Files whose first block
+    contains a NUL byte are treated as binary and skipped.
+    """
+
+    SNIFF_BYTES = 8192
+    MMAP_THRESHOLD = 1 << 20
+    CHUNK_BYTES = 16 << 20
+    MAX_LINE = 200
+    HIT_RE = re.compile(r'^(.*?):(\d+): ')
+
+    def __init__(self, pattern, workers=DEFAULT_WALK_WORKERS, ignore_case=True):
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        self.pattern = pattern
+        self.regex = re.compile(pattern.encode('utf-8', 'surrogateescape'), flags)
+        self.workers = max(1, workers)
+        self.bytes_scanned = 0
+        self.files_scanned = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def hit_path(cls, hit):
+        """Relative path of a "path:line: text" hit"""
+        match = cls.HIT_RE.match(hit)
+        return match.group(1) if match else hit
+
+    def rate(self):
+        return self.bytes_scanned / max(time.time() - self.started, 1e-6)
+
+    def run(self, base_path, results, cancel, query=None):
+        prefix_len = len(path_range(base_path)[0])
+        files = queue.Queue(maxsize=4096)
+
+        def put(item):
+            while not cancel.is_set():
+                try:
+                    files.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def visit(dirpath):
+            subdirs = []
+            try:
+                with os.scandir(dirpath) as scan:
+                    for entry in scan:
+                        rel = entry.path[prefix_len:]
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                            is_file = not is_dir and entry.is_file(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if query is None or query.descend(rel, entry.name):
+                                subdirs.append(entry.path)
+                        elif is_file and (query is None or query.matches(
+                                rel, entry.name, False, lambda: entry.stat(follow_symlinks=False))):
+                            put((entry.path, rel))
+            except OSError:
+                return ()
+            return subdirs
+
+        self.started = time.time()
+        scanners = [threading.Thread(target=self._scan_loop, args=(files, results, cancel), daemon=True)
+                    for _ in range(self.workers)]
+        for thread in scanners:
+            thread.start()
+        ParallelWalker(visit, workers=self.workers, cancel=cancel).run(base_path)
+        for _ in scanners:
+            put(None)
+        for thread in scanners:
+            thread.join()
+
+    def _scan_loop(self, files, results, cancel):
+        while not cancel.is_set():
+            try:
+                item = files.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            self._scan_file(item[0], item[1], results, cancel)
+
+    def _scan_file(self, path, rel, results, cancel):
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(self.SNIFF_BYTES)
+                if b'\0' in head:
+                    return
+                size = os.fstat(f.fileno()).st_size
+                if size < self.MMAP_THRESHOLD:
+                    data = head + f.read()
+                    self._scan_buffer(data, 0, len(data), rel, results, 1)
+                    size = len(data)
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        size = len(mm)
+                        start, line = 0, 1
+                        while start < size and not cancel.is_set():
+                            end = min(start + self.CHUNK_BYTES, size)
+                            if end < size:
+                                newline = mm.find(b'\n', end)
+                                end = size if newline < 0 else newline + 1
+                            line = self._scan_buffer(mm, start, end, rel, results, line)
+                            start = end
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self.bytes_scanned += size
+            self.files_scanned += 1
+
+    def _scan_buffer(self, buf, start, end, rel, results, line):
+        """Report hits in buf[start:end]; returns the line number at end"""
+        hits = []
+        last = start
+        line_end = -1
+        for match in self.regex.finditer(buf, start, end):
+            pos = match.start()
+            if pos < line_end:
+                continue  # one hit per line
+            line += buf[last:pos].count(b'\n')
+            last = pos
+            line_start = buf.rfind(b'\n', start, pos) + 1 or start
+            line_end = buf.find(b'\n', pos, end)
+            if line_end < 0:
+                line_end = end
+            text = buf[line_start:min(line_end, line_start + self.MAX_LINE)]
+            hits.append(f"{rel}:{line}: {text.decode('utf-8', 'replace').strip()}")
+        if hits:
+            results.extend(hits)
+        return line + buf[last:end].count(b'\n')
+
+
+class FileIndex:
+    """Persistent SQLite index of paths, refreshed by comparing directory mtimes
+
+    Every scanned directory is stored with the mtime it had when it was listed.
+    A refresh stats each known directory and only re-lists the ones whose mtime
+    changed, so an unchanged tree costs one stat per directory instead of a
+    full listing.
+    """
+
+    COMMIT_EVERY = 500  # directories per transaction
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), 'index.db')
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                is_dir INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def iter_entries(self, base, batch_size=10000):
+        """Yield lists of (path, is_dir, size, mtime) rows below base in path order"""
+        low, high = path_range(base)
+        cursor = self.conn.execute(
+            "SELECT path, is_dir, size, mtime FROM entries WHERE path > ? AND path < ?",
+            (low, high))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+    def _children(self, parent):
+        return self.conn.execute(
+            "SELECT path, is_dir FROM entries WHERE parent = ?", (parent,)).fetchall()
+
+    def _drop_subtree(self, path):
+        low, high = path_range(path)
+        self.conn.execute("DELETE FROM entries WHERE path > ? AND path < ?", (low, high))
+        self.conn.execute("DELETE FROM dirs WHERE path = ? OR (path > ? AND path < ?)",
+                          (path, low, high))
+
+    def refresh(self, base, on_added=None, on_removed=None, cancel=None,
+                workers=None, descend=None):
+        """Bring the index for base up to date
+
+        Directories are stat'ed and listed concurrently by a ParallelWalker;
+        all database writes happen on the calling thread. on_added receives
+        lists of new rows, on_removed lists of paths that disappeared (a
+        removed directory implies its whole subtree). descend(path), if
+        given, decides which subdirectories are walked; the others keep
+        their indexed contents. Returns False if the refresh was cancelled
+        before finishing.
+        """
+        low, high = path_range(base)
+        known = dict(self.conn.execute(
+            "SELECT path, mtime FROM dirs WHERE path = ? OR (path > ? AND path < ?)",
+            (base, low, high)))
+        subdirs = {}
+        for path, parent in self.conn.execute(
+                "SELECT path, parent FROM entries WHERE is_dir = 1 AND path > ? AND path < ?",
+                (low, high)):
+            subdirs.setdefault(parent, []).append(path)
+        listed = queue.Queue()
+
+        def visit(dirpath):
+            try:
+                mtime = os.stat(dirpath).st_mtime
+            except OSError:
+                return ()
+            if known.get(dirpath) == mtime:
+                children = subdirs.get(dirpath, ())
+                return [path for path in children if descend(path)] if descend else children
+            rows = []
+            try:
+                with os.scandir(dirpath) as scan:
+                    for entry in scan:
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        rows.append((entry.path, dirpath, int(is_dir),
+                                     0 if is_dir else st.st_size, st.st_mtime))
+            except OSError:
+                return ()
+            listed.put((dirpath, mtime, rows))
+            return [row[0] for row in rows if row[2] and (descend is None or descend(row[0]))]
+
+        walker = ParallelWalker(visit, workers=workers or DEFAULT_WALK_WORKERS, cancel=cancel)
+        walker.start(base)
+        pending = 0
+        try:
+            while True:
+                try:
+                    dirpath, mtime, rows = listed.get(timeout=0.05)
+                except queue.Empty:
+                    if not walker.is_alive() and listed.empty():
+                        break
+                    continue
+                self._store_listing(dirpath, mtime, rows, on_added, on_removed)
+                pending += 1
+                if pending >= self.COMMIT_EVERY:
+                    self.conn.commit()
+                    pending = 0
+        except BaseException:
+            walker.cancel()
+            raise
+        finally:
+            walker.join()
+            self.conn.commit()
+        return not walker.cancelled()
+
+    def _store_listing(self, dirpath, mtime, rows, on_added, on_removed):
+        old = {path: is_dir for path, is_dir in self._children(dirpath)}
+        new_paths = {row[0] for row in rows}
+        removed = [path for path in old if path not in new_paths]
+        for path in removed:
+            self.conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            if old[path]:
+                self._drop_subtree(path)
+        self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (dirpath, mtime))
+
+        added = [(row[0], row[2], row[3], row[4]) for row in rows if row[0] not in old]
+        if removed and on_removed:
+            on_removed(removed)
+        if added and on_added:
+            on_added(added)
+
+
+SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+COMPARISONS = {
+    '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b,
+    '<=': lambda a, b: a <= b,
+    '=': lambda a, b: a == b,
+}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _split_comparison(value):
+    for op in ('>=', '<=', '>', '<', '='):
+        if value.startswith(op):
+            return op, value[len(op):]
+    return '=', value
+
+
+def _compile_glob(pattern):
+    return re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+
+
+class SearchQuery:
+    """Search query compiled once into predicates that run inside the walker
+
+    Space separated terms, all of which must match:
+
+        *.log  name:*.log   glob on the name (on the relative path if it has a /)
+        -node_modules       exclude a glob; matching directories are not entered
+        ext:log,txt         extension
+        size:>1G            file size (k/M/G/T suffixes, > < >= <= =)
+        mtime:<1d           age since last modification (s/m/h/d/w/y)
+        type:f  type:d  type:l
+        depth:<3  depth:>1  depth below the search root (its own entries are at 1)
+        re:PATTERN          regular expression on the relative path
+        other words         case-insensitive substring of the relative path
+
+    Terms only looking at names are evaluated on walk data alone; size,
+    mtime and type:l need the DirEntry stat, which is fetched lazily.
+    """
+
+    def __init__(self, text):
+        self.text = text.strip()
+        self.tests = []      # (needs_stat, fn(rel, name, is_dir, st))
+        self.excludes = []
+        self.prefix = None   # literal leading directories of a path glob
+        self.max_depth = None
+        self.needs_stat = False
+        for term in self.text.split():
+            try:
+                self._add_term(term)
+            except (re.error, ValueError) as e:
+                raise QueryError(f"{term}: {e}")
+
+    def _add(self, fn, needs_stat=False):
+        self.tests.append((needs_stat, fn))
+        self.needs_stat = self.needs_stat or needs_stat
+
+    def _add_term(self, term):
+        key, sep, value = term.partition(':')
+        key = key.lower() if sep else ''
+
+        if term.startswith('-') and len(term) > 1:
+            self.excludes.append(_compile_glob(term[1:]))
+        elif key == 'ext':
+            exts = tuple('.' + e.lower().lstrip('.') for e in value.split(',') if e)
+            self._add(lambda rel, name, is_dir, st: not is_dir and name.lower().endswith(exts))
+        elif key == 'size':
+            op, amount = _split_comparison(value.lower())
+            match = re.fullmatch(r'(\d+(?:\.\d+)?)([kmgt]?)b?', amount)
+            if not match:
+                raise ValueError("expected a size like 1G or 500k")
+            limit = float(match.group(1)) * SIZE_UNITS[match.group(2)]
+            compare = COMPARISONS[op]
+            self._add(lambda rel, name, is_dir, st: not is_dir and compare(st.st_size, limit), True)
+        elif key == 'mtime':
+            op, amount = _split_comparison(value.lower())
+            match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdwy]?)', amount)
+            if not match:
+                raise ValueError("expected an age like 1d or 12h")
+            age = float(match.group(1)) * AGE_UNITS[match.group(2) or 'd']
+            compare = COMPARISONS[op]
+            now = time.time()
+            self._add(lambda rel, name, is_dir, st: compare(now - st.st_mtime, age), True)
+        elif key == 'type':
+            kind = value[:1].lower()
+            if kind == 'd':
+                self._add(lambda rel, name, is_dir, st: is_dir)
+            elif kind == 'f':
+                self._add(lambda rel, name, is_dir, st: not is_dir)
+            elif kind == 'l':
+                self._add(lambda rel, name, is_dir, st: stat_module.S_ISLNK(st.st_mode), True)
+            else:
+                raise ValueError("expected type:f, type:d or type:l")
+        elif key == 'depth':
+            op, amount = _split_comparison(value)
+            depth = int(amount)
+            if op in ('<', '<=', '='):
+                limit = depth - 1 if op == '<' else depth
+                self.max_depth = limit if self.max_depth is None else min(self.max_depth, limit)
+            if op in ('>', '>=', '='):
+                least = depth + 1 if op == '>' else depth
+                self._add(lambda rel, name, is_dir, st: rel.count(os.sep) + 1 >= least)
+        elif key == 're':
+            search = re.compile(value, re.IGNORECASE).search
+            self._add(lambda rel, name, is_dir, st: search(rel) is not None)
+        elif key == 'name' or any(ch in term for ch in '*?['):
+            pattern = value if key == 'name' else term
+            glob = _compile_glob(pattern)
+            if '/' in pattern:
+                literal = []
+                for part in pattern.split('/')[:-1]:
+                    if any(ch in part for ch in '*?['):
+                        break
+                    literal.append(part)
+                if literal:
+                    self.prefix = os.sep.join(literal)
+                rel_glob = _compile_glob(pattern.replace('/', os.sep))
+                self._add(lambda rel, name, is_dir, st: rel_glob(rel) is not None)
+            else:
+                self._add(lambda rel, name, is_dir, st: glob(name) is not None)
+        else:
+            needle = term.lower()
+            self._add(lambda rel, name, is_dir, st: needle in rel.lower())
+
+    def excluded(self, name):
+        return any(exclude(name) for exclude in self.excludes)
+
+    def descend(self, rel_dir, name):
+        """Whether the walker should enter the directory rel_dir"""
+        if self.excluded(name):
+            return False
+        if self.max_depth is not None and rel_dir.count(os.sep) + 1 >= self.max_depth:
+            return False
+        if self.prefix:
+            # Only directories on the way to, or below, the literal prefix
+            return (self.prefix.startswith(rel_dir + os.sep) or rel_dir == self.prefix
+                    or rel_dir.startswith(self.prefix + os.sep))
+        return True
+
+    def matches(self, rel, name, is_dir, stat=None):
+        """Evaluate the query; stat is a callable returning the entry's lstat"""
+        if self.excludes and self.excluded(name):
+            return False
+        if self.max_depth is not None and rel.count(os.sep) + 1 > self.max_depth:
+            return False
+        st = None
+        for needs_stat, test in self.tests:
+            if needs_stat and st is None:
+                try:
+                    st = stat()
+                except OSError:
+                    return False
+            if not test(rel, name, is_dir, st):
+                return False
+        return True
+
+    def matches_path(self, rel, is_dir, stat=None):
+        """Like matches() for a path whose ancestors were not pruned by the walker"""
+        if self.excludes and any(self.excluded(part) for part in rel.split(os.sep)[:-1]):
+            return False
+        if self.prefix and not rel.startswith(self.prefix + os.sep):
+            return False
+        return self.matches(rel, os.path.basename(rel), is_dir, stat)
+
+
+def walk_search(base_path, results, cancel, query=None, workers=DEFAULT_WALK_WORKERS):
+    """Parallel walk extending results with the paths (relative to base_path) matching query
+
+    The query is evaluated per DirEntry, so entries are only stat'ed when it
+    tests size or mtime.
+    """
+    prefix_len = len(path_range(base_path)[0])
+
+    def visit(dirpath):
+        names = []
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as scan:
+                for entry in scan:
+                    rel = entry.path[prefix_len:]
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if query is None:
+                        names.append(rel)
+                        if is_dir:
+                            subdirs.append(entry.path)
+                        continue
+                    if query.matches(rel, entry.name, is_dir,
+                                     lambda: entry.stat(follow_symlinks=False)):
+                        names.append(rel)
+                    if is_dir and query.descend(rel, entry.name):
+                        subdirs.append(entry.path)
+        except OSError:
+            return ()
+        results.extend(names)
+        return subdirs
+
+    ParallelWalker(visit, workers=workers, cancel=cancel).run(base_path)
+
+
+class DiskUsage:
+    """Recursive directory sizes from a parallel walk, cached per directory
+
+    Each directory keeps one record: its mtime, the bytes and count of the
+    files directly in it, its subdirectory names, and its hardlinked files,
+    which are added to totals once per (st_dev, st_ino). A rescan still
+    stats every directory but only re-lists those whose mtime changed.
+    Files rewritten in place don't touch their directory's mtime, so
+    scan(refresh=True) re-lists everything. Sizes are apparent bytes
+    (st_size), the unit file rows are listed and sorted in; like
+    du -xb, walks stay on the root's filesystem. Scans of one instance
+    run one at a time, since each rewrites records the others aggregate.
+    """
+
+    def __init__(self, workers=DEFAULT_WALK_WORKERS):
+        self.records = {}  # path -> (mtime, own bytes, files, subdir names, ((dev, ino, bytes), ...))
+        self.totals = {}   # path -> (bytes, files, dirs) as of the last scan that reached it
+        self.workers = workers
+        self.version = 0
+        self.scanned = 0   # directories visited, for progress
+        self.lock = threading.Lock()
+
+    def total(self, path):
+        return self.totals.get(path)
+
+    def scan(self, root, cancel=None, seen=None, refresh=False):
+        """Walk root and return its (bytes, files, dirs), or None if cancelled
+
+        seen collects the hardlinks already counted; share one set between
+        sibling scans so a file linked into both is only counted once.
+        """
+        while not self.lock.acquire(timeout=0.1):
+            if cancel is not None and cancel.is_set():
+                return None
+        try:
+            return self._scan(root, cancel, seen, refresh)
+        finally:
+            self.lock.release()
+
+    def _scan(self, root, cancel, seen, refresh):
+        try:
+            dev = os.lstat(root).st_dev
+        except OSError:
+            return None
+        records = self.records
+
+        def visit(path):
+            self.scanned += 1
+            try:
+                st = os.lstat(path)
+            except OSError:
+                return []
+            record = records.get(path)
+            if record is not None and record[0] == st.st_mtime and not refresh:
+                return [os.path.join(path, name) for name in record[3]]
+            own, files, subdirs, links = st.st_size, 0, [], []
+            try:
+                with os.scandir(path) as scan:
+                    for entry in scan:
+                        try:
+                            est = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if stat_module.S_ISDIR(est.st_mode):
+                            if est.st_dev == dev:
+                                subdirs.append(entry.name)
+                            continue
+                        files += 1
+                        if est.st_nlink > 1:
+                            links.append((est.st_dev, est.st_ino, est.st_size))
+                        else:
+                            own += est.st_size
+            except OSError:
+                pass
+            if record is not None:
+                for name in set(record[3]).difference(subdirs):
+                    self._forget(os.path.join(path, name))
+            records[path] = (st.st_mtime, own, files, tuple(subdirs), tuple(links))
+            return [os.path.join(path, name) for name in subdirs]
+
+        if not ParallelWalker(visit, self.workers, cancel).run(root):
+            return None
+        return self._aggregate(root, set() if seen is None else seen)
+
+    def _forget(self, path):
+        """Drop the records of a directory that no longer exists, and its subtree"""
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            record = self.records.pop(current, None)
+            self.totals.pop(current, None)
+            if record is not None:
+                stack.extend(os.path.join(current, name) for name in record[3])
+
+    def _aggregate(self, root, seen):
+        order = []
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            record = self.records.get(path)
+            if record is not None:
+                order.append(path)
+                stack.extend(os.path.join(path, name) for name in record[3])
+        totals = {}
+        for path in reversed(order):  # children before parents
+            _, size, files, subdirs, links = self.records[path]
+            dirs = 1
+            for dev, ino, used in links:
+                if (dev, ino) not in seen:
+                    seen.add((dev, ino))
+                    size += used
+            for name in subdirs:
+                sub = totals.get(os.path.join(path, name))
+                if sub is not None:
+                    size += sub[0]
+                    files += sub[1]
+                    dirs += sub[2]
+            totals[path] = (size, files, dirs)
+        self.totals.update(totals)
+        self.version += 1
+        return totals.get(root)
+
+    EXPORT_FORMAT = 'pyfiler-du'
+
+    def export(self, root, filename):
+        """Write the records below root to filename (gzipped if it ends in .gz), one JSON line per directory"""
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(filename, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'format': self.EXPORT_FORMAT, 'version': 1, 'root': root,
+                                'created': time.time()}) + '\n')
+            stack = ['']
+            while stack:
+                rel = stack.pop()
+                record = self.records.get(os.path.join(root, rel) if rel else root)
+                if record is None:
+                    continue
+                mtime, own, files, subdirs, links = record
+                f.write(json.dumps([rel, mtime, own, files, subdirs, links]) + '\n')
+                stack.extend(os.path.join(rel, name) for name in subdirs)
+
+    @classmethod
+    def load(cls, filename):
+        """Read an export back into a new DiskUsage and return it with the scanned root"""
+        opener = gzip.open if filename.endswith('.gz') else open
+        du = cls()
+        with opener(filename, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline() or 'null')
+            if not isinstance(header, dict) or header.get('format') != cls.EXPORT_FORMAT:
+                raise ValueError(f"{filename} is not a disk usage export")
+            root = header['root']
+            for line in f:
+                rel, mtime, own, files, subdirs, links = json.loads(line)
+                du.records[os.path.join(root, rel) if rel else root] = (
+                    mtime, own, files, tuple(subdirs), tuple(tuple(link) for link in links))
+        du._aggregate(root, set())
+        return du, root
+
+
+class UsageView:
+    """ncdu-style breakdown of one scanned tree, browsed from DiskUsage totals without syscalls
+
+    Only per-directory totals are kept, so the files directly in a directory
+    show as a single row (name None).
+    """
+
+    BAR_WIDTH = 20
+
+    def __init__(self, du, root):
+        self.du = du
+        self.root = root
+        self.path = root
+        self.selected = 0
+        self.cancel = threading.Event()
+        self.scanning = False
+        self._rows = None  # (path, du version, rows)
+
+    def start_scan(self, refresh=False):
+        self.scanning = True
+
+        def run():
+            self.du.scan(self.root, self.cancel, refresh=refresh)
+            self.scanning = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def total(self):
+        return self.du.totals.get(self.path)
+
+    def rows(self):
+        """(name, bytes, files, dirs) for each child of path, largest first"""
+        cached = self._rows
+        if cached is not None and cached[0] == self.path and cached[1] == self.du.version:
+            return cached[2]
+        rows = []
+        record = self.du.records.get(self.path)
+        total = self.total()
+        if record is not None and total is not None:
+            rest = total[0]
+            for name in record[3]:
+                sub = self.du.totals.get(os.path.join(self.path, name))
+                if sub is not None:
+                    rows.append((name,) + sub)
+                    rest -= sub[0]
+            if record[2]:
+                rows.append((None, rest, record[2], 0))
+            rows.sort(key=lambda row: (-row[1], row[0] or ''))
+        self._rows = (self.path, self.du.version, rows)
+        return rows
+
+    def move(self, delta):
+        self.selected = max(0, min(len(self.rows()) - 1, self.selected + delta))
+
+    def enter(self):
+        """Drill into the selected directory; False on the files row"""
+        rows = self.rows()
+        if not rows or rows[self.selected][0] is None:
+            return False
+        self.path = os.path.join(self.path, rows[self.selected][0])
+        self.selected = 0
+        return True
+
+    def leave(self):
+        """Go up one level, keeping the directory we came from selected; False at the root"""
+        if self.path == self.root:
+            return False
+        self.path, name = os.path.split(self.path)
+        names = [row[0] for row in self.rows()]
+        self.selected = names.index(name) if name in names else 0
+        return True
+
+    def line(self, row, width):
+        """One breakdown row: size, share of the current directory, bar and name"""
+        name, size, files, dirs = row
+        total = self.total()
+        share = size / total[0] if total and total[0] else 0
+        label = f"<{files} files>" if name is None else f"{name}/"
+        text = f"{format_size(size):>9} {share * 100:5.1f}% {progress_bar(share, self.BAR_WIDTH)} {label}"
+        if name is not None:
+            text = f"{text}  ({files} files, {dirs - 1} dirs)"
+        return text[:width]
+
+
+HASH_PARTIAL_BYTES = 4096
+HASH_MMAP_THRESHOLD = 1 << 20
+HASH_CHUNK = 8 << 20
+
+
+def partial_hash(path, size):
+    """Digest of the first and last HASH_PARTIAL_BYTES of a file (the whole file if it is small)"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        if size <= 2 * HASH_PARTIAL_BYTES:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(HASH_PARTIAL_BYTES))
+            f.seek(size - HASH_PARTIAL_BYTES)
+            digest.update(f.read(HASH_PARTIAL_BYTES))
+    return digest.digest()
+
+
+def full_hash(path):
+    """Digest of a whole file, through mmap when it is large; runs in the hash process pool"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= HASH_MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                if hasattr(m, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    m.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(m) as view:
+                    for offset in range(0, len(m), HASH_CHUNK):
+                        digest.update(view[offset:offset + HASH_CHUNK])
+        else:
+            digest.update(f.read())
+    return digest.digest()
+
+
+class HashCache:
+    """Persistent file digests keyed by (st_dev, st_ino), valid while size and mtime match"""
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), 'hashes.db')
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                partial BLOB,
+                full BLOB,
+                PRIMARY KEY (dev, ino)
+            ) WITHOUT ROWID;
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, dev, ino, size, mtime):
+        """(partial, full) digests of an unchanged file; either may be None"""
+        row = self.conn.execute(
+            "SELECT partial, full FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime = ?",
+            (dev, ino, size, mtime)).fetchone()
+        return row or (None, None)
+
+    def put_many(self, rows):
+        """Store (dev, ino, size, mtime, partial, full) rows"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+class DuplicateFinder:
+    """Groups of identical files below a directory, narrowed stage by stage
+
+    Files are grouped by size during a parallel walk; same-sized files are
+    told apart by a hash of their first and last few KB on threads, and only
+    files that still collide are hashed in full on a process pool. Hardlinks
+    to one inode count once. Digests are cached in a HashCache, so files
+    unchanged since the last run are not read again. Groups are appended to
+    the results list, largest files first, as soon as each size is settled.
+    """
+
+    def __init__(self, workers=DEFAULT_WALK_WORKERS, hash_workers=None, min_size=1):
+        self.workers = max(1, workers)
+        self.hash_workers = hash_workers or os.cpu_count() or 1
+        self.min_size = max(1, min_size)
+        self.stage = 'walking'
+        self.files = 0
+        self.done = 0
+        self.total = 0
+        self.bytes_hashed = 0
+        self.cache_hits = 0
+
+    def run(self, base_path, results, cancel):
+        found = []
+
+        def visit(dirpath):
+            subdirs = []
+            try:
+                with os.scandir(dirpath) as scan:
+                    for entry in scan:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                                continue
+                            if not entry.is_file(follow_symlinks=False):
+                                continue
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if st.st_size >= self.min_size:
+                            found.append((st.st_size, st.st_dev, st.st_ino, st.st_mtime_ns, entry.path))
+            except OSError:
+                return ()
+            self.files = len(found)
+            return subdirs
+
+        if not ParallelWalker(visit, self.workers, cancel).run(base_path):
+            return
+        by_size = {}
+        inodes = set()
+        for item in found:
+            if (item[1], item[2]) not in inodes:  # other links to an inode already listed
+                inodes.add((item[1], item[2]))
+                by_size.setdefault(item[0], []).append(item)
+        found.clear()  # by_size holds everything still needed while hashing
+        inodes.clear()
+        sizes = sorted((size for size, items in by_size.items() if len(items) > 1), reverse=True)
+
+        try:
+            cache = HashCache()
+        except (OSError, sqlite3.Error):
+            cache = None
+        try:
+            self._hash(sizes, by_size, cache, results, cancel)
+        finally:
+            if cache is not None:
+                cache.close()
+        self.stage = 'done'
+
+    def _cached(self, cache, item):
+        if cache is None:
+            return None, None
+        try:
+            return cache.get(item[1], item[2], item[0], item[3])
+        except sqlite3.Error:
+            return None, None
+
+    def _store(self, cache, rows):
+        if cache is not None and rows:
+            try:
+                cache.put_many(rows)
+            except sqlite3.Error:
+                pass
+
+    def _hash(self, sizes, by_size, cache, results, cancel):
+        candidates = [item for size in sizes for item in by_size[size]]
+        self.stage, self.done, self.total = 'partial', 0, len(candidates)
+        partials, fulls, rows = {}, {}, []
+        misses = []
+        for item in candidates:
+            partial, full = self._cached(cache, item)
+            if partial is None:
+                misses.append(item)
+                continue
+            self.cache_hits += 1
+            self.done += 1
+            partials[item[4]] = partial
+            if full is not None:
+                fulls[item[4]] = full
+
+        def hash_head(item):
+            if cancel.is_set():
+                return item, None
+            try:
+                digest = partial_hash(item[4], item[0])
+            except OSError:
+                return item, None
+            self.bytes_hashed += min(item[0], 2 * HASH_PARTIAL_BYTES)
+            return item, digest
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            for item, digest in pool.map(hash_head, misses):
+                self.done += 1
+                if digest is not None:
+                    partials[item[4]] = digest
+                    rows.append(item[1:3] + (item[0], item[3], digest, None))
+        self._store(cache, rows)
+        if cancel.is_set():
+            return
+
+        # Sizes whose same-head buckets still need full hashes: size -> [files left, buckets]
+        waiting = {}
+        jobs = []
+        for size in sizes:
+            buckets = {}
+            for item in by_size[size]:
+                digest = partials.get(item[4])
+                if digest is not None:
+                    buckets.setdefault(digest, []).append(item)
+            buckets = [bucket for bucket in buckets.values() if len(bucket) > 1]
+            if not buckets:
+                continue
+            if size <= 2 * HASH_PARTIAL_BYTES:  # the partial hash covered the whole file
+                for bucket in buckets:
+                    self._emit(results, size, bucket)
+                continue
+            todo = [item for bucket in buckets for item in bucket if item[4] not in fulls]
+            if todo:
+                waiting[size] = [len(todo), buckets]
+                jobs.extend(todo)
+            else:
+                self._group(results, size, buckets, fulls)
+
+        self.stage, self.done, self.total = 'full', 0, len(jobs)
+        rows = []
+        pool = self._pool()
+        try:
+            futures = {pool.submit(full_hash, item[4]): item for item in jobs}
+            for future in as_completed(futures):
+                if cancel.is_set():
+                    break
+                item = futures[future]
+                try:
+                    digest = future.result()
+                except BrokenProcessPool:
+                    digest = self._hash_inline(item)
+                except OSError:
+                    digest = None
+                self.done += 1
+                if digest is not None:
+                    self.bytes_hashed += item[0]
+                    fulls[item[4]] = digest
+                    rows.append(item[1:3] + (item[0], item[3], partials[item[4]], digest))
+                entry = waiting[item[0]]
+                entry[0] -= 1
+                if entry[0] == 0:
+                    self._group(results, item[0], entry[1], fulls)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._store(cache, rows)
+
+    def _hash_inline(self, item):
+        try:
+            return full_hash(item[4])
+        except OSError:
+            return None
+
+    def _pool(self):
+        """Process pool for full hashes, or threads where processes can't be started"""
+        try:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            return ProcessPoolExecutor(self.hash_workers, mp_context=context)
+        except (OSError, ValueError, NotImplementedError):
+            return ThreadPoolExecutor(self.hash_workers)
+
+    def _group(self, results, size, buckets, fulls):
+        for bucket in buckets:
+            groups = {}
+            for item in bucket:
+                digest = fulls.get(item[4])
+                if digest is not None:
+                    groups.setdefault(digest, []).append(item)
+            for group in groups.values():
+                if len(group) > 1:
+                    self._emit(results, size, group)
+
+    def _emit(self, results, size, items):
+        results.append((size, tuple(sorted(item[4] for item in items))))
+
+
+class DuplicateView:
+    """Duplicate groups as they stream in from a DuplicateFinder, with files marked for deletion"""
+
+    def __init__(self, finder, base_path):
+        self.finder = finder
+        self.base = base_path
+        self.groups = []      # (size, paths), appended by the finder thread
+        self.marked = set()
+        self.gone = set()     # deleted paths, hidden from the groups
+        self.selected = 0
+        self.cancel = threading.Event()
+        self.thread = None
+        self._rows = None     # (state, rows)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.finder.run, args=(self.base, self.groups, self.cancel),
+                                       daemon=True)
+        self.thread.start()
+
+    def active(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def state(self):
+        return len(self.groups), len(self.gone)
+
+    def live_groups(self):
+        for size, paths in self.groups[:len(self.groups)]:
+            live = [path for path in paths if path not in self.gone]
+            if len(live) > 1:
+                yield size, live
+
+    def rows(self):
+        """(size, paths, path) rows: a group header has path None"""
+        state = self.state()
+        if self._rows is not None and self._rows[0] == state:
+            return self._rows[1]
+        rows = []
+        for size, paths in self.live_groups():
+            rows.append((size, paths, None))
+            rows.extend((size, paths, path) for path in paths)
+        self._rows = (state, rows)
+        return rows
+
+    def totals(self):
+        """Number of groups and the bytes freed by keeping one copy of each"""
+        groups = reclaimable = 0
+        for size, paths in self.live_groups():
+            groups += 1
+            reclaimable += size * (len(paths) - 1)
+        return groups, reclaimable
+
+    def move(self, delta):
+        self.selected = max(0, min(len(self.rows()) - 1, self.selected + delta))
+
+    def current(self):
+        rows = self.rows()
+        return rows[self.selected] if self.selected < len(rows) else None
+
+    def toggle(self):
+        row = self.current()
+        if row is None:
+            return
+        if row[2] is None:  # group header: mark every copy but the first
+            extras = set(row[1][1:])
+            if extras <= self.marked:
+                self.marked -= extras
+            else:
+                self.marked |= extras
+        else:
+            self.marked ^= {row[2]}
+        self.move(1)
+
+    def mark_extras(self):
+        """Mark all but the first file of every group"""
+        for size, paths in self.live_groups():
+            self.marked.update(paths[1:])
+
+    def fully_marked(self):
+        """Groups whose every copy is marked"""
+        return [paths for size, paths in self.live_groups() if self.marked.issuperset(paths)]
+
+    def line(self, row, width):
+        size, paths, path = row
+        if path is None:
+            text = (f"{len(paths)} x {format_size(size)}  "
+                    f"({format_size(size * (len(paths) - 1))} reclaimable)")
+        else:
+            mark = "✓ " if path in self.marked else "  "
+            text = f"  {mark}{os.path.relpath(path, self.base)}"
+        return text[:width]
+
+
+PREVIEW_BYTES = 64 * 1024  # read from the head (or tail) of a text file
+PREVIEW_SNIFF_BYTES = 8192
+PREVIEW_DIR_ENTRIES = 1000
+PREVIEW_CONTROL = re.compile('[\x00-\x08\x0b-\x1f\x7f]')
+LOG_NAME = re.compile(r'\.(log|out|err)(\.\d+)?$')
+
+
+def _text_lines(data, width, lines, tail=False):
+    text = data.decode('utf-8', 'replace').replace('\r', '')
+    rows = text.split('\n')
+    if tail:
+        if rows and rows[-1] == '':
+            rows.pop()
+        rows = rows[-lines:]
+    else:
+        rows = rows[:lines]
+    return [PREVIEW_CONTROL.sub('?', row.expandtabs(4))[:width] for row in rows]
+
+
+def _hex_lines(data, width, lines, stale):
+    per_row = 16 if width >= 76 else 8
+    rows = []
+    for offset in range(0, min(len(data), per_row * lines), per_row):
+        if stale():
+            return None
+        chunk = data[offset:offset + per_row]
+        hex_part = ' '.join(f"{b:02x}" for b in chunk).ljust(per_row * 3 - 1)
+        ascii_part = ''.join(chr(b) if 32 <= b < 127 else '.' for b in chunk)
+        rows.append(f"{offset:08x}  {hex_part}  {ascii_part}"[:width])
+    return rows
+
+
+def _preview_dir(path, width, lines, stale):
+    names = []
+    more = False
+    with os.scandir(path) as scan:
+        for entry in scan:
+            if len(names) == PREVIEW_DIR_ENTRIES:
+                more = True
+                break
+            try:
+                names.append(entry.name + ('/' if entry.is_dir() else ''))
+            except OSError:
+                names.append(entry.name)
+    if stale():
+        return None
+    names.sort(key=str.lower)
+    header = f"{len(names)}{'+' if more else ''} entries"
+    return [header, ''] + [name[:width] for name in names[:max(0, lines - 2)]]
+
+
+def _preview_zip(path, width, lines, stale):
+    with zipfile.ZipFile(path) as archive:
+        infos = archive.infolist()  # the central directory only; nothing is extracted
+    rows = [f"ZIP archive, {len(infos)} entries", '']
+    for info in infos[:max(0, lines - 2)]:
+        rows.append(f"{format_size(info.file_size):>9}  {info.filename}"[:width])
+    return rows
+
+
+def _preview_tar(path, width, lines, stale):
+    rows = ["TAR archive", '']
+    with tarfile.open(path) as archive:
+        for member in archive:  # reads headers as it goes; stops once the pane is full
+            if stale():
+                return None
+            name = member.name + ('/' if member.isdir() else '')
+            rows.append(f"{format_size(member.size):>9}  {name}"[:width])
+            if len(rows) >= lines:
+                break
+    return rows
+
+
+def render_preview(path, st, width, lines, stale):
+    """Preview rows for a path, or None if stale() turned true on the way
+
+    Text files show their head (logs their tail), binaries a hex dump and
+    archives their member list. Files are mapped, so only the bytes shown
+    are read.
+    """
+    if stat_module.S_ISDIR(st.st_mode):
+        return _preview_dir(path, width, lines, stale)
+    if not stat_module.S_ISREG(st.st_mode):
+        return [f"{stat_module.filemode(st.st_mode)} special file"]
+    if st.st_size == 0:
+        return ["(empty file)"]
+    lower = path.lower()
+    if lower.endswith(('.zip', '.jar', '.whl', '.apk')) and zipfile.is_zipfile(path):
+        return _preview_zip(path, width, lines, stale)
+    if lower.endswith(('.tar', '.tgz', '.tar.gz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')) \
+            and tarfile.is_tarfile(path):
+        return _preview_tar(path, width, lines, stale)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if b'\0' in m[:PREVIEW_SNIFF_BYTES]:
+            return _hex_lines(m, width, lines, stale)
+        if LOG_NAME.search(lower):
+            return _text_lines(m[max(0, len(m) - PREVIEW_BYTES):], width, lines, tail=True)
+        return _text_lines(m[:PREVIEW_BYTES], width, lines)
+
+
+class Previewer:
+    """Renders previews on a background thread, newest request only
+
+    A new request replaces the pending one, and a render in progress gives up
+    at its next checkpoint once it is superseded, so scrolling never waits on
+    a slow file. Rendered previews are kept in an LRU keyed by path and pane
+    size, and re-validated against mtime and size when requested again.
+    """
+
+    CACHE_ENTRIES = 256
+
+    def __init__(self, notify=None):
+        self.cache = OrderedDict()  # (path, width, lines) -> ((mtime_ns, size), rows)
+        self.notify = notify  # called from the worker thread when a preview is ready
+        self.version = 0
+        self.pending = False
+        self._wanted = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._work, daemon=True).start()
+
+    def get(self, path, width, lines):
+        key = (path, width, lines)
+        with self._cond:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            self.cache.move_to_end(key)
+            return entry[1]
+
+    def request(self, path, width, lines):
+        with self._cond:
+            self._wanted = (path, width, lines)
+            self.pending = True
+            self._cond.notify()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._wanted is None:
+                    self.pending = False
+                    self._cond.wait()
+                key = self._wanted
+                self._wanted = None
+            path, width, lines = key
+            stale = lambda: self._wanted is not None
+            stamp = None
+            try:
+                st = os.stat(path)
+                stamp = (st.st_mtime_ns, st.st_size)
+                entry = self.cache.get(key)
+                if entry is not None and entry[0] == stamp:
+                    continue
+                rows = render_preview(path, st, width, lines, stale)
+            except Exception as e:
+                rows = [f"Error: {str(e)}"[:width]]
+            if rows is None:
+                continue
+            with self._cond:
+                self.cache[key] = (stamp, rows)
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.CACHE_ENTRIES:
+                    self.cache.popitem(last=False)
+                self.version += 1
+            if self.notify:
+                self.notify()
+
+
+class NameBuffer:
+    """Append-only sequence of file names packed into a single bytes buffer
+
+    Names are stored in their filesystem encoding and decoded on access,
+    which costs a few bytes per name instead of a full str object.
+    """
+
+    __slots__ = ('data', 'offsets')
+
+    ENCODING = sys.getfilesystemencoding()
+    ERRORS = sys.getfilesystemencodeerrors()
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('Q', [0])
+
+    def append(self, name):
+        self.data += name
+        self.offsets.append(len(self.data))
+
+    def first_byte(self, i):
+        return self.data[self.offsets[i]]
+
+    def lowered(self, count):
+        """Lower-cased names of the first count entries"""
+        offsets = self.offsets
+        data = bytes(self.data[:offsets[count]])
+        if data.isascii():
+            # Byte offsets are character offsets: decode once and slice
+            text = data.decode('ascii').lower()
+            return [text[offsets[i]:offsets[i + 1]] for i in range(count)]
+        return [self[i].lower() for i in range(count)]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode(self.ENCODING, self.ERRORS)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class DirListing:
+    """Listing of one directory, streamed in by a background scan
+
+    Names and directory flags (from d_type, no stat needed) arrive first.
+    Size, mtime and mode are fetched per entry only when a row is drawn, or
+    for every entry when the sort order needs them. Per-entry data lives in
+    parallel arrays rather than one object per file.
+    """
+
+    FIRST_PAGE = 200
+
+    __slots__ = ('path', 'mtime', 'names', 'is_dir', 'sizes', 'mtimes', 'modes', 'infos',
+                 'count', 'complete', 'stat_complete', 'error', 'first_page',
+                 '_done', '_cancel', '_stat_thread', '_pending', '_index', 'deleted', '_deltas',
+                 'version', 'stat_version', 'sized', '_orders', 'notify')
+
+    SORT_MODES = ('name', 'size', 'modified', 'ext', 'type')
+    STAT_SORTS = frozenset(('size', 'modified', 'type'))
+    TYPE_ORDER = {'directory': 0, 'executable': 1, 'archive': 2, 'image': 3, 'default': 4}
+
+    def __init__(self, path, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.names = NameBuffer()
+        self.is_dir = bytearray()
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.modes = array('I')   # 0 until stat'ed
+        self.infos = {}           # formatted info column per drawn entry
+        self.count = 0
+        self.complete = False
+        self.stat_complete = False
+        self.error = None
+        self.first_page = threading.Event()
+        self._done = threading.Event()
+        self._cancel = threading.Event()
+        self._stat_thread = None
+        self._pending = set()
+        self._index = None
+        self.deleted = set()
+        self._deltas = []
+        self.version = 0        # bumped when entries are added, removed or re-stat'ed
+        self.stat_version = 0   # bumped when a directory's recursive size arrives
+        self.sized = set()      # directories whose size column holds a du total
+        self._orders = {}   # (mode, show_hidden) -> (stamp, permutation, directories first)
+        self.notify = None  # called from the scan thread at the first page and at the end
+
+    def start(self):
+        threading.Thread(target=self.scan, daemon=True).start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def scan(self):
+        """List the directory on the calling thread; start() does it in the background"""
+        try:
+            with os.scandir(os.fsencode(self.path)) as scan:
+                for entry in scan:
+                    if self._cancel.is_set():
+                        return
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    self.names.append(entry.name)
+                    self.is_dir.append(is_dir)
+                    self.sizes.append(0)
+                    self.mtimes.append(0.0)
+                    self.modes.append(0)
+                    self.count += 1
+                    if self.count == self.FIRST_PAGE:
+                        self.first_page.set()
+                        if self.notify:
+                            self.notify()
+        except OSError as e:
+            self.error = e
+        finally:
+            self.complete = True
+            self.first_page.set()
+            self._done.set()
+            if self.notify:
+                self.notify()
+
+    def stat(self, i):
+        """Fetch stat data for entry i (follows symlinks like DirEntry.stat)"""
+        try:
+            st = os.stat(os.path.join(self.path, self.names[i]))
+        except OSError:
+            self.modes[i] = stat_module.S_IFREG  # dangling link or vanished: known, but empty
+            self._pending.discard(i)
+            return
+        self._set_stat(i, st)
+
+    def _set_stat(self, i, st):
+        if not self.is_dir[i]:
+            self.sizes[i] = st.st_size
+        self.mtimes[i] = st.st_mtime
+        self.modes[i] = st.st_mode
+        self._pending.discard(i)
+
+    def request_stat(self, indices):
+        """Return the indices not already stat'ed or queued, marking them queued"""
+        wanted = [i for i in indices if not self.modes[i] and i not in self._pending]
+        self._pending.update(wanted)
+        return wanted
+
+    def start_stat_all(self):
+        """Stat every entry in the background (needed for size/mtime sorts)"""
+        if self.stat_complete or (self._stat_thread and self._stat_thread.is_alive()):
+            return
+        self._stat_thread = threading.Thread(target=self._stat_all, daemon=True)
+        self._stat_thread.start()
+
+    def _stat_all(self):
+        self._done.wait()
+        for i in range(self.count):
+            if self._cancel.is_set():
+                return
+            if not self.modes[i]:
+                self.stat(i)
+        self.stat_complete = True
+
+    def set_dir_size(self, i, size):
+        """Record the recursive size of directory i"""
+        self.sizes[i] = size
+        self.sized.add(i)
+        self.infos.pop(i, None)
+        self.stat_version += 1
+
+    def _stamp(self, mode):
+        return (self.version, self.stat_version) if mode == 'size' else self.version
+
+    def cached_order(self, mode, show_hidden, reverse=False):
+        """The display order if it is already cached, else None"""
+        cached = self._orders.get((mode, show_hidden))
+        if cached is None or cached[0] != self._stamp(mode):
+            return None
+        order, split = cached[1], cached[2]
+        if reverse:
+            # Descending keeps directories grouped first where the ascending order does
+            order = order[:split][::-1] + order[split:][::-1]
+        return order
+
+    def sorted_order(self, mode, show_hidden, reverse=False):
+        """Indices of the visible entries in display order, cached per sort mode
+
+        Each mode is a stable sort of the name order, so ties fall back to
+        name. Can run on a worker thread; a result computed while the
+        listing changed is returned but not cached.
+        """
+        if self.cached_order(mode, show_hidden) is None:
+            stamp = self._stamp(mode)
+            order, split = self._sort(mode, show_hidden)
+            if stamp == self._stamp(mode):
+                self._orders[(mode, show_hidden)] = (stamp, order, split)
+            if reverse:
+                return order[:split][::-1] + order[split:][::-1]
+            return order
+        return self.cached_order(mode, show_hidden, reverse)
+
+    def _sort(self, mode, show_hidden):
+        count = self.count
+        is_dir = self.is_dir
+        if mode != 'name':
+            by_name = self.cached_order('name', show_hidden)
+            if by_name is None:
+                by_name = self.sorted_order('name', show_hidden)
+            indices = list(by_name)
+        else:
+            if show_hidden:
+                indices = list(range(count))
+            else:
+                indices = [i for i in range(count) if not self.is_hidden(i)]
+            if self.deleted:
+                indices = [i for i in indices if i not in self.deleted]
+            indices.sort(key=self.names.lowered(count).__getitem__)
+            dirs = [i for i in indices if is_dir[i]]
+            return array('I', dirs + [i for i in indices if not is_dir[i]]), len(dirs)
+
+        dirs = sum(1 for i in indices if is_dir[i])
+        if mode == 'size':
+            indices.sort(key=self.sizes.__getitem__)
+            dirs = 0
+        elif mode == 'modified':
+            indices.sort(key=self.mtimes.__getitem__)
+            dirs = 0
+        elif mode == 'ext':
+            names = self.names
+            files = indices[dirs:]
+            files.sort(key=lambda i: os.path.splitext(names[i])[1].lower())
+            indices[dirs:] = files
+        elif mode == 'type':
+            names, modes, rank = self.names, self.modes, self.TYPE_ORDER
+            indices.sort(key=lambda i: rank[classify(names[i], is_dir[i], modes[i])])
+        return array('I', indices), dirs
+
+    def index_of(self, name):
+        if self._index is None or len(self._index) + len(self.deleted) != self.count:
+            self._index = {self.names[i]: i for i in range(self.count) if i not in self.deleted}
+        return self._index.get(name)
+
+    def apply(self, kind, name, st=None):
+        """Apply a watcher event; returns True if the visible order may have changed
+
+        Events that arrive while the scan is still running are held back and
+        applied by apply_pending() once it finishes. Applying is idempotent,
+        so an entry the scan already picked up is not added twice. An added
+        entry's stat (following symlinks) may come with the event, so no
+        syscall is made for it here.
+        """
+        if not self.complete:
+            self._deltas.append((kind, name, st))
+            return False
+        i = self.index_of(name)
+        if kind == 'add' and i is None:
+            self.index_of(name)  # make sure the index is built before growing
+            self.names.append(os.fsencode(name))
+            self.sizes.append(0)
+            self.mtimes.append(0.0)
+            self.modes.append(0)
+            self._index[name] = self.count
+            self.count += 1
+            if st is None:
+                self.is_dir.append(os.path.isdir(os.path.join(self.path, name)))
+                self.stat(self.count - 1)
+            else:
+                self.is_dir.append(stat_module.S_ISDIR(st.st_mode))
+                self._set_stat(self.count - 1, st)
+        elif kind == 'remove' and i is not None:
+            self.deleted.add(i)
+            del self._index[name]
+            self.infos.pop(i, None)
+        elif i is not None:  # modified, or re-created under the same name
+            self.infos.pop(i, None)
+            self.stat(i)
+        else:
+            return False
+        self.version += 1
+        return True
+
+    def apply_pending(self):
+        deltas, self._deltas = self._deltas, []
+        changed = False
+        for kind, name, st in deltas:
+            changed = self.apply(kind, name, st) or changed
+        return changed
+
+    def has_pending(self):
+        return bool(self._deltas) and self.complete
+
+    def is_hidden(self, i):
+        return self.names.first_byte(i) == 0x2e  # '.'
+
+    def nbytes(self):
+        """Approximate memory held by this listing"""
+        columns = (self.is_dir, self.sizes, self.mtimes, self.modes,
+                   *(order for _, order, _ in self._orders.values()))
+        return (self.names.nbytes() + sum(len(c) * c.itemsize if isinstance(c, array) else len(c)
+                                          for c in columns)
+                + 100 * len(self.infos))
+
+    def metadata(self, i):
+        is_dir = bool(self.is_dir[i])
+        name = self.names[i]
+        meta = {'name': name, 'is_dir': is_dir, 'type': classify(name, is_dir, self.modes[i])}
+        if self.modes[i]:
+            if not is_dir or i in self.sized:
+                meta['size'] = self.sizes[i]
+            meta['mtime'] = self.mtimes[i]
+        return meta
+
+    def info(self, i):
+        """Size and mtime column; directories only get one once their size is known"""
+        info = self.infos.get(i)
+        if info is None and self.modes[i] and (not self.is_dir[i] or i in self.sized):
+            info = self.infos[i] = format_info(self.sizes[i], self.mtimes[i])
+        return info
+
+
+class ListingCache:
+    """Directory listings kept in least-recently-used order within a memory budget"""
+
+    def __init__(self, budget=LISTING_CACHE_BUDGET):
+        self.budget = budget
+        self._listings = OrderedDict()
+
+    def peek(self, path):
+        """Look up a listing without refreshing its position"""
+        return self._listings.get(path)
+
+    def get(self, path):
+        listing = self._listings.get(path)
+        if listing is not None:
+            self._listings.move_to_end(path)
+        return listing
+
+    def __setitem__(self, path, listing):
+        self._listings[path] = listing
+        self._listings.move_to_end(path)
+        self.trim()
+
+    def offer(self, path, listing):
+        """Add a speculative listing as the least recently used, so it never evicts one in use"""
+        self._listings[path] = listing
+        self._listings.move_to_end(path, last=False)
+        self.trim()
+
+    def pop(self, path, default=None):
+        return self._listings.pop(path, default)
+
+    def nbytes(self):
+        return sum(listing.nbytes() for listing in self._listings.values())
+
+    def trim(self):
+        """Evict the oldest listings until the cache fits, always keeping the newest"""
+        total = self.nbytes()
+        while total > self.budget and len(self._listings) > 1:
+            _, listing = self._listings.popitem(last=False)
+            listing.cancel()
+            total -= listing.nbytes()
+
+
+class Prefetcher:
+    """Scans the directories the user is likely to open next, ahead of time
+
+    want() replaces the wish list, most likely first, and cancels scans that
+    dropped off it. A fixed pool of threads works from the head of the list.
+    A listing still streaming in can be taken over with take(); finished
+    ones wait in collect() for the UI thread to put into its cache.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS, notify=None):
+        self.notify = notify  # called from the worker threads when a listing is ready
+        self._wanted = []
+        self._active = {}  # path -> listing being scanned
+        self._done = deque()
+        self._cond = threading.Condition()
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def want(self, paths):
+        with self._cond:
+            self._wanted = [path for path in paths if path not in self._active]
+            wanted = set(paths)
+            for path, listing in self._active.items():
+                if path not in wanted:
+                    listing.cancel()
+            self._cond.notify_all()
+
+    def take(self, path):
+        """The listing of path if it is being scanned right now, handed over to the caller"""
+        with self._cond:
+            return self._active.pop(path, None)
+
+    def collect(self):
+        listings = []
+        while self._done:
+            listings.append(self._done.popleft())
+        return listings
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._wanted:
+                    self._cond.wait()
+                path = self._wanted.pop(0)
+                wanted = self._wanted
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not stat_module.S_ISDIR(st.st_mode):
+                continue
+            with self._cond:
+                if self._wanted is not wanted:
+                    # The cursor moved while we waited on stat; still wanted?
+                    if path not in self._wanted:
+                        continue
+                    self._wanted.remove(path)
+                if path in self._active:
+                    continue
+                listing = DirListing(path, st.st_mtime)
+                listing.notify = self.notify
+                self._active[path] = listing
+            listing.scan()
+            with self._cond:
+                if self._active.get(path) is not listing:
+                    continue  # taken over, or replaced
+                del self._active[path]
+            if not listing.cancelled() and listing.error is None:
+                self._done.append(listing)
+                if self.notify:
+                    self.notify()
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Directory watcher on Linux inotify, reached through ctypes
+
+    poll() returns (path, kind, name) events, kind being 'add', 'remove',
+    'modify' or 'rescan' (name is None; the cached listing can't be trusted).
+    """
+
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+            | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths = {}
+        self._wds = {}
+
+    def fileno(self):
+        return self.fd
+
+    def watched(self):
+        return set(self._paths)
+
+    def watch(self, path):
+        if path in self._paths:
+            return True
+        wd = self._add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            return False  # no permission, or out of watches: mtime checks still apply
+        self._paths[path] = wd
+        self._wds[wd] = path
+        return True
+
+    def unwatch(self, path):
+        wd = self._paths.pop(path, None)
+        if wd is not None:
+            self._wds.pop(wd, None)
+            self._rm_watch(self.fd, wd)
+
+    def poll(self):
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError:  # EAGAIN: queue drained
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    events.extend((path, 'rescan', None) for path in self._paths)
+                    continue
+                path = self._wds.get(wd)
+                if path is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self._wds[wd]
+                    self._paths.pop(path, None)
+                    events.append((path, 'rescan', None))
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    events.append((path, 'rescan', None))
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    events.append((path, 'add', name))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    events.append((path, 'remove', name))
+                else:
+                    events.append((path, 'modify', name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher that re-lists watched directories on an interval
+
+    Large directories are only re-listed when their mtime changes, so
+    in-place modifications there are not reported.
+    """
+
+    STAT_LIMIT = 20000
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._snapshots = {}
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def fileno(self):
+        return None
+
+    def watched(self):
+        with self._lock:
+            return set(self._snapshots)
+
+    def watch(self, path):
+        with self._lock:
+            self._snapshots.setdefault(path, None)
+        return True
+
+    def unwatch(self, path):
+        with self._lock:
+            self._snapshots.pop(path, None)
+
+    def _snapshot(self, path):
+        mtime = os.stat(path).st_mtime
+        entries = {}
+        with os.scandir(path) as scan:
+            for entry in scan:
+                entries[entry.name] = None
+        if len(entries) <= self.STAT_LIMIT:
+            for name in entries:
+                try:
+                    st = os.stat(os.path.join(path, name))
+                    entries[name] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    pass
+        return mtime, entries
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for path in self.watched():
+                with self._lock:
+                    old = self._snapshots.get(path)
+                try:
+                    if old and len(old[1]) > self.STAT_LIMIT and os.stat(path).st_mtime == old[0]:
+                        continue
+                    new = self._snapshot(path)
+                except OSError:
+                    new = None
+                    self._events.put((path, 'rescan', None))
+                with self._lock:
+                    if path not in self._snapshots:
+                        continue
+                    self._snapshots[path] = new
+                if not old or not new:
+                    continue
+                before, after = old[1], new[1]
+                for name in after.keys() - before.keys():
+                    self._events.put((path, 'add', name))
+                for name in before.keys() - after.keys():
+                    self._events.put((path, 'remove', name))
+                for name in after.keys() & before.keys():
+                    if after[name] != before[name]:
+                        self._events.put((path, 'modify', name))
+
+    def poll(self):
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self._stop.set()
+
+
+def make_watcher():
+    """inotify where the platform has it, polling elsewhere"""
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher()
+
+
+class WakingDeque(deque):
+    """deque that calls wake() after items are added, for results fed from worker threads"""
+
+    def __init__(self, wake):
+        super().__init__()
+        self.wake = wake
+
+    def append(self, item):
+        super().append(item)
+        self.wake()
+
+    def extend(self, items):
+        super().extend(items)
+        self.wake()
+
+
+class MatchView:
+    """Read-only sequence of the items selected by a list of indices"""
+
+    __slots__ = ('items', 'indices')
+
+    def __init__(self, items, indices):
+        self.items = items
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.items[j] for j in self.indices[i]]
+        return self.items[self.indices[i]]
+
+    def __iter__(self):
+        items = self.items
+        return (items[j] for j in self.indices)
+
+
+class IncrementalFilter:
+    """Case-insensitive substring filter over a growing list of paths
+
+    Paths are lowercased once when they arrive. The match sets of the
+    current query and each of its prefixes are kept on a stack, so typing
+    another character only tests the previous matches, backspace pops back
+    to an already computed set, and a new batch of paths is tested against
+    each stacked query without touching older paths.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.lowered = []
+        self.levels = []  # [(query, matches)], each query a prefix of the next
+
+    def extend(self, paths):
+        start = len(self.items)
+        self.items.extend(paths)
+        lowered = self.lowered
+        lowered.extend(path.lower() for path in self.items[start:])
+        for query, matches in self.levels:
+            matches.extend(i for i in range(start, len(lowered)) if query in lowered[i])
+
+    def remove(self, predicate):
+        """Drop every path for which predicate(path) is true"""
+        kept = [path for path in self.items if not predicate(path)]
+        queries = [query for query, _ in self.levels]
+        self.items[:] = []
+        self.lowered = []
+        self.levels = []
+        self.extend(kept)
+        for query in queries:
+            self.matches(query)
+
+    def matches(self, query):
+        """Return the indices of items containing query"""
+        query = query.lower()
+        if not query:
+            self.levels = []
+            return range(len(self.items))
+
+        levels = self.levels
+        while levels and not query.startswith(levels[-1][0]):
+            levels.pop()
+        if levels and levels[-1][0] == query:
+            return levels[-1][1]
+
+        lowered = self.lowered
+        if levels:
+            found = [i for i in levels[-1][1] if query in lowered[i]]
+        else:
+            found = [i for i, path in enumerate(lowered) if query in path]
+        levels.append((query, found))
+        return found
+
+    def view(self, query):
+        return MatchView(self.items, self.matches(query))
+
+
+FUZZY_BOUNDARY = frozenset('/\\_-. ')
+SCORE_MATCH = 16
+BONUS_BOUNDARY = 8
+BONUS_CONSECUTIVE = 4
+BONUS_BASENAME = 32
+PENALTY_GAP_START = 3
+PENALTY_GAP_EXTENSION = 1
+
+
+def fuzzy_positions(query, text, start=0):
+    """Greedy positions of query as a subsequence of text[start:], or None"""
+    positions = []
+    pos = start - 1
+    for ch in query:
+        pos = text.find(ch, pos + 1)
+        if pos < 0:
+            return None
+        positions.append(pos)
+    return positions
+
+
+def fuzzy_score(query, path):
+    """fzf-style score of a lowercased query against a lowercased path
+
+    Rewards characters on word boundaries, consecutive runs and matches
+    inside the basename, and penalises gaps. Returns None if query is not
+    a subsequence of path.
+    """
+    base = max(path.rfind('/'), path.rfind(os.sep)) + 1
+    pos = path.rfind(query)
+    if pos >= 0:
+        positions = range(pos, pos + len(query))
+    else:
+        positions = fuzzy_positions(query, path, base) or fuzzy_positions(query, path)
+        if positions is None:
+            return None
+
+    score = 0
+    prev = -2
+    for pos in positions:
+        score += SCORE_MATCH
+        if pos == 0 or path[pos - 1] in FUZZY_BOUNDARY:
+            score += BONUS_BOUNDARY
+        if pos == prev + 1:
+            score += BONUS_CONSECUTIVE
+        elif prev >= 0:
+            score -= PENALTY_GAP_START + PENALTY_GAP_EXTENSION * (pos - prev - 2)
+        prev = pos
+    if positions[0] >= base:
+        score += BONUS_BASENAME
+        if positions[0] == base:
+            score += BONUS_BOUNDARY
+    return score
+
+
+def fuzzy_bound_without(query, missing):
+    """Highest fuzzy_score possible for a path lacking `missing` of query's trigrams
+
+    Each absent trigram breaks a consecutive run somewhere in its window,
+    and one break spans at most two windows; a break costs the consecutive
+    bonus and at least the gap start penalty.
+    """
+    n = len(query)
+    best = (n * (SCORE_MATCH + BONUS_BOUNDARY) + max(0, n - 1) * BONUS_CONSECUTIVE
+            + BONUS_BASENAME + BONUS_BOUNDARY)
+    return best - (missing + 1) // 2 * (BONUS_CONSECUTIVE + PENALTY_GAP_START)
+
+
+class FuzzyMatcher:
+    """Ranked fuzzy matching over an IncrementalFilter, pruned by a trigram index
+
+    The trigram index is built on a background thread as paths arrive. A
+    query first scores paths sharing all but a third of its trigrams (by
+    pigeonhole, the union of the rarest posting lists) plus any paths not
+    indexed yet. The rest lack a third of the query's trigrams, which caps
+    their score (see fuzzy_bound_without); they are only scanned until the
+    heap holds matches above that cap, so the result always equals a full
+    scan. Ranking keeps a bounded heap of the best `limit` matches
+    and runs in time-boxed steps so a keystroke never blocks on a large
+    candidate set; advance() continues the work on later ticks.
+    """
+
+    STEP = 2000  # candidates scored between deadline checks
+
+    def __init__(self, source):
+        self.items = source.items
+        self.lowered = source.lowered
+        self.postings = {}
+        self.indexed = 0
+        self.closed = False
+        self._indexer = None
+        self._key = None
+        self._heap = []
+        self._steps = None
+        self.pending = False
+        self.catch_up()
+
+    def close(self):
+        self.closed = True
+
+    def catch_up(self):
+        """Index paths appended to the source since the last call"""
+        if self.indexed < len(self.lowered) and not (self._indexer and self._indexer.is_alive()):
+            self._indexer = threading.Thread(target=self._build_index, daemon=True)
+            self._indexer.start()
+
+    def _build_index(self):
+        postings = self.postings
+        lowered = self.lowered
+        while self.indexed < len(lowered) and not self.closed:
+            i = self.indexed
+            path = lowered[i]
+            for tri in {path[k:k + 3] for k in range(len(path) - 2)}:
+                posting = postings.get(tri)
+                if posting is None:
+                    posting = postings[tri] = array('I')
+                posting.append(i)
+            self.indexed = i + 1
+
+    def _candidates(self, query, heap, limit):
+        indexed = self.indexed
+        trigrams = {query[k:k + 3] for k in range(len(query) - 2)}
+        seen = set()
+        bound = None
+        if trigrams:
+            pruned = len(trigrams) // 3 + 1
+            lists = sorted((self.postings.get(tri, ()) for tri in trigrams), key=len)
+            for posting in lists[:pruned]:
+                for i in posting[:bisect_right(posting, indexed - 1)]:
+                    if i not in seen:
+                        seen.add(i)
+                        yield i
+            bound = fuzzy_bound_without(query, pruned)
+        # The remaining indexed paths (e.g. abbreviations sharing no trigram)
+        # can still rank, until the heap's worst entry scores above their cap
+        for i in range(indexed):
+            if bound is not None and len(heap) >= limit and heap[0][0] > bound:
+                break
+            if i not in seen:
+                yield i
+        i = indexed
+        while i < len(self.lowered):
+            yield i
+            i += 1
+
+    def _rank(self, query, limit):
+        regex = re.compile('.*?'.join(map(re.escape, query)))
+        lowered = self.lowered
+        heap = self._heap
+        for count, i in enumerate(self._candidates(query, heap, limit), 1):
+            path = lowered[i]
+            if regex.search(path):
+                self._push(heap, limit, (fuzzy_score(query, path), -len(path), -i))
+            if count % self.STEP == 0:
+                yield
+
+    @staticmethod
+    def _push(heap, limit, entry):
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    def rank(self, query, limit, budget=0.03):
+        """Start (or keep) ranking query and return the best matches so far"""
+        query = ''.join(query.lower().split())
+        if (query, limit) != self._key:
+            self._key = (query, limit)
+            self._heap = []
+            self._steps = self._rank(query, limit)
+            self.pending = True
+        return self.advance(budget)
+
+    def advance(self, budget=0.03):
+        """Continue an unfinished ranking for up to budget seconds"""
+        if self.pending:
+            deadline = time.perf_counter() + budget
+            for _ in self._steps:
+                if time.perf_counter() >= deadline:
+                    break
+            else:
+                self.pending = False
+        return self.results()
+
+    def extend(self, start):
+        """Account for source paths appended at index start"""
+        self.catch_up()
+        if self._key and not self.pending:
+            query, limit = self._key
+            regex = re.compile('.*?'.join(map(re.escape, query)))
+            lowered = self.lowered
+            for i in range(start, len(lowered)):
+                path = lowered[i]
+                if regex.search(path):
+                    self._push(self._heap, limit, (fuzzy_score(query, path), -len(path), -i))
+
+    def results(self):
+        items = self.items
+        return [items[-entry[2]] for entry in sorted(self._heap, reverse=True)]
+
+
+class Profiler:
+    """Opt-in timing of the hot paths, with syscalls charged to the section making them
+
+    enable() wraps the functions listed in PROFILED and the os calls in
+    PROFILED_SYSCALLS; disable() puts the originals back, so nothing is paid
+    while profiling is off. Times and syscall counts are inclusive of nested
+    sections. With trace=True every call is also kept as a Chrome trace
+    event (chrome://tracing, Perfetto).
+    """
+
+    TRACE_LIMIT = 1000000  # events kept; the oldest are dropped beyond this
+
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}     # section -> [calls, seconds, max seconds, syscalls]
+        self.syscalls = {}  # os call -> count
+        self.trace = None
+        self.started = 0.0
+        self._threads = {}  # thread id -> name, for trace metadata
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._originals = []
+
+    def enable(self, trace=False):
+        if self.enabled:
+            return
+        self.reset()
+        self.trace = deque(maxlen=self.TRACE_LIMIT) if trace else None
+        for owner, name in PROFILED:
+            original = getattr(owner, name)
+            self._originals.append((owner, name, original))
+            label = original.__qualname__.replace('FileManager.', '')
+            setattr(owner, name, self._section(label, original))
+        for owner, name in PROFILED_SYSCALLS:
+            original = getattr(owner, name)
+            self._originals.append((owner, name, original))
+            setattr(owner, name, self._syscall(name, original))
+        self.enabled = True
+
+    def disable(self):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.syscalls = {}
+            self.started = time.perf_counter()
+
+    def _section(self, label, fn):
+        profiler = self
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            stack = profiler._local.__dict__.setdefault('stack', [])
+            stack.append(0)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                syscalls = stack.pop()
+                if stack:
+                    stack[-1] += syscalls
+                profiler._record(label, start, elapsed, syscalls)
+
+        return timed
+
+    def _syscall(self, name, fn):
+        profiler = self
+
+        @functools.wraps(fn)
+        def counted(*args, **kwargs):
+            stack = getattr(profiler._local, 'stack', None)
+            if stack:
+                stack[-1] += 1
+            profiler.syscalls[name] = profiler.syscalls.get(name, 0) + 1
+            return fn(*args, **kwargs)
+
+        return counted
+
+    def _record(self, label, start, elapsed, syscalls):
+        with self._lock:
+            entry = self.stats.get(label)
+            if entry is None:
+                entry = self.stats[label] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            entry[3] += syscalls
+            if self.trace is not None:
+                tid = threading.get_ident()
+                if tid not in self._threads:
+                    self._threads[tid] = threading.current_thread().name
+                self.trace.append({'name': label, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                                   'ts': (start - self.started) * 1e6, 'dur': elapsed * 1e6,
+                                   'args': {'syscalls': syscalls}})
+
+    def report(self):
+        """(section, calls, seconds, max seconds, syscalls) rows, most time first"""
+        with self._lock:
+            rows = [(label,) + tuple(entry) for label, entry in self.stats.items()]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def dump_trace(self, filename):
+        """Write the recorded events as Chrome trace JSON"""
+        with self._lock:
+            events = list(self.trace or ())
+            names = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                     for tid, name in self._threads.items()]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': names + events, 'displayTimeUnit': 'ms'}, f)
+
+
+PROFILER = Profiler()
+
 
 class FileManager:
 
+    WATCH_INTERVAL = 500  # ms between watcher polls while idle
+    FRAME_INTERVAL = 1 / 60  # background updates are drawn at most this often
+    SYNC_SORT_LIMIT = 20000  # larger listings are sorted on the metadata pool
+
 
     def __init__(self, stdscr):
         self.stdscr = stdscr
@@ -24,29 +3250,87 @@ class FileManager:
         self.show_hidden = False
         self.status_msg = ""
         self.message_timeout = 0
+        self.message_visible = False
         self.clipboard = {'files': [], 'operation': None}
         self.selected_files = set()
         self.search_mode = False
         self.search_query = ""
         self.search_base_path = os.getcwd()
-        self.search_results = []
+        self.search_filter = IncrementalFilter()
+        self.search_results = self.search_filter.items
+        self.fuzzy_mode = False
+        self.fuzzy = None
+        self.fuzzy_window = 0
         self.history = []
         self.history_index = -1
         self.sort_mode = 'name'
+        self.sort_reverse = False
+        self.sort_job = None
         self.loading = False
-        self.last_key_time = 0
 
         self.search_queue = deque()
         self.search_thread = None
+        self.search_cancel = None
+        self.search_stale = None
+        self.search_predicate = None
+        self.search_grep = None
+        self.search_started = 0
+        self.search_workers = DEFAULT_WALK_WORKERS
         self.search_active = False
-        self.search_lock = threading.Lock()
-        self.result_batch = []
-        self.batch_size = 50  
         self.tabs = [{'path': os.getcwd(), 'index': 0}]
         self.current_tab = 0
 
-        self.dir_cache = {}  
-        self.metadata_cache = {}
+        self.dir_cache = ListingCache()
+        self.prefetcher = Prefetcher(notify=self.post) if PREFETCH_WORKERS > 0 else None
+        self.prefetch_key = None
+        self.watcher = make_watcher()
+        self.listing = None
+        self.view_sorted = False
+        self.view_count = 0
+        self.listing_wanted = []
+        self.free_space_cache = None
+
+        # Damage tracking: regions to redraw and the last content of each row
+        self.dirty = {'all'}
+        self.screen_rows = {}
+        self.frames = 0
+        self.bytes_written = 0
+        self.show_render_stats = False
+        self.show_profile = False
+        self.profile_owned = False
+        self.profile_drawn = 0
+
+        # Main loop (see run_loop); worker threads wake it through post()
+        self.loop = None
+        self.wakeup = None
+        self.keys_ready = None
+        self.wake_pending = False
+        self.posted = queue.SimpleQueue()  # callbacks from worker threads, run on the UI thread
+        self.frame_time = 0
+        self.search_meta = {}
+        self.search_meta_wanted = []
+        self.search_meta_pending = set()
+        self.meta_pool = ThreadPoolExecutor(max_workers=4)
+        self.jobs = JobQueue()
+        self.jobs.notify = self.post
+        self.du = DiskUsage()
+        self.du_cancel = None
+        self.du_listing = None
+        self.du_progress = (0, 0)
+        self.du_drawn = 0
+        self.usage = None
+        self.usage_drawn = None
+        self.dupes = None
+        self.dupes_drawn = None
+        self.preview_on = False
+        self.previewer = None
+        self.preview_key = None
+        self.preview_drawn = None
+        self.purge_trash()
+        self.meta_lock = threading.Lock()
+        self.meta_jobs = 0
+        self.meta_version = 0
+        self.meta_drawn = 0
 
         curses.start_color()
         curses.use_default_colors()
@@ -67,114 +3351,291 @@ class FileManager:
             'default': curses.COLOR_WHITE
         }
 
-    def get_file_type(self, filename):
-        if self.search_mode:
-            full_path = os.path.join(self.search_base_path, filename)
-        else:
-            full_path = os.path.join(self.current_path, filename)
-        
-        if os.path.isdir(full_path):
-            return 'directory'
-        if os.access(full_path, os.X_OK):
-            return 'executable'
-        ext = os.path.splitext(filename)[1].lower()
-        if ext in ['.zip', '.tar', '.gz', '.bz2']:
-            return 'archive'
-        if ext in ['.png', '.jpg', '.jpeg', '.gif']:
-            return 'image'
-        return 'default'
-
-    @lru_cache(maxsize=100)
-    def get_cached_listdir(self, path):
-        """Cached directory listing with invalidation based on mtime"""
-        try:
-            # Get the directory's modification time to include in the cache key
-            mtime = os.path.getmtime(path)
-        except:
-            return []
-        
-        try:
-            return os.listdir(path)
-        except:
-            return []
-        
-        # This return is theoretically unreachable due to the try-except blocks above
-        return []
-
     def refresh_files(self):
-        self.loading = True
+        """Show the current directory, streaming large listings in the background
+
+        A cached listing is reused while the directory mtime is unchanged.
+        Otherwise a new scan starts and the first page is shown as soon as
+        it arrives; update_listing() picks up the rest on later ticks.
+        """
+        path = self.current_path
+        self.apply_watch_events()
         try:
-            current_mtime = os.path.getmtime(self.current_path)
-            cached = self.dir_cache.get(self.current_path)
-            
-            if cached and cached[0] == current_mtime:
-                entries = cached[1]
-            else:
-                with os.scandir(self.current_path) as scan:
-                    entries = list(scan)
-                self.dir_cache[self.current_path] = (current_mtime, entries)
-                self.metadata_cache[self.current_path] = {}
+            mtime = os.stat(path).st_mtime
+        except PermissionError:
+            self.show_message("Permission denied", 2)
+            return
+        except OSError as e:
+            self.show_message(f"Error: {str(e)}", 2)
+            return
 
-            self.files = []
-            for entry in entries:
-                if self.show_hidden or not entry.name.startswith('.'):
-                    try:
-                        meta = {
-                            'name': entry.name,
-                            'is_dir': entry.is_dir(),
-                            'size': entry.stat().st_size if not entry.is_dir() else 0,
-                            'mtime': entry.stat().st_mtime,
-                            'type': self.determine_file_type(entry)
-                        }
-                        self.metadata_cache[self.current_path][entry.name] = meta
-                        self.files.append(entry.name)
-                    except OSError:
-                        continue
+        previous = self.listing
+        if previous and previous.path != path and not previous.complete:
+            previous.cancel()
+            self.dir_cache.pop(previous.path, None)
+        if self.du_cancel and (previous is None or previous.path != path):
+            self.du_cancel.set()
+            self.du_cancel = None
 
-            if self.sort_mode == 'name':
-                self.files.sort(key=lambda x: (
-                    not self.metadata_cache[self.current_path][x]['is_dir'], 
-                    x.lower()
-                ))
-            elif self.sort_mode == 'size':
-                self.files.sort(key=lambda x: (
-                    self.metadata_cache[self.current_path][x]['size']
-                ))
-            elif self.sort_mode == 'modified':
-                self.files.sort(key=lambda x: (
-                    self.metadata_cache[self.current_path][x]['mtime']
-                ), reverse=True)
+        if self.prefetcher is not None:
+            self.collect_prefetched()
+            streaming = self.prefetcher.take(path)
+            if streaming is not None:
+                self.dir_cache[path] = streaming
+        listing = self.dir_cache.get(path)
+        if listing is None or listing.mtime != mtime or listing.cancelled() or \
+                (listing.complete and listing.deleted and len(listing.deleted) * 2 > listing.count):
+            listing = DirListing(path, mtime)
+            listing.notify = self.post
+            self.dir_cache[path] = listing
+            listing.start()
+            listing.first_page.wait(0.05)
+        self.listing = listing
+        self.view_sorted = False
+        self.view_count = 0
+        self.files = MatchView(listing.names, [])
+        self.update_listing()
+        self.sync_watches()
 
-            self.apply_search_filter()
-        except PermissionError:
-            self.show_message("Permission denied", 2)
-        finally:
-            self.loading = False
-
-    def determine_file_type(self, entry):
-        """Determine file type using DirEntry attributes"""
-        if entry.is_dir():
-            return 'directory'
-        if platform.system() != 'Windows' and (os.access(entry.path, os.X_OK)):
-            return 'executable'
-        ext = os.path.splitext(entry.name)[1].lower()
-        if ext in ['.zip', '.tar', '.gz', '.bz2']:
-            return 'archive'
-        if ext in ['.png', '.jpg', '.jpeg', '.gif']:
-            return 'image'
-        return 'default'
-
-    def get_file_metadata(self, filename):
-        """Retrieve cached metadata for file"""
-        return self.metadata_cache[self.current_path].get(filename, {})
+    def collect_prefetched(self):
+        """Cache the listings the prefetcher finished, unless a usable one is cached already"""
+        for listing in self.prefetcher.collect():
+            cached = self.dir_cache.peek(listing.path)
+            if cached is None or cached.cancelled() or cached.mtime != listing.mtime:
+                self.dir_cache.offer(listing.path, listing)
+
+    def update_prefetch(self):
+        """Point the prefetcher at what is likely to be opened next
+
+        In order: the directory under the cursor, the parent, the other
+        tabs and the recent history. Directories already cached are left
+        out; their mtime is checked when they are opened.
+        """
+        if self.prefetcher is None:
+            return
+        self.collect_prefetched()
+        files = self.filtered_files if self.search_mode else self.files
+        target = None
+        if 0 <= self.selected_idx < len(files):
+            if self.search_mode:
+                # Grep hits are always files; other results may be directories
+                if not self.search_grep:
+                    target = self.search_result_path(files[self.selected_idx])
+            elif self.listing is not None and isinstance(files, MatchView) and \
+                    self.listing.is_dir[files.indices[self.selected_idx]]:
+                target = os.path.join(self.current_path, files[self.selected_idx])
+        key = (self.current_path, target, self.current_tab, len(self.tabs), len(self.history))
+        if key == self.prefetch_key:
+            return
+        self.prefetch_key = key
+        candidates = [target, os.path.dirname(self.current_path)]
+        candidates += [tab['path'] for i, tab in enumerate(self.tabs) if i != self.current_tab]
+        candidates += reversed(self.history[-PREFETCH_HISTORY:])
+        wanted = []
+        for path in candidates:
+            if path is None or path == self.current_path or path in wanted:
+                continue
+            cached = self.dir_cache.peek(path)
+            if cached is None or cached.cancelled():
+                wanted.append(path)
+        self.prefetcher.want(wanted)
+
+    def sync_watches(self):
+        """Watch the directories shown in open tabs, and nothing else"""
+        wanted = {tab['path'] for i, tab in enumerate(self.tabs) if i != self.current_tab}
+        wanted.add(self.current_path)
+        watched = self.watcher.watched()
+        for path in watched - wanted:
+            self.watcher.unwatch(path)
+        for path in wanted - watched:
+            self.watcher.watch(path)
+
+    def apply_watch_events(self):
+        """Fold filesystem changes into the cached listings they belong to"""
+        self.apply_deltas(self.watcher.poll())
+
+    def apply_deltas(self, events):
+        """Apply (directory, kind, name[, stat]) changes to cached listings and refresh the view"""
+        changed = set()
+        # A write usually raises several modify events; stat each file once, last
+        modified = dict.fromkeys((event[0], event[2]) for event in events if event[1] == 'modify')
+        events = [event for event in events if event[1] != 'modify']
+        events.extend((path, 'modify', name) for path, name in modified)
+        for path, kind, name, *st in events:  # jobs may pass an 'add' with its stat
+            listing = self.dir_cache.peek(path)
+            if listing is None:
+                continue
+            if kind == 'rescan':
+                listing.mtime = None
+            elif listing.apply(kind, name, *st):
+                changed.add(path)
+        watched = self.watcher.watched()
+        for path in changed:
+            listing = self.dir_cache.peek(path)
+            if path not in watched:
+                # Nothing reported what else changed here since the scan
+                listing.mtime = None
+                continue
+            # The deltas are applied and the watcher covers the rest
+            try:
+                listing.mtime = os.stat(path).st_mtime
+            except OSError:
+                listing.mtime = None
+        listing = self.listing
+        if listing is None or listing.path != self.current_path:
+            return
+        if listing.mtime is None:
+            self.refresh_files()
+        elif listing.path in changed:
+            self.view_sorted = False
+            self.update_listing()
+
+    def update_listing(self):
+        """Fold newly scanned entries into the view; sort once the scan is done"""
+        listing = self.listing
+        if listing is None:
+            return
+        if listing.error and listing.complete and not listing.count:
+            self.show_message("Permission denied" if isinstance(listing.error, PermissionError)
+                              else f"Error: {str(listing.error)}", 2)
+            listing.error = None
+
+        if listing.has_pending() and listing.apply_pending():
+            self.view_sorted = False
+        needs_stat = self.sort_mode in DirListing.STAT_SORTS
+        if needs_stat:
+            listing.start_stat_all()
+        if self.sort_mode == 'size' and listing.complete and self.du_listing is not listing:
+            self.start_du()
+        ready = listing.complete and (listing.stat_complete or not needs_stat)
+
+        if ready and not self.view_sorted:
+            key = (self.sort_mode, self.show_hidden, self.sort_descending())
+            order = listing.cached_order(*key)
+            if order is None and listing.count > self.SYNC_SORT_LIMIT:
+                # Sort large listings off the UI thread; tick() swaps the result in
+                if self.sort_job != (listing, key):
+                    self.sort_job = (listing, key)
+
+                    def sort():
+                        listing.sorted_order(*key)
+                        self.sort_job = None  # resubmitted if the listing changed meanwhile
+
+                    self.submit_metadata_job(sort)
+                self.loading = True
+                return
+            if order is None:
+                order = listing.sorted_order(*key)
+            selected = self.files[self.selected_idx] if 0 <= self.selected_idx < len(self.files) else None
+            self.files = MatchView(listing.names, order)
+            self.view_sorted = True
+            self.view_count = listing.count
+            if selected is not None and self.selected_idx:
+                # Keep the cursor on the same entry after a late re-sort
+                try:
+                    self.selected_idx = order.index(listing.index_of(selected))
+                except (ValueError, TypeError):
+                    pass
+            self.selected_idx = min(self.selected_idx, max(0, len(self.files) - 1))
+            self.dir_cache.trim()
+        elif not listing.complete and listing.count > self.view_count:
+            # Still streaming: append new entries in scan order
+            count = listing.count
+            new = range(self.view_count, count)
+            if not self.show_hidden:
+                new = [i for i in new if not listing.is_hidden(i)]
+            self.files.indices.extend(new)
+            self.view_count = count
+        else:
+            self.loading = not ready
+            return
+
+        self.loading = not ready
+        self.apply_search_filter()
+        self.mark_dirty('header', 'list')
+
+    def row_metadata(self, curr_idx):
+        """Metadata and info column for a row of the current view, from caches only"""
+        if self.search_mode:
+            meta = self.get_search_metadata(self.filtered_files[curr_idx])
+            info = None
+            if meta and not meta['is_dir'] and not meta.get('missing'):
+                info = meta.get('info')
+                if info is None:
+                    info = meta['info'] = format_info(meta['size'], meta['mtime'])
+            return meta, info
+        listing = self.listing
+        i = self.files.indices[curr_idx]
+        if not listing.modes[i]:
+            self.listing_wanted.append(i)
+        return listing.metadata(i), listing.info(i)
+
+    def submit_metadata_job(self, fn):
+        """Run fn on the metadata pool; the list is redrawn when it finishes"""
+        with self.meta_lock:
+            self.meta_jobs += 1
+
+        def job():
+            try:
+                fn()
+            finally:
+                with self.meta_lock:
+                    self.meta_jobs -= 1
+                    self.meta_version += 1
+                self.post()
+
+        self.meta_pool.submit(job)
+
+    def _fetch_listing_metadata(self):
+        """Stat the entries drawn without metadata this frame"""
+        listing = self.listing
+        wanted = listing.request_stat(self.listing_wanted)
+        self.listing_wanted = []
+        if wanted:
+            self.submit_metadata_job(lambda: [listing.stat(i) for i in wanted])
+
+    def get_search_metadata(self, result):
+        """Metadata for a search result, stat'ed once in the background"""
+        meta = self.search_meta.get(result)
+        if meta is None:
+            self.search_meta_wanted.append(result)
+            return {}
+        return meta
+
+    def _fetch_search_metadata(self):
+        """Stat the search results drawn without metadata this frame"""
+        wanted = [r for r in dict.fromkeys(self.search_meta_wanted) if r not in self.search_meta_pending]
+        self.search_meta_wanted = []
+        if not wanted:
+            return
+        self.search_meta_pending.update(wanted)
+        search_meta = self.search_meta
+        paths = [(result, self.search_result_path(result)) for result in wanted]
+
+        def fetch():
+            for result, path in paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    search_meta[result] = {'missing': True}
+                    continue
+                is_dir = stat_module.S_ISDIR(st.st_mode)
+                search_meta[result] = {
+                    'name': os.path.basename(path),
+                    'is_dir': is_dir,
+                    'size': 0 if is_dir else st.st_size,
+                    'mtime': st.st_mtime,
+                    'type': classify(path, is_dir, st.st_mode),
+                }
+
+        self.submit_metadata_job(fetch)
 
     def apply_search_filter(self):
         if self.search_mode:
-            query = self.search_query.lower()
-            self.filtered_files = [
-                rel_path for rel_path in self.search_results
-                if query in rel_path.lower()
-            ]
+            if self.fuzzy_mode and self.search_query:
+                self.filtered_files = self.fuzzy.rank(self.search_query, self.fuzzy_window)
+            else:
+                self.filtered_files = self.search_filter.view(self.search_query)
         else:
             if self.search_query:
                 self.filtered_files = [
@@ -182,7 +3643,103 @@ class FileManager:
                     if self.search_query.lower() in f.lower()
                 ]
             else:
-                self.filtered_files = self.files.copy()
+                self.filtered_files = self.files
+
+    def mark_dirty(self, *regions):
+        """Schedule regions ('all', 'header', 'list', 'footer') for the next render"""
+        self.dirty.update(regions or ('all',))
+
+    def paint(self, y, segments, slot=None):
+        """Write a screen row given as (x, text, attr) segments, unless it is unchanged
+
+        slot tells apart independent parts of one row, such as the preview pane.
+        """
+        segments = tuple(segments)
+        key = y if slot is None else (y, slot)
+        if self.screen_rows.get(key) == segments:
+            return
+        self.screen_rows[key] = segments
+        for x, text, attr in segments:
+            try:
+                self.stdscr.addstr(y, x, text, attr)
+            except curses.error:
+                pass  # writing the last cell of the screen raises
+            self.bytes_written += len(text.encode('utf-8'))
+
+    def render(self):
+        """Redraw the dirty regions and push the changes in one doupdate()"""
+        if not self.dirty:
+            return
+        if 'all' in self.dirty:
+            self.stdscr.erase()
+            self.screen_rows = {}
+            self.draw_borders()
+            self.dirty.update(('header', 'list', 'footer'))
+        if 'header' in self.dirty:
+            self.draw_header()
+        if 'list' in self.dirty:
+            if self.usage:
+                self.draw_usage()
+            elif self.dupes:
+                self.draw_dupes()
+            else:
+                self.draw_list()
+            if self.show_profile:
+                self.draw_profile()
+        if 'footer' in self.dirty:
+            self.draw_footer()
+        self.dirty.clear()
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+        self.frames += 1
+
+    def next_timeout(self):
+        """How long the main loop may sleep in ms: short while something animates
+
+        None when idle: input, inotify events and worker threads wake the
+        loop themselves. The polling watcher has no descriptor to wait on.
+        """
+        if self.loading or self.search_active or (self.fuzzy and self.fuzzy.pending) \
+                or self.meta_jobs or self.meta_version != self.meta_drawn or self.preview_stale():
+            return 100
+        if self.jobs.busy() or self.jobs.finished or self.du_active() or self.usage_stale() \
+                or self.dupes_stale():
+            return 250
+        if self.message_visible:
+            return max(10, min(self.WATCH_INTERVAL, int((self.message_timeout - time.time()) * 1000)))
+        return self.WATCH_INTERVAL if self.watcher.fileno() is None else None
+
+    def tick(self):
+        """Mark regions whose content changes with time alone"""
+        self.run_posted()
+        self.apply_watch_events()
+        self.update_prefetch()
+        if self.jobs.busy():
+            self.mark_dirty('footer')
+        self.finish_jobs()
+        listing = self.du_listing
+        if listing is not None and listing is self.listing and listing.stat_version != self.du_drawn:
+            self.du_drawn = listing.stat_version
+            if self.sort_mode == 'size' and self.view_sorted:
+                self.view_sorted = False
+                self.update_listing()
+            self.mark_dirty('header', 'list')
+        elif self.du_active():
+            self.mark_dirty('header')
+        if self.usage_stale() or self.dupes_stale():
+            self.mark_dirty('header', 'list')
+        if self.preview_stale():
+            self.mark_dirty('list')
+        if self.show_profile and time.time() - self.profile_drawn >= 1:
+            self.mark_dirty('list')
+        if self.loading:
+            self.update_listing()
+            self.mark_dirty('header')
+        if self.message_visible and time.time() >= self.message_timeout:
+            self.message_visible = False
+            self.mark_dirty('list', 'footer')
+        if self.meta_version != self.meta_drawn:
+            self.mark_dirty('list')
 
     def draw_borders(self):
         height, width = self.stdscr.getmaxyx()
@@ -200,6 +3757,12 @@ class FileManager:
         SEARCH_ANIMATION = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
         self.draw_tab_bar()
         height, width = self.stdscr.getmaxyx()
+        if self.usage:
+            self.draw_usage_header()
+            return
+        if self.dupes:
+            self.draw_dupes_header()
+            return
 
         if self.loading:
             frame = int(time.time() * 8) % len(LOADING_ANIMATION)
@@ -210,69 +3773,74 @@ class FileManager:
         header = f" {loading_indicator} 📁 {self.current_path} "
         
         if not self.search_mode:
-            try:
-                usage = psutil.disk_usage(self.current_path)
-                free_space = f"{usage.free / (1024**3):.1f}GB free"
-                header += f" [{free_space}]"
-            except Exception as e:
-                header += " [Space: N/A]"
+            header += f" [{self.get_free_space()}]"
         
         if self.search_mode:
-            header += f" [Search: {self.search_query}]"
+            if self.search_predicate:
+                header += f" [Find: {self.search_predicate.text}]"
+            if self.search_grep:
+                header += f" [Grep: {self.search_grep.pattern}"
+                if self.search_active:
+                    header += f" {format_size(self.search_grep.rate())}/s"
+                header += "]"
+            label = "Fuzzy" if self.fuzzy_mode else "Search"
+            header += f" [{label}: {self.search_query}]"
         
         header = header[:width - 20]  # Leave space for sort indicator
-        self.stdscr.addstr(1, 2, header.ljust(width-4), curses.color_pair(1) | curses.A_BOLD)
 
         # Sort indicator with animation during operations
-        sort_text = f"Sort: {self.sort_mode.title()}"
+        sort_text = f"Sort: {self.sort_mode.title()} {'↓' if self.sort_descending() else '↑'}"
+        if self.du_active():
+            done, total = self.du_progress
+            sort_text = f"Sizing {done}/{total}  {sort_text}"
         if self.loading:
             frame = int(time.time() * 4) % len(SEARCH_ANIMATION)
             sort_text = f"{SEARCH_ANIMATION[frame]} {sort_text}"
-        self.stdscr.addstr(1, width - len(sort_text) - 2, sort_text, curses.color_pair(3))
+        self.paint(1, [(2, header.ljust(width - 4), curses.color_pair(1) | curses.A_BOLD),
+                       (width - len(sort_text) - 2, sort_text, curses.color_pair(3))])
 
-    def draw_progress(self, current: int, total: int, message: str):
-        height, width = self.stdscr.getmaxyx()
-        bar_width = min(width - 20, 50)  # Maximum 50 characters for bar
-        progress = current / total if total > 0 else 0
-        filled = int(bar_width * progress)
-        
-        bar_chars = ['▏', '▎', '▍', '▌', '▋', '▊', '▉']
-        fractional = int((bar_width * progress - filled) * len(bar_chars))
-        
-        bar = '[' + '█' * filled 
-        if current < total:
-            bar += bar_chars[fractional] if fractional > 0 else ''
-        bar += ' ' * (bar_width - filled - 1) + ']'
-        
-        progress_text = f"{message} {bar} {current}/{total}"
-        self.stdscr.addstr(height - 4, 2, progress_text.ljust(width-4), curses.color_pair(3))
-        self.stdscr.refresh()
+    def get_free_space(self):
+        """Free space on the current filesystem, re-queried at most every few seconds"""
+        now = time.time()
+        cached = self.free_space_cache
+        if cached and cached[0] == self.current_path and now - cached[1] < 5:
+            return cached[2]
+        try:
+            usage = psutil.disk_usage(self.current_path)
+            text = f"{usage.free / (1024**3):.1f}GB free"
+        except Exception:
+            text = "Space: N/A"
+        self.free_space_cache = (self.current_path, now, text)
+        return text
 
     def draw_list(self):
-        height, width = self.stdscr.getmaxyx()
+        """Draw the visible rows from cached metadata only (no filesystem calls)
+
+        Rows are painted through paint(), so only rows whose content changed
+        since the last frame are sent to the terminal.
+        """
+        height = self.stdscr.getmaxyx()[0]
+        width = self.list_width()
         max_items = height - 5
         files = self.filtered_files if self.search_mode else self.files
         start_idx = max(0, self.selected_idx - max_items + 1)
+        message_row = height - 3 if self.message_visible else None
 
         for i in range(max_items):
+            y = 3 + i
+            if y == message_row:
+                continue  # covered by the status message
             curr_idx = start_idx + i
             if curr_idx >= len(files):
-                break
+                self.paint(y, [(2, ' ' * (width - 4), curses.A_NORMAL)])
+                continue
 
             filename = files[curr_idx]
-            meta = self.get_file_metadata(filename)
-            
+            meta, info = self.row_metadata(curr_idx)
             is_dir = meta.get('is_dir', False)
-            file_type = meta.get('type', 'default')
-            size = meta.get('size', 0)
-            mtime = meta.get('mtime', 0)
-            
-            filepath = os.path.join(self.search_base_path, filename) if self.search_mode else os.path.join(self.current_path, filename)
-            is_dir = os.path.isdir(filepath)
             prefix = "  📁 " if is_dir else "  📄 "
-            color_type = self.get_file_type(filename)
-            color = self.colors.get(color_type, curses.COLOR_WHITE)
-            
+            color = self.colors.get(meta.get('type', 'default'), curses.COLOR_WHITE)
+
             select_indicator = "✓ " if filename in self.selected_files else "  "
             display_name = f"{select_indicator}{prefix}{filename}"
             
@@ -281,55 +3849,170 @@ class FileManager:
                 display_name = display_name[:-3] + "..."
 
             if curr_idx == self.selected_idx:
-                self.stdscr.addstr(3 + i, 2, display_name.ljust(width - 4), curses.color_pair(6))
+                attr = curses.color_pair(6)
             else:
-                color_pair = 8 if filename in self.selected_files else color
-                self.stdscr.addstr(3 + i, 2, display_name, curses.color_pair(color_pair))
+                attr = curses.color_pair(8 if filename in self.selected_files else color)
 
-            if not is_dir:
-                try:
-                    stat = os.stat(filepath)
-                    size = stat.st_size
-                    mtime = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
-                    size_str = f"{size / 1024:.1f}KB" if size < 1024 * 1024 else f"{size / (1024 * 1024):.1f}MB"
-                    info = f"{size_str}  {mtime}"
-                    self.stdscr.addstr(3 + i, width - len(info) - 2, info, curses.color_pair(3))
-                except:
-                    pass
+            info = info or ''
+
+            # Pad the name to the info column so stale text is overwritten
+            name_width = width - 4 - len(info)
+            segments = [(2, display_name.ljust(name_width)[:name_width], attr)]
+            if info:
+                segments.append((width - len(info) - 2, info, curses.color_pair(3)))
+            self.paint(y, segments)
+
+        self.meta_drawn = self.meta_version
+        if self.preview_on:
+            self.draw_preview()
+        if self.search_meta_wanted:
+            self._fetch_search_metadata()
+        if self.listing_wanted:
+            self._fetch_listing_metadata()
+
+    def toggle_profile(self):
+        """Show or hide the profile overlay; profiling runs only while it is shown
+
+        A session trace started through PYFILER_PROFILE keeps running.
+        """
+        self.show_profile = not self.show_profile
+        if self.show_profile and not PROFILER.enabled:
+            PROFILER.enable()
+            self.profile_owned = True
+        elif not self.show_profile and self.profile_owned:
+            PROFILER.disable()
+            self.profile_owned = False
+        self.mark_dirty()
+
+    def draw_profile(self):
+        """Overlay the per-section counters on the right of the list"""
+        height, width = self.stdscr.getmaxyx()
+        box_width = min(width - 4, 74)
+        x = width - box_width - 2
+        elapsed = time.perf_counter() - PROFILER.started
+        lines = [f" Profile, last {elapsed:.0f}s  [F9] close",
+                 f" {'section':<32}{'calls':>7}{'ms':>9}{'avg':>7}{'max':>7}{'sys':>8}"]
+        for label, calls, seconds, peak, syscalls in PROFILER.report()[:max(0, height - 12)]:
+            lines.append(f" {label[:31]:<32}{calls:>7}{seconds * 1000:>9.1f}{seconds * 1000 / calls:>7.2f}"
+                         f"{peak * 1000:>7.1f}{syscalls:>8}")
+        counts = sorted(PROFILER.syscalls.items(), key=lambda item: item[1], reverse=True)
+        lines.append(" syscalls: " + (", ".join(f"{name} {count}" for name, count in counts) or "none"))
+        for i, line in enumerate(lines):
+            y = 3 + i
+            if y >= height - 3:
+                break
+            self.screen_rows.pop((y, 'profile'), None)  # the list may have painted over it
+            self.paint(y, [(x, line.ljust(box_width)[:box_width], curses.color_pair(7))], 'profile')
+        self.profile_drawn = time.time()
+
+    def list_width(self):
+        """Screen width the file list lays itself out in; the preview pane takes the rest"""
+        width = self.stdscr.getmaxyx()[1]
+        return width // 2 + 1 if self.preview_on else width
+
+    def toggle_preview(self):
+        self.preview_on = not self.preview_on
+        if self.preview_on and self.previewer is None:
+            self.previewer = Previewer(self.post)
+        self.preview_key = None
+        self.mark_dirty()
+
+    def preview_path(self):
+        files = self.filtered_files if self.search_mode else self.files
+        if not files or self.selected_idx >= len(files):
+            return None
+        name = files[self.selected_idx]
+        if self.search_mode:
+            return self.search_result_path(name)
+        return os.path.join(self.current_path, name)
+
+    def preview_stale(self):
+        """True while the preview pane waits on (or lags) the previewer"""
+        previewer = self.previewer
+        if not self.preview_on or self.usage or self.dupes:
+            return False  # those views draw no preview
+        return previewer.pending or previewer.version != self.preview_drawn
+
+    def draw_preview(self):
+        """Draw the preview of the selected row; rendering happens on the previewer thread"""
+        height, width = self.stdscr.getmaxyx()
+        split = self.list_width() - 1
+        pane_width = width - split - 4
+        lines = height - 5
+        path = self.preview_path()
+        rows = []
+        if path is not None and pane_width > 0:
+            key = (path, pane_width, lines)
+            if key != self.preview_key:
+                self.previewer.request(*key)
+                self.preview_key = key
+            rows = self.previewer.get(*key)
+            if rows is None:
+                rows = ["Loading..."]
+        message_row = height - 3 if self.message_visible else None
+        for i in range(lines):
+            y = 3 + i
+            if y == message_row:
+                self.screen_rows.pop((y, 'preview'), None)  # repaint once the message is gone
+                continue
+            text = rows[i] if i < len(rows) else ''
+            self.paint(y, [(split, '│', curses.color_pair(3)),
+                           (split + 2, text.ljust(pane_width)[:pane_width], curses.A_NORMAL)], 'preview')
+        self.preview_drawn = self.previewer.version
 
     def draw_footer(self):
         height, width = self.stdscr.getmaxyx()
         footer_parts = [
-            "[F1]Help", "[F5]Refresh", "[F6]Sort", "[PgUp/PgDn]Tabs",
+            "[F1]Help", "[F5]Refresh", "[F6]Sort", "[F7]Order", "[PgUp/PgDn]Tabs",
             "[↑/↓]Nav", "[↵]Open", "[←]Back", "[Space]Select",
             "[C]Copy", "[X]Cut", "[V]Paste", "[D]Delete",
-            "[S]Search", "[Esc]Cancel", "[Q]uit"
+            "[S]Search", "[F]Find", "[G]Grep", "[U]Sizes", "[B]Usage", "[=]Dupes", "[I]Preview", "[F9]Profile", "[Esc]Cancel", "[Q]uit"
         ]
-        footer = " ".join(footer_parts)
-        self.stdscr.addstr(height - 1, 2, footer[:width - 4], curses.color_pair(4))
+        if self.usage:
+            footer_parts = ["[↑/↓]Nav", "[→]Drill in", "[←]Up", "[↵]Open in list",
+                            "[U]Rescan", "[E]Export", "[I]Import", "[Esc/B]Close"]
+        elif self.dupes:
+            footer_parts = ["[↑/↓]Nav", "[Space]Mark", "[A]Mark extras", "[N]Unmark all",
+                            "[D]Delete marked", "[↵]Open in list", "[Esc]Close"]
+        footer = self.job_status() or " ".join(footer_parts)
+        if self.show_render_stats:
+            stats = f" frames:{self.frames} bytes:{self.bytes_written} "
+            footer = footer[:max(0, width - 4 - len(stats))].ljust(width - 4 - len(stats)) + stats
+        self.paint(height - 1, [(2, footer[:width - 4].ljust(width - 4), curses.color_pair(4))])
         
-        if self.status_msg and time.time() < self.message_timeout:
-            msg = f" {self.status_msg} "
-            self.stdscr.addstr(height - 3, 2, msg, curses.color_pair(4) | curses.A_REVERSE)
+        if self.message_visible:
+            msg = f" {self.status_msg} "[:width - 4]
+            self.paint(height - 3, [(2, msg, curses.color_pair(4) | curses.A_REVERSE),
+                                    (2 + len(msg), ' ' * (width - 4 - len(msg)), curses.A_NORMAL)])
 
     def show_message(self, msg, timeout=3):
         self.status_msg = msg
         self.message_timeout = time.time() + timeout
+        self.message_visible = True
+        self.mark_dirty('list', 'footer')
 
     def get_input(self, prompt):
         height, width = self.stdscr.getmaxyx()
         self.stdscr.addstr(height - 3, 2, prompt.ljust(width-4), curses.color_pair(7))
         curses.echo()
+        self.stdscr.timeout(-1)  # the main loop's tick timeout would cut typing short
         input_str = self.stdscr.getstr(height - 3, 2 + len(prompt), 60).decode()
         curses.noecho()
         self.stdscr.move(height - 3, 2)
         self.stdscr.clrtoeol()
+        self.mark_dirty()
         return input_str.strip()
 
     def handle_input(self, key):
         if self.search_mode:
             self.handle_search_input(key)
             return
+        if self.usage:
+            self.handle_usage_input(key)
+            return
+        if self.dupes:
+            self.handle_dupes_input(key)
+            return
 
         if key == curses.KEY_UP:
             self.selected_idx = max(0, self.selected_idx - 1)
@@ -343,10 +4026,10 @@ class FileManager:
         elif key == ord(' '):
             self.toggle_selection()
         elif key == ord('q'):
-            sys.exit()
+            self.quit()
         elif key == ord('h'):
             self.show_hidden = not self.show_hidden
-            self.refresh_files()
+            self.resort()
         elif key == ord('d'):
             self.delete_files()
         elif key == ord('c'):
@@ -357,10 +4040,33 @@ class FileManager:
             self.paste_files()
         elif key == ord('s'):
             self.start_search()
+        elif key == ord('f'):
+            self.start_find()
+        elif key == ord('g'):
+            self.start_grep()
         elif key == curses.KEY_F5:
+            self.dir_cache.pop(self.current_path, None)
             self.refresh_files()
         elif key == curses.KEY_F6:
             self.cycle_sort_mode()
+        elif key == curses.KEY_F7:
+            self.toggle_sort_order()
+        elif key == ord('b'):
+            self.open_usage_view()
+        elif key == ord('='):
+            self.find_duplicates()
+        elif key == ord('i'):
+            self.toggle_preview()
+        elif key == ord('u'):
+            self.start_du(refresh=self.du_listing is self.listing)
+        elif key == ord('p'):
+            self.toggle_pause_jobs()
+        elif key == ord('k'):
+            self.cancel_jobs()
+        elif key == curses.KEY_F12:
+            self.show_render_stats = not self.show_render_stats
+        elif key == curses.KEY_F9:
+            self.toggle_profile()
 
         elif key == curses.KEY_NPAGE or key == curses.KEY_CTAB:  # Page Down/Ctrl+I
             self._next_tab()
@@ -379,10 +4085,294 @@ class FileManager:
                 self.navigate_history_forward()
 
     def cycle_sort_mode(self):
-        modes = ['name', 'size', 'modified']
+        modes = DirListing.SORT_MODES
         current_index = modes.index(self.sort_mode)
         self.sort_mode = modes[(current_index + 1) % len(modes)]
-        self.refresh_files()
+        self.resort()
+
+    def toggle_sort_order(self):
+        self.sort_reverse = not self.sort_reverse
+        self.resort()
+
+    def sort_descending(self):
+        """Modified sorts newest first by default; F7 flips any mode"""
+        return self.sort_reverse != (self.sort_mode == 'modified')
+
+    def start_du(self, refresh=False):
+        """Compute recursive sizes of the current directory's subdirectories in the background
+
+        Totals already known from earlier scans are filled in at once; each
+        subdirectory's fresh total replaces its row as soon as it is done.
+        """
+        listing = self.listing
+        if listing is None or not listing.complete:
+            return
+        if self.du_cancel:
+            self.du_cancel.set()
+        cancel = self.du_cancel = threading.Event()
+        self.du_listing = listing
+        children = [i for i in range(listing.count) if listing.is_dir[i] and i not in listing.deleted]
+        for i in children:
+            total = self.du.total(os.path.join(listing.path, listing.names[i]))
+            if total is not None:
+                listing.set_dir_size(i, total[0])
+        self.du_progress = (0, len(children))
+
+        def run():
+            seen = set()
+            for done, i in enumerate(children, 1):
+                total = self.du.scan(os.path.join(listing.path, listing.names[i]), cancel, seen, refresh)
+                if cancel.is_set():
+                    return
+                if total is not None:
+                    listing.set_dir_size(i, total[0])
+                self.du_progress = (done, len(children))
+            if self.du_cancel is cancel:
+                self.du_cancel = None
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def du_active(self):
+        return self.du_cancel is not None and not self.du_cancel.is_set()
+
+    def open_usage_view(self, du=None, root=None):
+        """Show the size breakdown of the current directory (or of an imported scan)
+
+        The tree is scanned once in the background through the shared
+        DiskUsage cache; browsing afterwards only reads its totals.
+        """
+        if self.usage:
+            self.usage.cancel.set()
+        self.usage = UsageView(du or self.du, root or self.current_path)
+        self.usage_drawn = None
+        if du is None:
+            self.usage.start_scan()
+        self.mark_dirty()
+
+    def close_usage_view(self):
+        self.usage.cancel.set()
+        self.usage = None
+        self.mark_dirty()
+
+    def usage_stale(self):
+        """True while the breakdown on screen lags its scan"""
+        view = self.usage
+        return view is not None and (view.scanning or self.usage_drawn != (view.du.version, view.path))
+
+    def handle_usage_input(self, key):
+        view = self.usage
+        height, width = self.stdscr.getmaxyx()
+        if key == curses.KEY_UP:
+            view.move(-1)
+        elif key == curses.KEY_DOWN:
+            view.move(1)
+        elif key == curses.KEY_PPAGE:
+            view.move(-(height - 5))
+        elif key == curses.KEY_NPAGE:
+            view.move(height - 5)
+        elif key == curses.KEY_RIGHT:
+            view.enter()
+        elif key == 10:  # ENTER
+            if not view.enter():
+                path = view.path
+                self.close_usage_view()
+                if os.path.isdir(path):
+                    self.navigate_to(path)
+        elif key in (curses.KEY_LEFT, curses.KEY_BACKSPACE, 127):
+            view.leave()
+        elif key == ord('u'):
+            if view.du is self.du and not view.scanning:
+                view.start_scan(refresh=True)
+        elif key == ord('e'):
+            self.export_usage()
+        elif key == ord('i'):
+            self.import_usage()
+        elif key in (27, ord('b'), ord('q')):
+            self.close_usage_view()
+
+    def export_usage(self):
+        view = self.usage
+        if view.scanning:
+            self.show_message("Scan still running", 2)
+            return
+        name = f"pyfiler-du-{os.path.basename(view.root.rstrip(os.sep)) or 'root'}.jsonl.gz"
+        default = os.path.join(os.path.expanduser('~'), name)
+        filename = self.get_input(f"Export scan to [{default}]: ") or default
+        try:
+            view.du.export(view.root, os.path.expanduser(filename))
+            self.show_message(f"Exported {view.root} to {filename}")
+        except Exception as e:
+            self.show_message(f"Error: {str(e)}", 2)
+
+    def import_usage(self):
+        filename = self.get_input("Import scan from: ")
+        if not filename:
+            return
+        try:
+            du, root = DiskUsage.load(os.path.expanduser(filename))
+        except Exception as e:
+            self.show_message(f"Error: {str(e)}", 2)
+            return
+        self.open_usage_view(du, root)
+        self.show_message(f"Loaded scan of {root}")
+
+    def find_duplicates(self):
+        """Look for identical files below the current directory and list them as they are found"""
+        self.dupes = DuplicateView(DuplicateFinder(workers=self.search_workers), self.current_path)
+        self.dupes_drawn = None
+        self.dupes.start()
+        self.mark_dirty()
+
+    def close_dupes(self):
+        self.dupes.cancel.set()
+        self.dupes = None
+        self.mark_dirty()
+
+    def dupes_stale(self):
+        view = self.dupes
+        return view is not None and (view.active() or self.dupes_drawn != view.state())
+
+    def handle_dupes_input(self, key):
+        view = self.dupes
+        height, width = self.stdscr.getmaxyx()
+        if key == curses.KEY_UP:
+            view.move(-1)
+        elif key == curses.KEY_DOWN:
+            view.move(1)
+        elif key == curses.KEY_PPAGE:
+            view.move(-(height - 5))
+        elif key == curses.KEY_NPAGE:
+            view.move(height - 5)
+        elif key == ord(' '):
+            view.toggle()
+        elif key == ord('a'):
+            view.mark_extras()
+        elif key == ord('n'):
+            view.marked.clear()
+        elif key == ord('d'):
+            self.delete_duplicates()
+        elif key == 10:  # ENTER
+            row = view.current()
+            if row is not None:
+                path = os.path.dirname(row[2] or row[1][0])
+                self.close_dupes()
+                self.navigate_to(path)
+        elif key in (27, ord('q')):
+            self.close_dupes()
+
+    def delete_duplicates(self):
+        """Delete the marked copies, refusing to remove every copy of a group"""
+        view = self.dupes
+        targets = sorted(view.marked - view.gone)
+        if not targets:
+            self.show_message("No files marked", 2)
+            return
+        if view.fully_marked():
+            self.show_message("Every copy of a group is marked; unmark one to keep it", 3)
+            return
+        if self.delete_files(targets):
+            view.gone.update(targets)
+            view.marked.difference_update(targets)
+
+    def draw_dupes_header(self):
+        height, width = self.stdscr.getmaxyx()
+        view = self.dupes
+        finder = view.finder
+        groups, reclaimable = view.totals()
+        header = f" ⧉ {view.base}  [{groups} groups, {format_size(reclaimable)} reclaimable]"
+        if not view.active():
+            status = f"Done, {len(view.marked)} marked"
+        elif finder.stage == 'walking':
+            status = f"Listing {finder.files} files"
+        else:
+            status = f"Hashing {finder.stage} {finder.done}/{finder.total}"
+        header = header[:width - len(status) - 6]
+        self.paint(1, [(2, header.ljust(width - 4), curses.color_pair(1) | curses.A_BOLD),
+                       (width - len(status) - 2, status, curses.color_pair(3))])
+
+    def draw_dupes(self):
+        """Draw duplicate groups and their files, marked copies flagged"""
+        height, width = self.stdscr.getmaxyx()
+        view = self.dupes
+        rows = view.rows()
+        view.selected = min(view.selected, max(0, len(rows) - 1))
+        max_items = height - 5
+        start_idx = max(0, view.selected - max_items + 1)
+        message_row = height - 3 if self.message_visible else None
+        for i in range(max_items):
+            y = 3 + i
+            if y == message_row:
+                continue
+            curr_idx = start_idx + i
+            if not rows and i == 0:
+                if view.active():
+                    text = "  Searching..."
+                else:
+                    text = "  No duplicates left" if view.gone else "  No duplicates found"
+                self.paint(y, [(2, text.ljust(width - 4), curses.color_pair(3))])
+                continue
+            if curr_idx >= len(rows):
+                self.paint(y, [(2, ' ' * (width - 4), curses.A_NORMAL)])
+                continue
+            row = rows[curr_idx]
+            if curr_idx == view.selected:
+                attr = curses.color_pair(6)
+            elif row[2] is None:
+                attr = curses.color_pair(3) | curses.A_BOLD
+            else:
+                attr = curses.color_pair(8) if row[2] in view.marked else curses.A_NORMAL
+            self.paint(y, [(2, view.line(row, width - 6).ljust(width - 4), attr)])
+        self.dupes_drawn = view.state()
+
+    def draw_usage_header(self):
+        height, width = self.stdscr.getmaxyx()
+        view = self.usage
+        total = view.total()
+        header = f" 📊 {view.path} "
+        if total:
+            header += f" [{format_size(total[0])}, {total[1]} files, {total[2] - 1} dirs]"
+        status = f"Scanning {view.du.scanned} dirs" if view.scanning else "Usage"
+        header = header[:width - len(status) - 6]
+        self.paint(1, [(2, header.ljust(width - 4), curses.color_pair(1) | curses.A_BOLD),
+                       (width - len(status) - 2, status, curses.color_pair(3))])
+
+    def draw_usage(self):
+        """Draw the breakdown rows from DiskUsage totals only (no filesystem calls)"""
+        height, width = self.stdscr.getmaxyx()
+        view = self.usage
+        rows = view.rows()
+        view.selected = min(view.selected, max(0, len(rows) - 1))
+        max_items = height - 5
+        start_idx = max(0, view.selected - max_items + 1)
+        message_row = height - 3 if self.message_visible else None
+        if not rows:
+            placeholder = "Scanning..." if view.scanning else "Nothing scanned here"
+        for i in range(max_items):
+            y = 3 + i
+            if y == message_row:
+                continue
+            curr_idx = start_idx + i
+            if not rows and i == 0:
+                self.paint(y, [(2, f"  {placeholder}".ljust(width - 4), curses.color_pair(3))])
+                continue
+            if curr_idx >= len(rows):
+                self.paint(y, [(2, ' ' * (width - 4), curses.A_NORMAL)])
+                continue
+            row = rows[curr_idx]
+            if curr_idx == view.selected:
+                attr = curses.color_pair(6)
+            else:
+                attr = curses.color_pair(1 if row[0] is not None else 3)
+            self.paint(y, [(2, view.line(row, width - 6).ljust(width - 4), attr)])
+        self.usage_drawn = (view.du.version, view.path)
+
+    def resort(self):
+        """Re-order the current listing without rescanning it"""
+        if self.listing is None:
+            self.refresh_files()
+            return
+        self.view_sorted = False
+        self.update_listing()
 
     def draw_tab_bar(self):
         height, width = self.stdscr.getmaxyx()
@@ -392,7 +4382,10 @@ class FileManager:
             path = os.path.basename(tab['path']) or tab['path']
             tab_str = f"{prefix} Tab {i+1}: {path} {prefix}"
             tab_bar += tab_str[:width//4] + "|"
-        self.stdscr.addstr(0, 2, tab_bar[:width-4], curses.color_pair(3))
+        segments = ((2, tab_bar[:width-4], curses.color_pair(3)),)
+        if self.screen_rows.get(0) != segments:
+            self.stdscr.hline(0, 1, curses.ACS_HLINE, width - 2)  # a longer tab bar may be on screen
+        self.paint(0, segments)
 
     def _next_tab(self):
         # Save current state before switching
@@ -410,6 +4403,7 @@ class FileManager:
                 'history': [],
                 'history_index': -1,
                 'sort_mode': self.sort_mode,
+                'sort_reverse': self.sort_reverse,
                 'show_hidden': self.show_hidden
             }
             self.tabs.append(new_tab)
@@ -431,6 +4425,7 @@ class FileManager:
             'history': self.history.copy(),
             'history_index': self.history_index,
             'sort_mode': self.sort_mode,
+            'sort_reverse': self.sort_reverse,
             'show_hidden': self.show_hidden
         })
 
@@ -443,6 +4438,7 @@ class FileManager:
         self.history = tab.get('history', [])
         self.history_index = tab.get('history_index', -1)
         self.sort_mode = tab.get('sort_mode', 'name')
+        self.sort_reverse = tab.get('sort_reverse', False)
         self.show_hidden = tab.get('show_hidden', False)
         self.refresh_files()
 
@@ -475,17 +4471,23 @@ class FileManager:
                 self.selected_files.add(filename)
             self.selected_idx = min(self.selected_idx + 1, len(files) - 1)
 
+    def search_result_path(self, result):
+        """Absolute path of a search result (grep hits carry a :line: suffix)"""
+        if self.search_grep:
+            result = ContentSearch.hit_path(result)
+        return os.path.join(self.search_base_path, result)
+
     def get_selected_files(self):
         if self.search_mode:
             selected = []
             files_list = self.filtered_files
             if self.selected_files:
                 for filename in self.selected_files:
-                    selected.append(os.path.join(self.search_base_path, filename))
+                    selected.append(self.search_result_path(filename))
             else:
                 filename = files_list[self.selected_idx]
-                selected.append(os.path.join(self.search_base_path, filename))
-            return selected
+                selected.append(self.search_result_path(filename))
+            return list(dict.fromkeys(selected))
         else:
             selected = []
             files_list = self.files
@@ -510,180 +4512,317 @@ class FileManager:
         self.selected_files.clear()
 
     def paste_files(self):
+        """Queue the clipboard as a background job; conflicts are settled up front"""
         if not self.clipboard['files']:
             return
 
-        total_files = len(self.clipboard['files'])
-        start_time = time.time()
-        success_count = 0
+        sources = list(self.clipboard['files'])
+        listing = self.listing
+        if listing is not None and listing.path == self.current_path and listing.complete:
+            # The watched listing is current, so no per-item exists() calls are needed
+            conflicts = [src for src in sources if listing.index_of(os.path.basename(src)) is not None]
+        else:
+            conflicts = [src for src in sources
+                         if os.path.lexists(os.path.join(self.current_path, os.path.basename(src)))]
+        overwrite = ()
         skipped_count = 0
-        
-        for i, src_path in enumerate(self.clipboard['files']):
-            # Update progress every 100ms or for every file
-            if time.time() - start_time > 0.1 or i == total_files - 1:
-                self.draw_progress(i+1, total_files, 
-                                f"Pasting ({'Copying' if self.clipboard['operation'] == 'copy' else 'Moving'})")
-                start_time = time.time()
-            
-            try:
-                dest_path = os.path.join(self.current_path, os.path.basename(src_path))
-                
-                if os.path.exists(dest_path):
-                    if not self.confirm_action(f"Overwrite {os.path.basename(src_path)}?"):
-                        skipped_count += 1
-                        continue
+        if conflicts:
+            names = ", ".join(os.path.basename(src) for src in conflicts[:3])
+            if len(conflicts) > 3:
+                names += f" and {len(conflicts) - 3} more"
+            choice = self.ask(f"{names} already exist: [o]verwrite all, [s]kip them, [c]ancel? ", 'osc')
+            if choice == 'c':
+                return
+            if choice == 's':
+                sources = [src for src in sources if src not in conflicts]
+                skipped_count = len(conflicts)
+            else:
+                overwrite = conflicts
 
-                if self.clipboard['operation'] == 'copy':
-                    if os.path.isdir(src_path):
-                        shutil.copytree(src_path, dest_path, dirs_exist_ok=True)
-                    else:
-                        shutil.copy2(src_path, dest_path)
-                else:
-                    shutil.move(src_path, dest_path)
-                    
-                success_count += 1
-            except Exception as e:
-                self.show_message(f"Error: {str(e)}", 2)
-        
-        # Clear progress bar and show result
-        self.stdscr.move(self.stdscr.getmaxyx()[0]-4, 2)
-        self.stdscr.clrtoeol()
-        
-        result_msg = f"Pasted {success_count} items"
-        if skipped_count > 0:
-            result_msg += f", skipped {skipped_count}"
-        self.show_message(result_msg, 3)
+        if sources:
+            job = CopyJob(self.clipboard['operation'], sources, self.current_path, overwrite,
+                          skipped_count)
+            self.jobs.submit(job)
+            self.show_message(f"{job.label} {len(sources)} items in the background", 2)
+        else:
+            self.show_message(f"Pasted 0 items, skipped {skipped_count}", 3)
 
         if self.clipboard['operation'] == 'cut':
             self.clipboard['files'] = []
             self.clipboard['operation'] = None
 
-        self.refresh_files()
-
-
-
-
-
-
-
-
-
-
-
-
+    def finish_jobs(self):
+        """Report jobs that completed since the last tick"""
+        for job in self.jobs.pop_finished():
+            result_msg = job.summary()
+            if result_msg:
+                self.show_message(result_msg, 5 if job.errors else 3)
+            # Update the cached listings directly instead of rescanning them
+            self.apply_deltas(job.deltas())
 
+    def toggle_pause_jobs(self):
+        job = self.jobs.active
+        if job is None:
+            return
+        if job.paused():
+            job.resume()
+        else:
+            job.pause()
+        self.mark_dirty('footer')
 
+    def cancel_jobs(self):
+        jobs = self.jobs.jobs()
+        if jobs and self.confirm_action(f"Cancel {len(jobs)} paste job(s)?"):
+            for job in jobs:
+                job.cancel()
 
+    def quit(self):
+        """Exit once no job is left half done; asks whether to wait for or cancel them
 
+        Quiet trash purges are simply cancelled: the next start resumes them.
+        """
+        jobs = self.jobs.jobs()
+        running = [job for job in jobs if not getattr(job, 'quiet', False)]
+        if running:
+            choice = self.ask(f"{len(running)} job(s) still running: [W]ait, [C]ancel them, "
+                              f"or [N]ot quit? ", 'wcn')
+            if choice == 'n':
+                return
+            for job in running:
+                if choice == 'c':
+                    job.cancel()
+                else:
+                    job.resume()
+        for job in jobs:
+            if getattr(job, 'quiet', False):
+                job.cancel()
+        if jobs:
+            self.show_message("Waiting for jobs to finish...", 60)
+            while not self.jobs.wait(0.25):
+                self.mark_dirty('list', 'footer')
+                self.render()
+        sys.exit()
 
+    def job_status(self):
+        """Footer text for the running background job"""
+        job = self.jobs.active
+        if job is None:
+            return None
+        queued = len(self.jobs.pending)
+        text = job.status()
+        if job.paused():
+            text += " PAUSED"
+        if queued:
+            text += f" (+{queued} queued)"
+        return text + "  [P]Pause/Resume [K]Cancel"
 
+    def start_find(self):
+        """Prompt for a query and search with it pushed down into the walker"""
+        text = self.get_input("Find: ")
+        if not text:
+            return
+        try:
+            predicate = SearchQuery(text)
+        except QueryError as e:
+            self.show_message(f"Bad query: {str(e)}", 3)
+            return
+        self.start_search(predicate)
 
+    def start_grep(self):
+        """Prompt for a pattern and search file contents below the current directory"""
+        pattern = self.get_input("Grep: ")
+        if not pattern:
+            return
+        try:
+            grep = ContentSearch(pattern, workers=self.search_workers)
+        except re.error as e:
+            self.show_message(f"Bad pattern: {str(e)}", 3)
+            return
+        self.start_search(self.search_predicate if self.search_mode else None, grep)
 
-    def start_search(self):
+    def start_search(self, predicate=None, grep=None):
+        self.search_predicate = predicate
+        self.search_grep = grep
+        if self.search_cancel:
+            self.search_cancel.set()
         self.search_mode = True
         self.search_query = ""
-        self.search_results = []
+        self.search_filter = IncrementalFilter()
+        self.search_results = self.search_filter.items
+        self.filtered_files = self.search_filter.view("")
+        self.set_fuzzy_mode(self.fuzzy_mode)
+        self.search_stale = None
+        self.search_meta = {}
+        self.search_meta_wanted = []
+        self.search_meta_pending = set()
         self.search_base_path = self.current_path
         self.selected_idx = 0
-        self.search_thread = threading.Thread(target=self.perform_search_action)
+        self.search_queue = WakingDeque(self.post)
+        self.search_cancel = threading.Event()
+        self.search_active = True
+        self.search_started = time.time()
+        self.search_thread = threading.Thread(
+            target=self.perform_search_action,
+            args=(self.search_queue, self.search_cancel), daemon=True)
         self.search_thread.start()
 
     def cancel_search(self):
+        if self.search_cancel:
+            self.search_cancel.set()
+        self.search_active = False
         self.search_mode = False
         self.search_query = ""
-        self.search_results = []
+        self.search_filter = IncrementalFilter()
+        self.search_results = self.search_filter.items
+        if self.fuzzy:
+            self.fuzzy.close()
+            self.fuzzy = None
         self.selected_idx = 0
         self.refresh_files()
 
     def _process_search_results(self):
-        processed = 0
-        while self.search_queue and processed < self.batch_size:
-            try:
-                item = self.search_queue.popleft()
-                self.search_results.append(item)
-                processed += 1
-            except IndexError:
-                break
+        finished = not self.search_thread.is_alive()
+        self.run_posted()  # a finished search thread has posted everything by now
+        pending = len(self.search_queue)
+        if pending:
+            popleft = self.search_queue.popleft
+            start = len(self.search_results)
+            self.search_filter.extend([popleft() for _ in range(pending)])
+            if self.fuzzy:
+                self.fuzzy.extend(start)
 
-        if processed > 0:
+        if finished and not self.search_queue:
+            if self.search_stale:
+                gone = self.search_stale
+                def is_gone(rel_path):
+                    parts = rel_path.split(os.sep)
+                    return any(os.sep.join(parts[:i]) in gone for i in range(1, len(parts) + 1))
+                self.search_filter.remove(is_gone)
+                self.search_stale = None
+                self.set_fuzzy_mode(self.fuzzy_mode)
+            self.search_active = False
             self.apply_search_filter()
-
-        if self.search_thread and not self.search_thread.is_alive():
+            elapsed = max(time.time() - self.search_started, 1e-6)
+            if self.search_grep:
+                grep = self.search_grep
+                self.show_message(f"Grep complete: {len(self.search_results)} hits in "
+                                  f"{grep.files_scanned} files, {format_size(grep.bytes_scanned)} "
+                                  f"({format_size(grep.bytes_scanned / elapsed)}/s)")
+            else:
+                self.show_message(f"Search complete: {len(self.search_results)} entries "
+                                  f"({len(self.search_results) / elapsed:.0f}/s)")
+        elif pending:
             self.apply_search_filter()
-            self.show_message("Search complete")
+
+    def set_fuzzy_mode(self, enabled):
+        """Switch between substring and ranked fuzzy matching"""
+        if self.fuzzy:
+            self.fuzzy.close()
+            self.fuzzy = None
+        self.fuzzy_mode = enabled
+        if enabled:
+            self.fuzzy = FuzzyMatcher(self.search_filter)
+            self.fuzzy_window = max(self.stdscr.getmaxyx()[0] - 5, 1) * 2
+        self.apply_search_filter()
 
     def handle_search_input(self, key):
         if key == 27:  # ESC
             self.cancel_search()
+        elif key == 9:  # TAB
+            self.set_fuzzy_mode(not self.fuzzy_mode)
+            self.selected_idx = 0
+        elif key == 7:  # Ctrl+G: grep the files matched by the current find query
+            self.start_grep()
         elif key in (curses.KEY_BACKSPACE, 127):
             self.search_query = self.search_query[:-1]
             self.apply_search_filter()
         elif key == curses.KEY_UP:
             self.selected_idx = max(0, self.selected_idx - 1)
         elif key == curses.KEY_DOWN:
+            if self.fuzzy_mode and self.selected_idx + 1 >= len(self.filtered_files) == self.fuzzy_window:
+                # Ranked results only cover the visible window; rank further
+                self.fuzzy_window *= 2
+                self.apply_search_filter()
             self.selected_idx = min(len(self.filtered_files) - 1, self.selected_idx + 1)
         elif key == 10:  # ENTER
             self.navigate_into_search_result()
         elif 32 <= key <= 126:
             self.search_query += chr(key)
             self.apply_search_filter()
-        elif 32 <= key <= 126:
-            self.search_query += chr(key)
-            self.debounced_filter()
         
         self.selected_idx = max(0, min(self.selected_idx, len(self.filtered_files)-1))
 
-    def debounced_filter(self):
-        """Apply filter after 300ms pause in typing"""
-        # Cancel any existing timer
-        if self.search_timer:
-            self.search_timer.cancel()
+    def perform_search_action(self, results, cancel):
+        """Search served from the persistent index, then refreshed incrementally
 
-        now = time.time()
-        
-        # Apply immediately if no recent activity
-        if now - self.last_key_time > 0.3:
-            self.apply_search_filter()
+        Runs on the search thread and only ever appends to the results
+        deque; the UI thread drains it in _process_search_results. Anything
+        else goes through post().
+        """
+        base_path = os.path.abspath(self.search_base_path)
+        prefix_len = len(path_range(base_path)[0])
+        query = self.search_predicate
 
-        # Schedule new delayed filter
-        self.search_timer = threading.Timer(0.3, self.apply_search_filter)
-        self.search_timer.start()
-        self.last_key_time = now
+        if self.search_grep:
+            self.search_grep.run(base_path, results, cancel, query)
+            return
 
-    def perform_search_action(self):
-        """Optimized search with batched results"""
-        self.search_results = []
-        base_path = os.path.abspath(self.search_base_path)
-        batch = []
-        
-        for root, dirs, files in os.walk(base_path):
-            for entry in list(dirs) + files:
-                rel_path = os.path.relpath(os.path.join(root, entry), base_path)
-                batch.append(rel_path)
-                
-                if len(batch) >= self.batch_size:
-                    with self.search_lock:
-                        self.search_results.extend(batch)
-                    batch = []
-                    self.apply_search_filter()
-                    time.sleep(0.01)  # Yield to main thread
-            
-            # Cancel search if mode changed
-            if not self.search_mode:
-                break
-        
-        # Process remaining items
-        if batch:
-            with self.search_lock:
-                self.search_results.extend(batch)
-        self.apply_search_filter()
+        # The index only records size/mtime as of the last directory change,
+        # so queries on stat data always walk the live tree
+        if query and query.needs_stat:
+            self.walk_search(base_path, results, cancel)
+            return
+
+        try:
+            index = FileIndex()
+        except (OSError, sqlite3.Error):
+            self.walk_search(base_path, results, cancel)
+            return
+
+        def emit(rows):
+            if query:
+                results.extend(rel for rel, is_dir in ((row[0][prefix_len:], row[1]) for row in rows)
+                               if query.matches_path(rel, is_dir))
+            else:
+                results.extend(row[0][prefix_len:] for row in rows)
+
+        try:
+            # Serve whatever the index already knows about immediately
+            for rows in index.iter_entries(base_path):
+                if cancel.is_set():
+                    return
+                emit(rows)
+
+            removed = []
+            descend = None
+            if query:
+                # Excluded subtrees and the depth limit prune the refresh walk too
+                descend = lambda path: query.descend(path[prefix_len:], os.path.basename(path))
+            index.refresh(base_path, on_added=emit, on_removed=removed.extend,
+                          cancel=cancel, workers=self.search_workers, descend=descend)
+            if removed:
+                stale = {path[prefix_len:] for path in removed}
+                self.post(lambda: self._set_search_stale(cancel, stale))
+        except sqlite3.Error as e:
+            message = f"Index error: {str(e)}"  # e is unbound once the except block ends
+            self.post(lambda: cancel.is_set() or self.show_message(message, 2))
+            self.walk_search(base_path, results, cancel)
+        finally:
+            index.close()
+
+    def _set_search_stale(self, cancel, stale):
+        if cancel is self.search_cancel:  # not a search that was replaced meanwhile
+            self.search_stale = stale
+
+    def walk_search(self, base_path, results, cancel):
+        walk_search(base_path, results, cancel, self.search_predicate, self.search_workers)
 
     def navigate_into_search_result(self):
         if not self.filtered_files:
             return
         
         selected = self.filtered_files[self.selected_idx]
-        full_path = os.path.join(self.search_base_path, selected)
+        full_path = self.search_result_path(selected)
         
         if os.path.isdir(full_path):
             self.current_path = full_path
@@ -702,38 +4841,95 @@ class FileManager:
         self.cancel_search()
 
 
-    def delete_files(self):
-        targets = self.get_selected_files()
+    def delete_files(self, targets=None):
+        """Delete in the background; with the trash enabled, move targets aside first
+
+        Renaming into a trash directory on the same filesystem is instant, so
+        the entries disappear at once and the purge runs as a quiet job.
+        Targets that can't be renamed are deleted in place by a regular job.
+        """
+        if targets is None:
+            targets = self.get_selected_files()
         if not self.confirm_action(f"Delete {len(targets)} items?"):
-            return
-        
-        for path in targets:
-            try:
-                if os.path.isdir(path):
-                    shutil.rmtree(path)
-                else:
-                    os.remove(path)
-                self.show_message(f"Deleted {len(targets)} items")
-            except Exception as e:
-                self.show_message(f"Error: {str(e)}", 2)
+            return False
+
+        remaining = targets
+        if USE_TRASH:
+            remaining = []
+            trashed = {}
+            stamp = time.time_ns()
+            for i, path in enumerate(targets):
+                trash = trash_dir_for(path)
+                try:
+                    if trash is None:
+                        raise OSError(errno.EXDEV, "no trash on this filesystem")
+                    dst = os.path.join(trash, f"{stamp}-{i}-{os.path.basename(path)}")
+                    rename_noreplace(path, dst)
+                    trashed.setdefault(trash, []).append(dst)
+                except OSError:
+                    remaining.append(path)
+            moved = [path for path in targets if path not in remaining]
+            for trash, paths in trashed.items():
+                self.jobs.submit(DeleteJob(paths, quiet=True, purge_parent=trash))
+            self.apply_deltas([(os.path.dirname(path), 'remove', os.path.basename(path))
+                               for path in moved])
+            if moved:
+                self.show_message(f"Deleted {len(moved)} items")
+        if remaining:
+            self.jobs.submit(DeleteJob(remaining))
         self.selected_files.clear()
-        self.refresh_files()
+        return True
+
+    def purge_trash(self):
+        """Finish purging whatever an earlier session left in the trash
+
+        Covers the cache trash and every per-filesystem trash directory
+        recorded in the registry; directories that are gone are dropped from it.
+        """
+        cache_trash = os.path.join(get_cache_dir(), 'trash')
+        kept = []
+        for trash in [cache_trash] + trash_dirs():
+            try:
+                leftovers = [entry.path for entry in os.scandir(trash)]
+            except FileNotFoundError:
+                continue
+            except OSError:
+                leftovers = []  # unreachable for now (unmounted?): try again next time
+            if trash != cache_trash:
+                kept.append(trash)
+            if leftovers:
+                self.jobs.submit(DeleteJob(leftovers, quiet=True, purge_parent=trash))
+            elif trash != cache_trash:
+                try:
+                    os.rmdir(trash)
+                except OSError:
+                    pass
+        try:
+            with open(trash_registry(), 'w', encoding='utf-8', errors='surrogateescape') as f:
+                f.writelines(trash + '\n' for trash in kept if os.path.isdir(trash))
+        except OSError:
+            pass
 
     def confirm_action(self, prompt):
+        return self.ask(f"{prompt} (y/n) ", 'yn') == 'y'
+
+    def ask(self, prompt, choices):
+        """Prompt until one of the single-letter choices is pressed and return it"""
         height, width = self.stdscr.getmaxyx()
         # Clear any existing messages
         self.stdscr.move(height - 3, 2)
         self.stdscr.clrtoeol()
         
         # Draw confirmation prompt
-        self.stdscr.addstr(height - 4, 2, f"{prompt} (y/n) ", curses.color_pair(4))
+        self.stdscr.addstr(height - 4, 2, prompt[:width - 4], curses.color_pair(4))
         self.stdscr.refresh()
         
         # Switch to blocking input with no timeout
         curses.cbreak()  # Disable line buffering
         self.stdscr.nodelay(False)  # Blocking input
+        keys = {ord(c): c for c in choices + choices.upper()}
         response = -1
-        while response not in [ord('y'), ord('Y'), ord('n'), ord('N')]:
+        while response not in keys:
             response = self.stdscr.getch()
         
         # Restore input settings
@@ -745,8 +4941,9 @@ class FileManager:
         self.stdscr.move(height - 4, 2)
         self.stdscr.clrtoeol()
         self.stdscr.refresh()
+        self.mark_dirty()
         
-        return response in [ord('y'), ord('Y')]
+        return keys[response].lower()
 
     def navigate_up(self):
         new_path = os.path.dirname(self.current_path)
@@ -793,27 +4990,393 @@ class FileManager:
         self.history.append(path)
         self.history_index = len(self.history) - 1
 
-    def run(self):
-        self.refresh_files()
+    def post(self, callback=None):
+        """Wake the main loop, and have it run callback; safe to call from any thread
+
+        Wakeups are coalesced: a worker streaming results schedules at most
+        one call on the loop until the loop has run it.
+        """
+        if callback is not None:
+            self.posted.put(callback)
+        loop = self.loop
+        if loop is None or self.wake_pending:
+            return
+        self.wake_pending = True
+        try:
+            loop.call_soon_threadsafe(self._woken)
+        except RuntimeError:  # the loop has closed
+            pass
+
+    def run_posted(self):
+        """Run the callbacks workers handed over with post()"""
         while True:
-            if self.search_mode and self.search_thread and self.search_thread.is_alive():
-                self._process_search_results()
+            try:
+                callback = self.posted.get_nowait()
+            except queue.Empty:
+                return
+            callback()
 
-            self.stdscr.clear()
-            self.draw_borders()
-            self.draw_header()
-            self.draw_list()
-            self.draw_footer()
-            
-            self.stdscr.timeout(100)
+    def _woken(self):
+        self.wake_pending = False
+        self.wakeup.set()
+
+    def _input_ready(self):
+        self.keys_ready.set()
+        self.wakeup.set()
+
+    def _resized(self):
+        try:
+            columns, lines = os.get_terminal_size(sys.__stdout__.fileno())
+            curses.resizeterm(lines, columns)
+        except (OSError, curses.error):
+            pass
+        self.mark_dirty()
+        self.wakeup.set()
+
+    def read_keys(self):
+        """Handle every key already typed; returns how many there were"""
+        count = 0
+        while True:
+            self.stdscr.timeout(0)  # prompts switch to blocking input and leave it so
             key = self.stdscr.getch()
-            if key != -1:
-                self.handle_input(key)  
+            if key == -1:
+                return count
+            count += 1
+            if key == curses.KEY_RESIZE:
+                self.mark_dirty()
+            else:
+                self.handle_input(key)
+                self.mark_dirty('header', 'list', 'footer')
+
+    @staticmethod
+    async def _wait(event, timeout):
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run_loop(self):
+        """Main loop: sleeps until a key, a watcher event or a worker wakes it
+
+        Keys are read when stdin is readable and drawn at once. Everything
+        else is drawn at most once per FRAME_INTERVAL. All UI state is only
+        touched on this thread; workers hand over results in thread-safe
+        queues and call post().
+        """
+        loop = self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.keys_ready = asyncio.Event()
+        readers = []
+        poll_input = False
+        try:
+            loop.add_reader(sys.stdin.fileno(), self._input_ready)
+            readers.append(sys.stdin.fileno())
+        except (NotImplementedError, ValueError, OSError):
+            poll_input = True  # no select() on the console (Windows): check for keys every frame
+        if self.watcher.fileno() is not None:
+            loop.add_reader(self.watcher.fileno(), self.wakeup.set)
+            readers.append(self.watcher.fileno())
+        if hasattr(signal, 'SIGWINCH'):
+            loop.add_signal_handler(signal.SIGWINCH, self._resized)
+        try:
+            self.refresh_files()
+            self.mark_dirty()
+            while True:
+                self.wakeup.clear()
+                self.keys_ready.clear()
+                keys = self.read_keys()
+                if self.search_mode and self.search_active:
+                    self._process_search_results()
+                    self.mark_dirty('header', 'list')
+                if self.search_mode and self.fuzzy and self.fuzzy.pending:
+                    self.filtered_files = self.fuzzy.advance()
+                    self.mark_dirty('list')
+                self.tick()
+
+                timeout = self.next_timeout()
+                timeout = timeout / 1000 if timeout is not None else None
+                if poll_input:
+                    timeout = min(timeout or self.FRAME_INTERVAL, self.FRAME_INTERVAL)
+                if self.dirty:
+                    due = self.frame_time + self.FRAME_INTERVAL - time.perf_counter()
+                    if keys or due <= 0:
+                        self.render()
+                        self.frame_time = time.perf_counter()
+                    else:
+                        await self._wait(self.keys_ready, due)
+                        continue
+                await self._wait(self.wakeup, timeout)
+        finally:
+            for fd in readers:
+                loop.remove_reader(fd)
+            if hasattr(signal, 'SIGWINCH'):
+                loop.remove_signal_handler(signal.SIGWINCH)
+            self.loop = None
+
+    def run(self):
+        asyncio.run(self.run_loop())
+
+# Hot paths the profiler times; wrapped only while it is enabled
+PROFILED = [(FileManager, name) for name in (
+    'refresh_files', 'update_listing', 'apply_search_filter', '_process_search_results',
+    'render', 'draw_header', 'draw_list', 'draw_footer', 'get_free_space', 'handle_input',
+    'tick', 'apply_watch_events', 'paste_files', 'delete_files')] + [
+    (ParallelWalker, 'run'), (FileIndex, 'refresh'), (ContentSearch, 'run'), (DirListing, 'scan'),
+    (DirListing, '_sort'), (CopyJob, 'run'), (DeleteJob, 'run'), (DiskUsage, 'scan'),
+    (DuplicateFinder, 'run'), (sys.modules[__name__], 'render_preview')]
+# psutil.disk_usage (get_free_space) calls os.statvfs, so it is counted as statvfs
+PROFILED_SYSCALLS = [(os, name) for name in (
+    'stat', 'lstat', 'scandir', 'listdir', 'open', 'statvfs', 'rename', 'replace', 'unlink',
+    'rmdir', 'mkdir', 'readlink', 'sendfile') if hasattr(os, name)] + [(builtins, 'open')]
+
 
 def main(stdscr):
     curses.curs_set(0)
     fm = FileManager(stdscr)
-    fm.run()
+    # PYFILER_PROFILE=session.json records a Chrome trace, any other name a cProfile dump
+    session = os.environ.get('PYFILER_PROFILE')
+    if not session:
+        fm.run()
+        return
+    profile = None
+    if session.endswith('.json'):
+        PROFILER.enable(trace=True)
+    else:
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        fm.run()
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(session)
+        else:
+            PROFILER.dump_trace(session)
+
+class JsonLines:
+    """Results sink printing one JSON object per line as the engines produce them
+
+    Engines append or extend it from their worker threads. Once limit
+    results have been written, or stdout is closed, cancel is set so the
+    engine stops early.
+    """
+
+    def __init__(self, cancel, convert=None, limit=None, out=None):
+        self.cancel = cancel
+        self.convert = convert or (lambda item: item)
+        self.limit = limit
+        self.out = out or sys.stdout
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, item):
+        self.extend((item,))
+
+    def extend(self, items):
+        with self._lock:
+            lines = []
+            for item in items:
+                if self.limit is not None and self.count >= self.limit:
+                    self.cancel.set()
+                    break
+                self.count += 1
+                lines.append(json.dumps(self.convert(item)))
+            if not lines:
+                return
+            try:
+                self.out.write('\n'.join(lines) + '\n')
+                self.out.flush()
+            except BrokenPipeError:
+                self.cancel.set()
+
+
+def _cli_search(args, cancel):
+    base = os.path.abspath(args.path)
+    if not os.path.isdir(base):
+        error = errno.ENOTDIR if os.path.exists(base) else errno.ENOENT
+        raise OSError(error, os.strerror(error), base)
+    query = SearchQuery(' '.join(args.query)) if args.query else None
+    if args.grep:
+        grep = ContentSearch(args.grep, workers=args.workers or DEFAULT_WALK_WORKERS,
+                             ignore_case=not args.case_sensitive)
+
+        def convert(hit):
+            match = ContentSearch.HIT_RE.match(hit)
+            if match is None:
+                return {'path': os.path.join(base, hit)}
+            return {'path': os.path.join(base, match.group(1)), 'line': int(match.group(2)),
+                    'text': hit[match.end():]}
+
+        grep.run(base, JsonLines(cancel, convert, args.max_results), cancel, query)
+    else:
+        walk_search(base, JsonLines(cancel, lambda rel: {'path': os.path.join(base, rel)}, args.max_results),
+                    cancel, query, args.workers or DEFAULT_WALK_WORKERS)
+    return 0
+
+
+def _cli_ls(args, cancel):
+    path = os.path.abspath(args.path)
+    listing = DirListing(path, os.stat(path).st_mtime)
+    listing.start()
+    listing.start_stat_all()
+    while not listing.stat_complete and listing.error is None:
+        time.sleep(0.005)
+    if listing.error is not None:
+        raise listing.error
+    out = JsonLines(cancel, limit=args.max_results)
+    for i in listing.sorted_order(args.sort, args.all, args.reverse):
+        if cancel.is_set():
+            break
+        meta = listing.metadata(i)
+        meta['path'] = os.path.join(path, meta['name'])
+        out.append(meta)
+    return 0
+
+
+def _cli_du(args, cancel):
+    du = DiskUsage(args.workers or DEFAULT_WALK_WORKERS)
+    out = JsonLines(cancel, limit=args.max_results)
+    status = 0
+    seen = set()
+    for root in args.paths:
+        root = os.path.abspath(root)
+        if du.scan(root, cancel, seen) is None:
+            if cancel.is_set():
+                break
+            print(json.dumps({'path': root, 'error': 'cannot scan'}), file=sys.stderr)
+            status = 1
+            continue
+        # Subdirectories down to --depth, children before their parent like du
+        order = []
+        stack = [(root, 0)]
+        while stack:
+            path, depth = stack.pop()
+            order.append(path)
+            if depth < args.depth:
+                record = du.records.get(path)
+                if record is not None:
+                    stack.extend((os.path.join(path, name), depth + 1) for name in sorted(record[3], reverse=True))
+        for path in reversed(order):
+            total = du.total(path)
+            if total is not None:
+                out.append({'path': path, 'bytes': total[0], 'files': total[1], 'dirs': total[2]})
+    return status
+
+
+def _cli_job(job, workers, cancel, progress):
+    """Run a Job in the foreground, printing progress events every second"""
+    def report():
+        while not done.wait(1.0):
+            if cancel.is_set():
+                job.cancel()
+            elif progress:
+                out.append(progress())
+
+    out = JsonLines(cancel)
+    done = threading.Event()
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            job.run(pool)
+        except KeyboardInterrupt:
+            job.cancel()
+            raise
+        finally:
+            done.set()
+    return out
+
+
+def _cli_cp(args, cancel):
+    dest = os.path.abspath(args.dest)
+    if not os.path.isdir(dest):
+        raise NotADirectoryError(errno.ENOTDIR, os.strerror(errno.ENOTDIR), dest)
+    sources = [os.path.abspath(src) for src in args.sources]
+    existing = [src for src in sources if os.path.lexists(os.path.join(dest, os.path.basename(src)))]
+    skipped = 0
+    if args.skip_existing:
+        sources = [src for src in sources if src not in existing]
+        skipped = len(existing)
+    job = CopyJob('cut' if args.move else 'copy', sources, dest,
+                  overwrite=existing if args.overwrite else (), skipped=skipped)
+
+    def progress():
+        return {'event': 'progress', 'files': job.done_files, 'total_files': job.total_files,
+                'bytes': job.done_bytes, 'total_bytes': job.total_bytes, 'rate': round(job.rate())}
+
+    out = _cli_job(job, args.workers or COPY_WORKERS, cancel, progress)
+    out.append({'event': 'done', 'items': job.done_items, 'files': job.done_files, 'bytes': job.done_bytes,
+                'skipped': job.skipped, 'seconds': round(job.elapsed(), 3), 'strategies': job.strategies,
+                'cancelled': job.cancelled(), 'errors': job.errors})
+    return 1 if job.errors or job.cancelled() else 0
+
+
+def _cli_rm(args, cancel):
+    job = DeleteJob([os.path.abspath(path) for path in args.paths])
+
+    def progress():
+        return {'event': 'progress', 'removed': job.removed, 'rate': round(job.rate())}
+
+    out = _cli_job(job, args.workers or COPY_WORKERS, cancel, progress)
+    out.append({'event': 'done', 'items': len(job.deleted), 'removed': job.removed,
+                'seconds': round(job.elapsed(), 3), 'cancelled': job.cancelled(), 'errors': job.errors})
+    return 1 if job.errors or job.cancelled() else 0
+
+
+def run_cli(argv):
+    """Headless entry point: explorer.py search|ls|du|cp|rm ..., printing newline-delimited JSON"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--workers', type=int, help="threads for walks, scans and copies")
+    common.add_argument('--max-results', type=int, help="stop after this many results")
+    parser = argparse.ArgumentParser(prog='explorer.py', description="PyFiler without the UI; "
+                                     "run without arguments for the interactive explorer")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search = commands.add_parser('search', parents=[common], help="find paths below a directory")
+    search.add_argument('path')
+    search.add_argument('query', nargs='*', help="find query, e.g. '*.log size:>1G mtime:<1d'")
+    search.add_argument('--grep', metavar='PATTERN', help="search file contents instead")
+    search.add_argument('--case-sensitive', action='store_true')
+    search.set_defaults(run=_cli_search)
+
+    ls = commands.add_parser('ls', parents=[common], help="list one directory")
+    ls.add_argument('path', nargs='?', default='.')
+    ls.add_argument('--all', '-a', action='store_true', help="include hidden entries")
+    ls.add_argument('--sort', choices=DirListing.SORT_MODES, default='name')
+    ls.add_argument('--reverse', '-r', action='store_true')
+    ls.set_defaults(run=_cli_ls)
+
+    du = commands.add_parser('du', parents=[common], help="recursive size of directories (like du -xb)")
+    du.add_argument('paths', nargs='+')
+    du.add_argument('--depth', '-d', type=int, default=0, help="also report subdirectories this deep")
+    du.set_defaults(run=_cli_du)
+
+    cp = commands.add_parser('cp', parents=[common], help="copy (or move) into a directory")
+    cp.add_argument('sources', nargs='+')
+    cp.add_argument('dest')
+    cp.add_argument('--move', action='store_true')
+    conflicts = cp.add_mutually_exclusive_group()
+    conflicts.add_argument('--overwrite', action='store_true', help="replace existing targets")
+    conflicts.add_argument('--skip-existing', action='store_true', help="leave existing targets alone")
+    cp.set_defaults(run=_cli_cp)
+
+    rm = commands.add_parser('rm', parents=[common], help="delete files and trees")
+    rm.add_argument('paths', nargs='+')
+    rm.set_defaults(run=_cli_rm)
+
+    args = parser.parse_args(argv)
+    cancel = threading.Event()
+    try:
+        return args.run(args, cancel)
+    except KeyboardInterrupt:
+        cancel.set()
+        return 130
+    except (OSError, QueryError, re.error) as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        return 1
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     curses.wrapper(main)    
\ No newline at end of file
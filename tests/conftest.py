@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Screen:
+    """Stand-in for the curses window: a fixed size, no input, other calls ignored"""
+
+    def getmaxyx(self):
+        return 40, 120
+
+    def getch(self):
+        return -1
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def drive(fm, predicate, timeout=10):
+    """Tick the FileManager as its main loop would until predicate() holds"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "FileManager did not settle"
+        fm.tick()
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def fm(tmp_path, monkeypatch):
+    """A FileManager without a terminal, started in tmp_path/home with its own cache"""
+    import curses
+    from explorer import FileManager
+
+    for name in ('start_color', 'use_default_colors', 'init_pair', 'curs_set', 'doupdate',
+                 'echo', 'noecho', 'cbreak', 'nocbreak'):
+        monkeypatch.setattr(curses, name, lambda *args: None)
+    monkeypatch.setattr(curses, 'color_pair', lambda n: n << 8)
+    for name in ('ACS_HLINE', 'ACS_VLINE', 'ACS_ULCORNER', 'ACS_URCORNER', 'ACS_LLCORNER', 'ACS_LRCORNER'):
+        monkeypatch.setattr(curses, name, ord('+'), raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    (tmp_path / 'home').mkdir()
+    monkeypatch.chdir(tmp_path / 'home')
+    manager = FileManager(Screen())
+    manager.refresh_files()
+    drive(manager, lambda: manager.view_sorted and not manager.loading)
+    yield manager
+    manager.watcher.close()
+
+
+class InlinePool:
+    """Runs submitted calls at once, in place of the job queue's worker pool"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+@pytest.fixture
+def pool():
+    return InlinePool()
@@ -0,0 +1,96 @@
+"""Tests for the headless command line, run as a subprocess like a script would"""
+import json
+import os
+import subprocess
+import sys
+
+EXPLORER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'explorer.py')
+
+
+def cli(*args, cwd):
+    env = dict(os.environ, XDG_CACHE_HOME=os.path.join(cwd, '.cache'))
+    proc = subprocess.run([sys.executable, EXPLORER, *args], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=60)
+    return proc.returncode, [json.loads(line) for line in proc.stdout.splitlines()], proc.stderr
+
+
+def test_search_prints_matching_paths(tmp_path):
+    (tmp_path / 'src' / 'pkg').mkdir(parents=True)
+    (tmp_path / 'src' / 'pkg' / 'mod.py').write_text('x = 1\n# TODO: tidy\n')
+    (tmp_path / 'src' / 'notes.txt').write_text('TODO')
+
+    rc, out, _ = cli('search', 'src', '*.py', cwd=str(tmp_path))
+    assert rc == 0
+    assert out == [{'path': str(tmp_path / 'src' / 'pkg' / 'mod.py')}]
+
+    rc, out, _ = cli('search', 'src', '*.py', '--grep', 'todo', cwd=str(tmp_path))
+    assert rc == 0
+    assert out == [{'path': str(tmp_path / 'src' / 'pkg' / 'mod.py'), 'line': 2, 'text': '# TODO: tidy'}]
+
+
+def test_search_reports_a_missing_directory(tmp_path):
+    rc, out, err = cli('search', 'missing', cwd=str(tmp_path))
+
+    assert rc == 1
+    assert out == []
+    assert 'No such file or directory' in json.loads(err)['error']
+
+
+def test_search_rejects_a_bad_query(tmp_path):
+    rc, _, err = cli('search', '.', 'size:>lots', cwd=str(tmp_path))
+
+    assert rc == 1
+    assert 'error' in json.loads(err)
+
+
+def test_ls_sorts_and_limits(tmp_path):
+    for name, size in (('small', 1), ('big', 300), ('mid', 20)):
+        (tmp_path / name).write_text('x' * size)
+    (tmp_path / '.hidden').write_text('')
+
+    rc, out, _ = cli('ls', '--sort', 'size', '-r', '--max-results', '2', cwd=str(tmp_path))
+
+    assert rc == 0
+    assert [(item['name'], item['size']) for item in out] == [('big', 300), ('mid', 20)]
+
+
+def test_du_totals_files_and_directories(tmp_path):
+    (tmp_path / 'tree' / 'sub').mkdir(parents=True)
+    (tmp_path / 'tree' / 'sub' / 'f').write_text('x' * 5000)
+
+    rc, out, _ = cli('du', 'tree', '--depth', '1', cwd=str(tmp_path))
+
+    assert rc == 0
+    assert [item['path'] for item in out] == [str(tmp_path / 'tree' / 'sub'), str(tmp_path / 'tree')]
+    assert out[-1]['files'] == 1 and out[-1]['dirs'] == 2
+    assert out[-1]['bytes'] >= 5000
+
+
+def test_cp_move_and_rm(tmp_path):
+    (tmp_path / 'a.txt').write_text('data')
+    (tmp_path / 'dest').mkdir()
+
+    rc, out, _ = cli('cp', 'a.txt', 'dest', '--move', cwd=str(tmp_path))
+    assert rc == 0
+    assert out[-1]['event'] == 'done' and out[-1]['items'] == 1 and not out[-1]['errors']
+    assert not (tmp_path / 'a.txt').exists()
+    assert (tmp_path / 'dest' / 'a.txt').read_text() == 'data'
+
+    rc, out, _ = cli('cp', 'dest/a.txt', 'dest', cwd=str(tmp_path))
+    assert rc == 1
+    assert out[-1]['errors']
+
+    rc, out, _ = cli('rm', 'dest', cwd=str(tmp_path))
+    assert rc == 0
+    assert out[-1]['event'] == 'done' and out[-1]['items'] == 1
+    assert not (tmp_path / 'dest').exists()
+
+
+def test_cp_into_a_missing_directory_fails(tmp_path):
+    (tmp_path / 'a.txt').write_text('data')
+
+    rc, out, err = cli('cp', 'a.txt', 'nowhere', cwd=str(tmp_path))
+
+    assert rc == 1
+    assert out == []
+    assert 'Not a directory' in json.loads(err)['error']
@@ -0,0 +1,115 @@
+"""Regression tests for CopyJob and copy_file"""
+import os
+import time
+
+import pytest
+
+from explorer import CopyJob, CopyCancelled, Job, copy_file
+
+
+def write(path, data):
+    with open(path, 'w') as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def paste(pool, operation, sources, dest_dir, overwrite=()):
+    job = CopyJob(operation, sources, dest_dir, overwrite=overwrite)
+    job.run(pool)
+    return job
+
+
+@pytest.mark.parametrize('operation', ['copy', 'cut'])
+def test_overwrite_through_symlinked_directory_keeps_source(pool, tmp_path, operation):
+    real = tmp_path / 'real'
+    real.mkdir()
+    write(real / 'a.txt', 'precious')
+    os.symlink(real, tmp_path / 'alias')
+    src = str(real / 'a.txt')
+
+    job = paste(pool, operation, [src], str(tmp_path / 'alias'), overwrite=[src])
+
+    assert read(src) == 'precious'
+    assert job.errors and 'same file' in job.errors[0]
+    assert job.done_items == 0
+
+
+def test_overwrite_directory_through_alias_keeps_files(pool, tmp_path):
+    real = tmp_path / 'real'
+    (real / 'sub').mkdir(parents=True)
+    write(real / 'sub' / 'b.txt', 'precious')
+    os.symlink(real, tmp_path / 'alias')
+    src = str(real / 'sub')
+
+    job = paste(pool, 'copy', [src], str(tmp_path / 'alias'), overwrite=[src])
+
+    assert read(real / 'sub' / 'b.txt') == 'precious'
+    assert job.errors
+
+
+def test_copy_file_refuses_same_file(tmp_path):
+    write(tmp_path / 'a.txt', 'precious')
+    os.link(tmp_path / 'a.txt', tmp_path / 'b.txt')
+
+    with pytest.raises(OSError):
+        copy_file(str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt'), Job())
+    assert read(tmp_path / 'a.txt') == 'precious'
+
+
+def test_overwrite_replaces_target(pool, tmp_path):
+    write(tmp_path / 'a.txt', 'new')
+    dest = tmp_path / 'dest'
+    dest.mkdir()
+    write(dest / 'a.txt', 'old')
+    src = str(tmp_path / 'a.txt')
+
+    job = paste(pool, 'copy', [src], str(dest), overwrite=[src])
+
+    assert job.errors == []
+    assert read(dest / 'a.txt') == 'new'
+    assert os.listdir(dest) == ['a.txt']
+
+
+def test_cancelled_overwrite_keeps_old_target(tmp_path):
+    write(tmp_path / 'a.txt', 'new' * 1000)
+    write(tmp_path / 'old.txt', 'old')
+
+    class Cancelled(Job):
+        def add_bytes(self, n):
+            pass
+
+    job = Cancelled()
+    job.cancel()
+    with pytest.raises(CopyCancelled):
+        copy_file(str(tmp_path / 'a.txt'), str(tmp_path / 'old.txt'), job)
+    assert read(tmp_path / 'old.txt') == 'old'
+    assert sorted(os.listdir(tmp_path)) == ['a.txt', 'old.txt']
+
+
+def test_cut_deltas_are_gathered_on_the_worker(pool, tmp_path, monkeypatch):
+    from explorer import DirListing
+
+    write(tmp_path / 'a.txt', 'data')
+    dest = tmp_path / 'dest'
+    dest.mkdir()
+    listing = DirListing(str(dest), 0)
+    listing.start()
+    while not listing.complete:
+        time.sleep(0.001)
+    job = paste(pool, 'cut', [str(tmp_path / 'a.txt')], str(dest))
+
+    add, remove = job.deltas()
+    assert add[:3] == (str(dest), 'add', 'a.txt') and add[3].st_size == 4
+    assert remove == (str(tmp_path), 'remove', 'a.txt')
+
+    def no_syscalls(*args, **kwargs):
+        raise AssertionError("applying a delta with its stat must not touch the disk")
+    monkeypatch.setattr(os, 'stat', no_syscalls)
+    monkeypatch.setattr(os.path, 'isdir', no_syscalls)
+    assert listing.apply(*add[1:])
+    i = listing.index_of('a.txt')
+    assert listing.sizes[i] == 4 and not listing.is_dir[i]
@@ -0,0 +1,37 @@
+"""Tests for DiskUsage directory totals"""
+import os
+import threading
+
+from explorer import DiskUsage
+
+
+def test_totals_are_apparent_bytes(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'f').write_text('x' * 10)
+    (tmp_path / 'g').write_text('y' * 3)
+
+    total = DiskUsage(workers=2).scan(str(tmp_path))
+
+    dirs = os.lstat(tmp_path).st_size + os.lstat(tmp_path / 'sub').st_size
+    assert total == (dirs + 13, 2, 2)
+
+
+def test_concurrent_scans_of_one_instance_agree(tmp_path):
+    for i in range(20):
+        (tmp_path / f'a{i}' / 'b').mkdir(parents=True)
+        (tmp_path / f'a{i}' / 'b' / 'f').write_text('x')
+    du = DiskUsage(workers=2)
+    results = []
+
+    def scan(root):
+        results.append(du.scan(root, refresh=True))
+
+    threads = [threading.Thread(target=scan, args=(str(tmp_path if n % 2 else tmp_path / 'a0'),))
+               for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert None not in results
+    assert du.total(str(tmp_path))[1:] == (20, 41)
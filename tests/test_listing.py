@@ -0,0 +1,124 @@
+"""Tests for directory listings"""
+import os
+import time
+
+from conftest import drive
+from explorer import DirListing, ListingCache, NameBuffer, Prefetcher
+
+
+def scanned(path):
+    listing = DirListing(str(path), os.stat(path).st_mtime)
+    listing.start()
+    while not listing.complete:
+        time.sleep(0.001)
+    return listing
+
+
+def names(listing, order):
+    return [listing.names[i] for i in order]
+
+
+def test_name_buffer():
+    buffer = NameBuffer()
+    for name in ('Alpha', 'beta.TXT', 'café'):
+        buffer.append(os.fsencode(name))
+
+    assert len(buffer) == 3
+    assert buffer[1] == 'beta.TXT' and buffer[-1] == 'café'
+    assert list(buffer) == ['Alpha', 'beta.TXT', 'café']
+    assert buffer.lowered(2) == ['alpha', 'beta.txt']
+    assert buffer.lowered(3)[2] == 'café'
+    assert buffer.first_byte(0) == ord('A')
+
+
+def test_listing_cache_evicts_least_recently_used(tmp_path):
+    listings = {}
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / ('x' * 50)).touch()
+        listings[name] = scanned(tmp_path / name)
+    size = listings['a'].nbytes()
+    cache = ListingCache(budget=size * 2)
+
+    cache['a'] = listings['a']
+    cache['b'] = listings['b']
+    cache.get('a')
+    cache['c'] = listings['c']
+
+    assert cache.get('b') is None and listings['b'].cancelled()
+    assert cache.get('a') is listings['a'] and cache.get('c') is listings['c']
+    assert cache.nbytes() <= cache.budget
+
+
+def test_listing_cache_keeps_the_newest_even_over_budget(tmp_path):
+    cache = ListingCache(budget=1)
+    cache['a'] = scanned(tmp_path)
+
+    assert cache.get('a') is not None
+
+
+def test_sort_modes(tmp_path):
+    (tmp_path / 'zdir').mkdir()
+    for name, size in (('b.txt', 30), ('a.py', 10), ('c.gz', 20), ('.hidden', 5)):
+        (tmp_path / name).write_text('x' * size)
+    listing = scanned(tmp_path)
+    for i in range(listing.count):
+        listing.stat(i)
+
+    assert names(listing, listing.sorted_order('name', False)) == ['zdir', 'a.py', 'b.txt', 'c.gz']
+    assert names(listing, listing.sorted_order('name', True))[:2] == ['zdir', '.hidden']
+    assert names(listing, listing.sorted_order('name', False, reverse=True)) == ['zdir', 'c.gz', 'b.txt', 'a.py']
+    assert names(listing, listing.sorted_order('ext', False)) == ['zdir', 'c.gz', 'a.py', 'b.txt']
+    assert names(listing, listing.sorted_order('type', False)) == ['zdir', 'c.gz', 'a.py', 'b.txt']
+    assert names(listing, listing.sorted_order('size', False))[1:] == ['a.py', 'c.gz', 'b.txt']
+
+
+def test_sort_orders_are_cached_until_the_listing_changes(tmp_path):
+    for name in ('b', 'a'):
+        (tmp_path / name).touch()
+    listing = scanned(tmp_path)
+
+    order = listing.sorted_order('name', False)
+    assert listing.sorted_order('name', False) is order
+    assert listing.cached_order('modified', False) is None
+
+    (tmp_path / 'c').touch()
+    listing.apply('add', 'c')
+    assert listing.cached_order('name', False) is None
+    listing.apply('remove', 'a')
+    assert names(listing, listing.sorted_order('name', False)) == ['b', 'c']
+
+
+def test_prefetcher_scans_wanted_directories(tmp_path):
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'f').touch()
+    (tmp_path / 'file').touch()
+    prefetcher = Prefetcher(workers=2)
+
+    prefetcher.want([str(tmp_path / 'a'), str(tmp_path / 'missing'), str(tmp_path / 'file'),
+                     str(tmp_path / 'b')])
+    done = []
+    deadline = time.monotonic() + 5
+    while len(done) < 2 and time.monotonic() < deadline:
+        done.extend(prefetcher.collect())
+        time.sleep(0.01)
+
+    assert sorted(listing.path for listing in done) == [str(tmp_path / 'a'), str(tmp_path / 'b')]
+    assert all(listing.complete and list(listing.names) == ['f'] for listing in done)
+
+
+def test_directory_under_the_cursor_opens_from_the_prefetch(fm, tmp_path):
+    home = tmp_path / 'home'
+    (home / 'sub').mkdir()
+    (home / 'sub' / 'f').touch()
+    fm.refresh_files()
+    drive(fm, lambda: fm.view_sorted and not fm.loading)
+    fm.selected_idx = list(fm.files).index('sub')
+
+    drive(fm, lambda: fm.dir_cache.peek(str(home / 'sub')) is not None)
+    prefetched = fm.dir_cache.peek(str(home / 'sub'))
+    fm.navigate_to(str(home / 'sub'))
+
+    assert fm.listing is prefetched
+    assert list(fm.files) == ['f']
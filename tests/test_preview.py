@@ -0,0 +1,78 @@
+"""Tests for preview rendering and the background previewer"""
+import os
+import time
+import zipfile
+
+import pytest
+
+from explorer import Previewer, render_preview
+
+
+def preview(path, width=40, lines=5, stale=lambda: False):
+    return render_preview(str(path), os.stat(path), width, lines, stale)
+
+
+def test_text_shows_the_head_and_logs_the_tail(tmp_path):
+    (tmp_path / 'a.txt').write_text('line1\nline2\n')
+    (tmp_path / 'app.log').write_text(''.join(f'{n}\n' for n in range(500)))
+
+    assert preview(tmp_path / 'a.txt')[:2] == ['line1', 'line2']
+    assert preview(tmp_path / 'app.log', lines=3) == ['497', '498', '499']
+
+
+def test_binaries_show_a_hex_dump(tmp_path):
+    (tmp_path / 'bin.dat').write_bytes(b'ab\0cd')
+
+    assert preview(tmp_path / 'bin.dat') == ['00000000  61 62 00 63 64           ab.cd']
+
+
+def test_archives_and_directories_list_their_entries(tmp_path):
+    with zipfile.ZipFile(tmp_path / 'x.zip', 'w') as archive:
+        archive.writestr('inner/one.txt', 'hi')
+    (tmp_path / 'd').mkdir()
+    (tmp_path / 'd' / 'f1').touch()
+
+    assert preview(tmp_path / 'x.zip')[-1].split() == ['2B', 'inner/one.txt']
+    assert preview(tmp_path / 'd')[-1] == 'f1'
+    (tmp_path / 'empty').touch()
+    assert preview(tmp_path / 'empty') == ['(empty file)']
+
+
+@pytest.mark.parametrize('name', ['bin.dat', 'd'])
+def test_a_superseded_render_gives_up(tmp_path, name):
+    (tmp_path / 'bin.dat').write_bytes(b'\0' * 4096)
+    (tmp_path / 'd').mkdir()
+
+    assert preview(tmp_path / name, stale=lambda: True) is None
+
+
+def wait_for(previewer, path, width, lines):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        rows = previewer.get(path, width, lines)
+        if rows is not None and not previewer.pending:
+            return rows
+        time.sleep(0.01)
+    raise AssertionError("no preview")
+
+
+def test_previewer_caches_and_revalidates(tmp_path):
+    path = str(tmp_path / 'a.txt')
+    with open(path, 'w') as f:
+        f.write('first\n')
+    previewer = Previewer()
+
+    previewer.request(path, 40, 5)
+    assert wait_for(previewer, path, 40, 5)[0] == 'first'
+    version = previewer.version
+    previewer.request(path, 40, 5)
+    wait_for(previewer, path, 40, 5)
+    assert previewer.version == version  # unchanged file: not rendered again
+
+    with open(path, 'w') as f:
+        f.write('second, longer\n')
+    previewer.request(path, 40, 5)
+    deadline = time.monotonic() + 5
+    while previewer.version == version and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert previewer.get(path, 40, 5)[0] == 'second, longer'
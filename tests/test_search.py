@@ -0,0 +1,131 @@
+"""Tests for the search engines"""
+import os
+import threading
+from collections import deque
+
+import pytest
+
+from explorer import ContentSearch, FileIndex, IncrementalFilter, MatchView, QueryError, SearchQuery, walk_search
+
+
+def test_incremental_filter_narrows_and_widens():
+    source = IncrementalFilter()
+    source.extend(['src/Main.py', 'src/util.py', 'README.md'])
+
+    assert list(source.view('m')) == ['src/Main.py', 'README.md']
+    assert list(source.view('ma')) == ['src/Main.py']
+    source.extend(['docs/manual.txt', 'x'])  # a batch arriving mid-query
+    assert list(source.view('ma')) == ['src/Main.py', 'docs/manual.txt']
+    assert list(source.view('m')) == ['src/Main.py', 'README.md', 'docs/manual.txt']
+    assert list(source.view('')) == ['src/Main.py', 'src/util.py', 'README.md', 'docs/manual.txt', 'x']
+
+
+def test_incremental_filter_remove_keeps_queries():
+    source = IncrementalFilter()
+    source.extend(['a/one', 'b/one', 'a/two'])
+    source.view('one')
+
+    source.remove(lambda path: path.startswith('a/'))
+
+    assert list(source.view('one')) == ['b/one']
+    assert source.items == ['b/one']
+
+
+def test_match_view():
+    view = MatchView(['a', 'b', 'c', 'd'], [3, 1])
+
+    assert len(view) == 2
+    assert view[0] == 'd' and view[-1] == 'b'
+    assert view[:1] == ['d']
+    assert list(view) == ['d', 'b']
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for path in ('a/b/c', 'node_modules/x'):
+        (tmp_path / path).mkdir(parents=True)
+    for path in ('top', 'a/one', 'a/b/two', 'a/b/c/three', 'node_modules/x/y'):
+        (tmp_path / path).touch()
+    return tmp_path
+
+
+def search(base, text):
+    results = deque()
+    walk_search(str(base), results, threading.Event(), SearchQuery(text), workers=2)
+    return sorted(rel.replace(os.sep, '/') for rel in results)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('depth:<2', ['a', 'node_modules', 'top']),
+    ('depth:<=1', ['a', 'node_modules', 'top']),
+    ('depth:=2', ['a/b', 'a/one', 'node_modules/x']),
+    ('depth:>2', ['a/b/c', 'a/b/c/three', 'a/b/two', 'node_modules/x/y']),
+    ('depth:>=4', ['a/b/c/three']),
+    ('depth:>1 depth:<3 -node_modules', ['a/b', 'a/one']),
+])
+def test_depth(tree, text, expected):
+    assert search(tree, text) == expected
+
+
+def test_bad_depth():
+    with pytest.raises(QueryError):
+        SearchQuery('depth:>x')
+
+
+def test_index_refresh_prunes_excluded_subtrees(tree, tmp_path_factory):
+    index = FileIndex(str(tmp_path_factory.mktemp('cache') / 'index.db'))
+    base = str(tree)
+    query = SearchQuery('-node_modules depth:<3')
+    prefix_len = len(base) + 1
+    added = []
+    try:
+        index.refresh(base, on_added=added.extend, workers=2,
+                      descend=lambda path: query.descend(path[prefix_len:], os.path.basename(path)))
+    finally:
+        index.close()
+    paths = sorted(row[0][prefix_len:].replace(os.sep, '/') for row in added)
+    assert paths == ['a', 'a/b', 'a/one', 'node_modules', 'top']
+
+
+def test_fuzzy_top_matches_equal_full_scan():
+    from explorer import FuzzyMatcher, IncrementalFilter, fuzzy_score
+
+    source = IncrementalFilter()
+    paths = [f"proj{n}/abcd_mod/file{n}.py" for n in range(200)] + ['docs/a-b-c-d.txt']
+    source.extend(paths)
+    matcher = FuzzyMatcher(source)
+    matcher._indexer.join()
+    while matcher.rank('abcd', 10, budget=1) and matcher.pending:
+        pass
+    ranked = matcher.results()
+    best = sorted(paths, key=lambda p: (fuzzy_score('abcd', p.lower()), -len(p)), reverse=True)[:10]
+    assert 'docs/a-b-c-d.txt' in ranked
+    assert [fuzzy_score('abcd', p.lower()) for p in ranked] == [fuzzy_score('abcd', p.lower()) for p in best]
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_content_search(tmp_path, monkeypatch, chunked):
+    if chunked:  # scan through mmap in small chunks
+        monkeypatch.setattr(ContentSearch, 'MMAP_THRESHOLD', 64)
+        monkeypatch.setattr(ContentSearch, 'CHUNK_BYTES', 100)
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'code.py').write_text('import os\n' * 30 + '# Needle here\n' + 'pass\n' * 30)
+    (tmp_path / 'notes.txt').write_text('needle\n')
+    (tmp_path / 'blob.bin').write_bytes(b'\0needle\n')
+    results = deque()
+
+    ContentSearch('needle', workers=2).run(str(tmp_path), results, threading.Event())
+
+    assert sorted(results) == [os.path.join('notes.txt') + ':1: needle',
+                               os.path.join('sub', 'code.py') + ':31: # Needle here']
+
+
+def test_content_search_honours_case_and_query(tmp_path):
+    (tmp_path / 'a.py').write_text('Needle\n')
+    (tmp_path / 'b.txt').write_text('Needle\n')
+    results = deque()
+
+    ContentSearch('Needle', ignore_case=False).run(str(tmp_path), results, threading.Event(), SearchQuery('*.py'))
+    ContentSearch('needle', ignore_case=False).run(str(tmp_path), results, threading.Event())
+
+    assert list(results) == ['a.py:1: Needle']
@@ -0,0 +1,32 @@
+"""Tests for purging trash left behind by an earlier session"""
+import os
+from types import SimpleNamespace
+
+from explorer import FileManager, register_trash_dir, trash_dirs
+
+
+def purge(pool):
+    jobs = []
+    FileManager.purge_trash(SimpleNamespace(jobs=SimpleNamespace(submit=jobs.append)))
+    for job in jobs:
+        job.run(pool)
+    return jobs
+
+
+def test_purges_per_filesystem_trash_dirs(pool, tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    os.makedirs(tmp_path / 'cache' / 'pyfiler' / 'trash')
+    (tmp_path / 'cache' / 'pyfiler' / 'trash' / '1-0-old').write_text('x')
+    trash = tmp_path / 'data' / '.pyfiler-trash'
+    register_trash_dir(str(trash))
+    register_trash_dir(str(trash))
+    (trash / '1-1-tree' / 'sub').mkdir(parents=True)
+    (trash / '1-1-tree' / 'sub' / 'f').write_text('x')
+
+    assert trash_dirs() == [str(trash)]
+    purge(pool)
+
+    assert not trash.exists()
+    assert os.listdir(tmp_path / 'cache' / 'pyfiler' / 'trash') == []
+    purge(pool)
+    assert trash_dirs() == []
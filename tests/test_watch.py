@@ -0,0 +1,144 @@
+"""Tests for keeping cached listings in step with the filesystem"""
+import os
+import time
+
+import pytest
+
+from conftest import drive
+from explorer import DirListing, InotifyWatcher, PollingWatcher
+
+
+def scanned(path):
+    listing = DirListing(str(path), os.stat(path).st_mtime)
+    listing.start()
+    while not listing.complete:
+        time.sleep(0.001)
+    return listing
+
+
+def visible(listing):
+    return sorted(listing.names[i] for i in range(listing.count) if i not in listing.deleted)
+
+
+def shown(fm):
+    return sorted(fm.files)
+
+
+def open_dir(fm, path):
+    fm.navigate_to(str(path))
+    drive(fm, lambda: fm.view_sorted and not fm.loading)
+
+
+def test_apply_adds_removes_and_restats(tmp_path):
+    (tmp_path / 'a').write_text('x')
+    listing = scanned(tmp_path)
+
+    (tmp_path / 'b').write_text('yy')
+    assert listing.apply('add', 'b')
+    listing.apply('add', 'b')  # already listed: only re-stat'ed
+    assert listing.count == 2
+    (tmp_path / 'a').write_text('xxx')
+    assert listing.apply('modify', 'a')
+    assert listing.apply('remove', 'b')
+    assert not listing.apply('remove', 'b')
+
+    assert visible(listing) == ['a']
+    assert listing.sizes[listing.index_of('a')] == 3
+
+
+def test_apply_waits_for_the_scan_to_finish(tmp_path):
+    listing = DirListing(str(tmp_path), os.stat(tmp_path).st_mtime)
+    (tmp_path / 'late').write_text('x')
+    assert not listing.apply('add', 'late')
+
+    listing.start()  # picks up 'late' itself
+    while not listing.complete:
+        time.sleep(0.001)
+    assert listing.has_pending()
+    listing.apply_pending()
+
+    assert visible(listing) == ['late']
+
+
+def poll_until(watcher, wanted, timeout=5):
+    events = []
+    deadline = time.monotonic() + timeout
+    while not wanted <= set(events) and time.monotonic() < deadline:
+        events.extend(watcher.poll())
+        time.sleep(0.01)
+    return set(events)
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def watcher(request):
+    if request.param == 'inotify':
+        try:
+            watcher = InotifyWatcher()
+        except (OSError, AttributeError, TypeError):
+            pytest.skip("no inotify here")
+    else:
+        watcher = PollingWatcher(interval=0.05)
+    yield watcher
+    watcher.close()
+
+
+def test_watcher_reports_adds_removes_and_rescans(tmp_path, watcher):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'old').write_text('x')
+    path, sub = str(tmp_path), str(tmp_path / 'sub')
+    assert watcher.watch(path) and watcher.watch(sub)
+    time.sleep(0.1)  # let the polling watcher take its first snapshot
+
+    (tmp_path / 'new').write_text('x')
+    os.remove(tmp_path / 'old')
+    assert {(path, 'add', 'new'), (path, 'remove', 'old')} <= poll_until(
+        watcher, {(path, 'add', 'new'), (path, 'remove', 'old')})
+
+    os.rmdir(sub)
+    assert (sub, 'rescan', None) in poll_until(watcher, {(sub, 'rescan', None)})
+
+
+def test_open_directory_follows_changes(fm, tmp_path):
+    folder = tmp_path / 'home' / 'folder'
+    folder.mkdir()
+    (folder / 'a').write_text('x')
+    open_dir(fm, folder)
+
+    (folder / 'b').write_text('x')
+    os.remove(folder / 'a')
+    drive(fm, lambda: shown(fm) == ['b'])
+
+
+def test_directory_changed_while_unwatched_is_rescanned(fm, tmp_path):
+    home = tmp_path / 'home'
+    folder = home / 'folder'
+    folder.mkdir()
+    (folder / 'a').write_text('x')
+    open_dir(fm, folder)
+    open_dir(fm, home)
+    assert str(folder) not in fm.watcher.watched()
+
+    (folder / 'b').write_text('x')
+    open_dir(fm, folder)
+
+    assert shown(fm) == ['a', 'b']
+
+
+def test_paste_does_not_hide_changes_to_an_unwatched_source(fm, tmp_path):
+    home = tmp_path / 'home'
+    for name in ('a', 'b'):
+        (home / name).mkdir()
+    for name in ('keep1', 'keep2', 'moved'):
+        (home / 'a' / name).write_text('x')
+    open_dir(fm, home / 'a')
+    fm.clipboard = {'files': [str(home / 'a' / 'moved')], 'operation': 'cut'}
+    open_dir(fm, home / 'b')
+
+    (home / 'a' / 'external.txt').write_text('x')
+    fm.paste_files()
+    drive(fm, lambda: not fm.jobs.busy())
+    fm.tick()
+    assert shown(fm) == ['moved']
+    open_dir(fm, home / 'a')
+
+    assert shown(fm) == ['external.txt', 'keep1', 'keep2']